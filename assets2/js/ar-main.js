@@ -140,6 +140,45 @@ let model, maxPredictions;
 // Teachable Machine Model URL
 const URL = "https://teachablemachine.withgoogle.com/models/M6fwGM3tz/";
 
+// Send frames to /api/ar/predict on devices with little memory, or when the page URL has ?predict=server
+const useServerPrediction = Boolean(window.BBAI_PREDICT_URL) && (
+  new URLSearchParams(window.location.search).get("predict") === "server" ||
+  (navigator.deviceMemory !== undefined && navigator.deviceMemory <= 2)
+);
+let serverRequestPending = false;
+const frameCanvas = document.createElement("canvas");
+
+// Server-side scans run in a session: repeated frames are skipped and it reports "done" once the label is stable
+let arSession = null;
+
+async function openArSession() {
+  arSession = null;
+  if (!window.BBAI_AR_SESSION_URL) return;  // Plain per-frame predictions
+  const response = await fetch(window.BBAI_AR_SESSION_URL, { method: "POST", credentials: "same-origin" });
+  if (response.ok) arSession = { url: (await response.json()).frame_url, result: null };
+}
+
+function closeArSession() {
+  if (arSession) fetch(arSession.url, { method: "DELETE", credentials: "same-origin" }).catch(() => {});
+}
+
+// Post the centre square of the current frame (what the model looks at) and return the server's reply
+async function predictOnServer(video) {
+  const side = Math.min(video.videoWidth, video.videoHeight);
+  if (!side) return null;
+  frameCanvas.width = frameCanvas.height = 224;
+  frameCanvas.getContext("2d").drawImage(
+    video, (video.videoWidth - side) / 2, (video.videoHeight - side) / 2, side, side, 0, 0, 224, 224
+  );
+  const blob = await new Promise(resolve => frameCanvas.toBlob(resolve, "image/jpeg", 0.85));
+  const form = new FormData();
+  form.append("frame", blob, "frame.jpg");
+  const url = arSession ? arSession.url : window.BBAI_PREDICT_URL;
+  const response = await fetch(url, { method: "POST", body: form, credentials: "same-origin" });
+  if (!response.ok) return null;
+  return response.json();
+}
+
 // Initialize webcam, model, and start prediction
 async function setupWebcamAndModel() {
   const video = document.getElementById("webcamPlayback");
@@ -152,18 +191,32 @@ async function setupWebcamAndModel() {
   isWebcamActive = true;
 
   // Load the Teachable Machine model
-  const modelURL = URL + "model.json";
-  const metadataURL = URL + "metadata.json";
-
-  model = await tmImage.load(modelURL, metadataURL);
-  maxPredictions = model.getTotalClasses();
+  // Prefer the copy served (and cached) by the app; fall back to Teachable Machine's hosting
+  const modelURL = window.BBAI_MODEL_URL || URL + "model.json";
+  const metadataURL = window.BBAI_METADATA_URL || URL + "metadata.json";
+
+  // Low-end devices classify frames on the server instead of downloading and running the model
+  if (!useServerPrediction) {
+    model = await tmImage.load(modelURL, metadataURL);
+    maxPredictions = model.getTotalClasses();
+  } else {
+    await openArSession();
+  }
 
   // Start prediction when model is ready
   startPrediction();
 }
 
 // Function to start/stop prediction when the "Start" or "Stop" button is clicked
-let predictionsHistory = {}; // Store prediction history
+let predictionsHistory = {}; // Running sum and count of percentages per restaurant
+
+function emptyHistory() {
+  const history = {};
+  ["Amami", "Boost", "BurgerKing", "CafeCuba", "Joli", "Ottoman", "PizzaHut", "Starbucks"].forEach(restaurant => {
+    history[restaurant] = { sum: 0, count: 0 };
+  });
+  return history;
+}
 
 // Function to start/stop prediction and calculate the average likelihood
 async function toggleModel() {
@@ -193,16 +246,7 @@ async function toggleModel() {
     allRestaurantsSection.style.display = "block"; // Make the section visible
     
     // Initialize predictionsHistory for storing prediction percentages
-    predictionsHistory = {
-      "Amami": [],
-      "Boost": [],
-      "BurgerKing": [],
-      "CafeCuba": [],
-      "Joli": [],
-      "Ottoman": [],
-      "PizzaHut": [],
-      "Starbucks": []
-    };
+    predictionsHistory = emptyHistory();
 
     // Hide restaurant info section by default
     restaurantInfoSection.style.display = "none";
@@ -219,14 +263,18 @@ async function toggleModel() {
     // Hide the all-restaurants-section
     allRestaurantsSection.style.display = "none"; // Hide the section
     
-    // Calculate the average likelihood for each restaurant
-    const avgLikelihoods = calculateAverageLikelihood(predictionsHistory);
+    // Calculate the average likelihood for each restaurant (the session's smoothed average when scanning server-side)
+    const avgLikelihoods = arSession && arSession.result
+      ? Object.fromEntries(Object.entries(arSession.result.averages).map(([name, p]) => [name, p * 100]))
+      : calculateAverageLikelihood(predictionsHistory);
+    closeArSession();
+    arSession = null;
 
     // Find the restaurant with the highest average likelihood
     const highestPrediction = findHighestPrediction(avgLikelihoods);
 
     // Update the restaurant-info-section with the highest prediction
-    updateRestaurantInfo(highestPrediction);
+    updateRestaurantInfo(highestPrediction, avgLikelihoods);
 
     // Show the restaurant info section
     restaurantInfoSection.style.display = "block";
@@ -256,7 +304,29 @@ async function startPrediction() {
     if (!isPredicting) return;
 
     // Predict the current frame
-    const predictions = await model.predict(video, false);
+    let predictions;
+    if (useServerPrediction) {
+      if (serverRequestPending) return;  // Skip this tick rather than queue frames behind a slow reply
+      serverRequestPending = true;
+      let reply;
+      try {
+        reply = await predictOnServer(video);
+      } catch (error) {
+        reply = null;
+      } finally {
+        serverRequestPending = false;
+      }
+      if (!reply || !isPredicting) return;
+      if (arSession) arSession.result = reply;
+      if (reply.done) {
+        toggleModel();  // The label is stable: stop early and show it
+        return;
+      }
+      predictions = reply.predictions;
+      if (!predictions) return;
+    } else {
+      predictions = await model.predict(video, false);
+    }
 
     // Accumulate prediction percentages for each restaurant
     predictions.forEach(pred => {
@@ -265,7 +335,8 @@ async function startPrediction() {
 
       // Accumulate percentages in the predictionsHistory object
       if (predictionsHistory[restaurant]) {
-        predictionsHistory[restaurant].push(percentage);
+        predictionsHistory[restaurant].sum += percentage;
+        predictionsHistory[restaurant].count += 1;
       }
 
       // Update each restaurant's card with the prediction probability
@@ -279,10 +350,9 @@ async function startPrediction() {
 function calculateAverageLikelihood(predictionsHistory) {
   const avgLikelihoods = {};
   for (const restaurant in predictionsHistory) {
-    const predictions = predictionsHistory[restaurant];
-    if (predictions.length > 0) {
-      const sum = predictions.reduce((acc, val) => acc + val, 0);
-      avgLikelihoods[restaurant] = sum / predictions.length;
+    const { sum, count } = predictionsHistory[restaurant];
+    if (count > 0) {
+      avgLikelihoods[restaurant] = sum / count;
     }
   }
   return avgLikelihoods;
@@ -304,7 +374,7 @@ function findHighestPrediction(avgLikelihoods) {
   return highestPrediction;
 }
 
-function updateRestaurantInfo(highestPrediction) {
+function updateRestaurantInfo(highestPrediction, avgLikelihoods) {
   const logoImg = document.getElementById("restaurant-logo");
   const likelihoodSpan = document.getElementById("likelihood-percentage");
   const nameH3 = document.getElementById("restaurant-name");
@@ -312,7 +382,7 @@ function updateRestaurantInfo(highestPrediction) {
   const kjValueSpan = document.getElementById("kj-value");
 
   // Get the average likelihood of the highest predicted restaurant
-  const avgLikelihood = calculateAverageLikelihood(predictionsHistory)[highestPrediction];
+  const avgLikelihood = avgLikelihoods[highestPrediction];
 
   // Add the restaurant info (name, logo, average likelihood) to the restaurant-info-section
   logoImg.src = `assets/img/Outlets/${highestPrediction.toLowerCase()}.png`; // Adjust the path as needed
@@ -345,6 +415,13 @@ function getHealthScore(restaurant) {
 }
 
 function getAverageKilojoules(restaurant) {
+  // The server keeps a per-restaurant summary of menu.csv; only parse the CSV here on pages without it
+  if (window.BBAI_RESTAURANT_SUMMARY_URL) {
+    return fetch(window.BBAI_RESTAURANT_SUMMARY_URL.replace("__label__", encodeURIComponent(restaurant)), { credentials: "same-origin" })
+      .then(response => response.ok ? response.json() : null)
+      .then(summary => summary && summary.kilojoules ? summary.kilojoules.mean.toFixed(2) : "XXXX")
+      .catch(() => "XXXX");
+  }
   return fetch('/static/menu.csv') // Path to your menu CSV file
     .then(response => {
       if (!response.ok) {
@@ -432,16 +509,7 @@ function toggleReset() {
   }
 
   // Clear averages from the predictions history
-  predictionsHistory = {
-    "Amami": [],
-    "Boost": [],
-    "BurgerKing": [],
-    "CafeCuba": [],
-    "Joli": [],
-    "Ottoman": [],
-    "PizzaHut": [],
-    "Starbucks": []
-  };
+  predictionsHistory = emptyHistory();
 
   // Restore the previous state after 0.5 seconds
   setTimeout(() => {
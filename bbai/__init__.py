@@ -0,0 +1,6 @@
+"""
+Supporting modules for the Byte Bite-AI Flask app (``flask-app.py``).
+
+Anything that is shared between the web app and the command-line tools lives here,
+so it can be imported without pulling in the Flask application factory.
+"""
@@ -0,0 +1,212 @@
+"""
+AR prediction sessions: skip near-duplicate frames, smooth the rest, stop once the answer is stable.
+
+The AR page used to average every prediction it made while the model ran. Consecutive webcam
+frames are almost identical, so most of that inference was repeated work. A session instead:
+
+* hashes each decoded frame with a 64-bit difference hash (dHash) and looks it up in a small
+  per-session cache. A frame within ``BBAI_AR_DEDUP_DISTANCE`` bits (default 6) of a cached
+  one reuses that frame's probabilities instead of running the model;
+* folds every frame's probabilities into an exponential moving average per label
+  (``BBAI_AR_EMA_ALPHA``, default 0.3), a fixed-size vector however long the session runs;
+* reports ``done`` once the same label has led the average with at least
+  ``BBAI_AR_CONFIDENCE`` (default 0.9) for ``BBAI_AR_STABLE_FRAMES`` (default 3) frames in a
+  row. Frames sent after that are answered from the result without decoding.
+
+Sessions belong to the user who opened them, live in this worker's memory, and expire after
+``BBAI_AR_SESSION_TTL`` seconds without a frame (default 120). At most
+``BBAI_AR_MAX_SESSIONS`` (default 1000) are kept, least recently used first out.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DEDUP_DISTANCE = 6
+DEFAULT_HASH_CACHE = 32
+DEFAULT_EMA_ALPHA = 0.3
+DEFAULT_CONFIDENCE = 0.9
+DEFAULT_STABLE_FRAMES = 3
+DEFAULT_TTL = 120.0
+DEFAULT_MAX_SESSIONS = 1000
+
+
+def frame_hash(frame) -> int:
+    """64-bit difference hash of a prepared frame (HxWx3 in [-1, 1]): brighter-than-right-neighbour bits on a 9x8 grid."""
+    from PIL import Image
+
+    gray = ((frame.mean(axis=2) + 1.0) * 127.5).clip(0, 255).astype(np.uint8)
+    small = np.asarray(Image.fromarray(gray).resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, :-1] > small[:, 1:]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ARSession:
+    """One scan: recent frame hashes with their probabilities, and the running average."""
+
+    def __init__(self, owner: str, labels: List[str], settings: Dict[str, Any]):
+        self.owner = owner
+        self.labels = labels
+        self.settings = settings
+        self.hashes: "OrderedDict[int, Any]" = OrderedDict()  # dHash -> probabilities
+        self.average = None
+        self.leader: Optional[int] = None
+        self.streak = 0
+        self.frames = 0
+        self.inferred = 0
+        self.done = False
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+    def lookup(self, digest: int):
+        """Probabilities of a cached frame within the dedup distance of `digest`, else None."""
+        distance = self.settings["dedup_distance"]
+        for cached, probabilities in reversed(self.hashes.items()):  # Newest first: the likeliest match
+            if hamming(cached, digest) <= distance:
+                return probabilities
+        return None
+
+    def remember(self, digest: int, probabilities) -> None:
+        self.hashes[digest] = probabilities
+        while len(self.hashes) > self.settings["hash_cache"]:
+            self.hashes.popitem(last=False)
+
+    def observe(self, probabilities) -> None:
+        alpha = self.settings["ema_alpha"]
+        self.average = probabilities.copy() if self.average is None else self.average + alpha * (probabilities - self.average)
+        self.frames += 1
+        leader = int(self.average.argmax())
+        self.streak = self.streak + 1 if leader == self.leader else 1
+        self.leader = leader
+        if self.average[leader] >= self.settings["confidence"] and self.streak >= self.settings["stable_frames"]:
+            self.done = True
+
+    def result(self) -> Dict[str, Any]:
+        averages = {} if self.average is None else {label: round(float(p), 4) for label, p in zip(self.labels, self.average)}
+        return {
+            "done": self.done,
+            "label": self.labels[self.leader] if self.leader is not None else None,
+            "confidence": averages.get(self.labels[self.leader]) if self.leader is not None else None,
+            "averages": averages,
+            "frames": self.frames,
+            "inferred": self.inferred,
+        }
+
+
+class ARSessionStore:
+    """Open sessions by ID; frames are decoded and classified through the given model."""
+
+    def __init__(self, model, max_sessions: Optional[int] = None, ttl: Optional[float] = None):
+        env = os.getenv
+        self.model = model
+        self.max_sessions = max_sessions or int(env("BBAI_AR_MAX_SESSIONS", DEFAULT_MAX_SESSIONS))
+        self.ttl = ttl or float(env("BBAI_AR_SESSION_TTL", DEFAULT_TTL))
+        self.settings = {
+            "dedup_distance": int(env("BBAI_AR_DEDUP_DISTANCE", DEFAULT_DEDUP_DISTANCE)),
+            "hash_cache": int(env("BBAI_AR_HASH_CACHE", DEFAULT_HASH_CACHE)),
+            "ema_alpha": float(env("BBAI_AR_EMA_ALPHA", DEFAULT_EMA_ALPHA)),
+            "confidence": float(env("BBAI_AR_CONFIDENCE", DEFAULT_CONFIDENCE)),
+            "stable_frames": int(env("BBAI_AR_STABLE_FRAMES", DEFAULT_STABLE_FRAMES)),
+        }
+        self._sessions: "OrderedDict[str, ARSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.converged = 0
+        self.frames = 0
+        self.deduplicated = 0
+        self.expired = 0
+
+    def _expire(self, now: float) -> None:
+        """Drop idle sessions (oldest first, so stop at the first live one) and enforce the cap."""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def open(self, owner: str) -> str:
+        self.model.load()
+        session_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._sessions[session_id] = ARSession(owner, list(self.model.labels), self.settings)
+            self.opened += 1
+            self._expire(time.monotonic())
+        return session_id
+
+    def get(self, session_id: str, owner: str) -> Optional[ARSession]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None or session.owner != owner:
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id: str, owner: str) -> Optional[Dict[str, Any]]:
+        session = self.get(session_id, owner)
+        if session is None:
+            return None
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        with session.lock:
+            return session.result()
+
+    def add_frames(self, session: ARSession, frames: List[bytes], timeout: Optional[float] = None) -> Tuple[Dict[str, Any], List[Any]]:
+        """
+        Fold `frames` into the session, running the model only for frames unlike the cached ones.
+        Returns the session result and the probabilities of each frame handled (None once done).
+        Undecodable frames (FrameRejected) and inference timeouts propagate to the caller.
+        """
+        with session.lock:
+            if session.done:
+                return session.result(), [None] * len(frames)
+            arrays = [self.model.prepare(data) for data in frames]
+            digests = [frame_hash(array) for array in arrays]
+            rows: List[Any] = [session.lookup(digest) for digest in digests]
+            missing = [index for index, row in enumerate(rows) if row is None]
+            # Frames of one upload can duplicate each other too; classify each distinct one once
+            # (copied from that frame, not looked up again: the LRU may have evicted it by then)
+            distinct: List[int] = []
+            same_as: Dict[int, int] = {}
+            for index in missing:
+                match = next((other for other in distinct
+                              if hamming(digests[index], digests[other]) <= self.settings["dedup_distance"]), None)
+                if match is None:
+                    distinct.append(index)
+                else:
+                    same_as[index] = match
+            for index, probabilities in zip(distinct, self.model.classify([arrays[i] for i in distinct], timeout)):
+                rows[index] = probabilities
+                session.remember(digests[index], probabilities)
+            for index, match in same_as.items():
+                rows[index] = rows[match]
+            for row in rows:
+                session.observe(row)
+                if session.done:
+                    break
+            session.inferred += len(distinct)
+            result = session.result()
+        with self._lock:
+            self.frames += len(frames)
+            self.deduplicated += len(frames) - len(distinct)
+            if session.done:  # add_frames() returns early once done, so this counts each session once
+                self.converged += 1
+        return result, rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"open": len(self._sessions), "opened": self.opened, "converged": self.converged,
+                    "frames": self.frames, "deduplicated": self.deduplicated,
+                    "dedup_ratio": round(self.deduplicated / self.frames, 3) if self.frames else 0.0,
+                    "expired": self.expired, **self.settings}
@@ -0,0 +1,228 @@
+"""
+Data augmentation for the AR logo dataset, replacing ``DataAugmentor.ipynb``.
+
+    python -m bbai.augment                                   # wo-Augmentation -> .bbai-cache/augmented
+    python -m bbai.augment --target 220 --workers 8 --out "AR-View Model/Dataset/w-Augmentation"
+
+Source images are read straight out of the ``<Label>-samples.zip`` archives; nothing is
+extracted. The transforms match the notebook's ``ImageDataGenerator``: rotation ±40°, width
+and height shift ±20%, shear 0.2°, zoom 0.8-1.2, horizontal flip, with the border filled by
+the nearest edge pixel. They are implemented with Pillow and NumPy, so TensorFlow isn't
+needed.
+
+Each label needs ``--target`` images in total, originals included. The needed augmented
+images become a fixed, ordered list of (original, copy number) jobs, and each copy's random
+parameters come from a seed derived from ``--seed``, the label, the original's name and the
+copy number. Output is therefore the same whatever the worker count or order. Jobs are cut
+into shards of ``--shard-size``, and a process pool works through them. Each shard is
+written as its own zip the moment it is done (atomically), named after the parameters that
+produced it, so an interrupted or repeated run only redoes missing shards. Finally the
+shards of each label are merged into ``<out>/<Label>-samples.zip``, laid out like the source
+archives.
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from bbai.menu import BASE_DIR
+
+SOURCE_DIR = os.path.join(BASE_DIR, "AR-View Model", "Dataset", "wo-Augmentation")
+OUT_DIR = os.path.join(BASE_DIR, ".bbai-cache", "augmented")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# The notebook's ImageDataGenerator settings
+ROTATION_RANGE = 40.0  # Degrees
+SHIFT_RANGE = 0.2  # Fraction of width/height
+SHEAR_RANGE = 0.2  # Degrees, as Keras interprets shear_range
+ZOOM_RANGE = (0.8, 1.2)
+JPEG_QUALITY = 95
+
+Job = Tuple[str, str, int]  # (archive path, member name, copy number)
+
+
+def source_images(archive_path: str) -> List[str]:
+    """Image members of a samples archive, in a stable order (macOS metadata skipped)."""
+    with zipfile.ZipFile(archive_path) as archive:
+        return sorted(info.filename for info in archive.infolist()
+                      if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                      and not info.filename.startswith("__MACOSX") and "/." not in info.filename)
+
+
+def job_seed(seed: int, label: str, member: str, copy: int) -> int:
+    return int.from_bytes(hashlib.sha256(f"{seed}:{label}:{member}:{copy}".encode("utf-8")).digest()[:8], "big")
+
+
+# ----------------------------- Transform ------------------------------------------
+def random_transform(image, rng: random.Random):
+    """One ImageDataGenerator-style random affine transform of a PIL image (nearest-edge fill)."""
+    from PIL import Image
+
+    width, height = image.size
+    theta = math.radians(rng.uniform(-ROTATION_RANGE, ROTATION_RANGE))
+    shift_rows = rng.uniform(-SHIFT_RANGE, SHIFT_RANGE) * height
+    shift_cols = rng.uniform(-SHIFT_RANGE, SHIFT_RANGE) * width
+    shear = math.radians(rng.uniform(-SHEAR_RANGE, SHEAR_RANGE))
+    zoom_rows, zoom_cols = rng.uniform(*ZOOM_RANGE), rng.uniform(*ZOOM_RANGE)
+    flip = rng.random() < 0.5
+
+    # Keras composes these in (row, col) space, mapping output pixels to input pixels
+    rotation = np.array([[math.cos(theta), -math.sin(theta), 0], [math.sin(theta), math.cos(theta), 0], [0, 0, 1]])
+    shift = np.array([[1, 0, shift_rows], [0, 1, shift_cols], [0, 0, 1]])
+    shearing = np.array([[1, -math.sin(shear), 0], [0, math.cos(shear), 0], [0, 0, 1]])
+    zoom = np.array([[zoom_rows, 0, 0], [0, zoom_cols, 0], [0, 0, 1]])
+    centre_rows, centre_cols = height / 2 - 0.5, width / 2 - 0.5
+    to_centre = np.array([[1, 0, centre_rows], [0, 1, centre_cols], [0, 0, 1]])
+    from_centre = np.array([[1, 0, -centre_rows], [0, 1, -centre_cols], [0, 0, 1]])
+    matrix = to_centre @ rotation @ shift @ shearing @ zoom @ from_centre
+
+    # Pillow wants (x, y) = (col, row); pad with edge pixels so samples outside the image repeat the border
+    swap = np.array([[0, 1, 0], [1, 0, 0], [0, 0, 1]])
+    matrix = swap @ matrix @ swap
+    pad = max(width, height)
+    padded = Image.fromarray(np.pad(np.asarray(image), ((pad, pad), (pad, pad), (0, 0)), mode="edge"))
+    (a, b, c), (d, e, f) = matrix[0], matrix[1]
+    result = padded.transform((width, height), Image.AFFINE, (a, b, c + pad, d, e, f + pad), resample=Image.BILINEAR)
+    return result.transpose(Image.FLIP_LEFT_RIGHT) if flip else result
+
+
+def augment_shard(jobs: List[Job], label: str, seed: int, shard_path: str) -> int:
+    """Worker: produce every job of one shard and write it as a zip; returns the image count."""
+    from PIL import Image
+
+    archives: Dict[str, zipfile.ZipFile] = {}
+    buffer = io.BytesIO()
+    try:
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as shard:  # JPEGs don't compress further
+            for archive_path, member, copy in jobs:
+                archive = archives.get(archive_path) or archives.setdefault(archive_path, zipfile.ZipFile(archive_path))
+                data = archive.read(member)
+                stem = os.path.splitext(os.path.basename(member))[0]
+                if copy < 0:  # The original itself
+                    shard.writestr(f"{stem}.jpg" if member.lower().endswith((".jpg", ".jpeg")) else os.path.basename(member), data)
+                    continue
+                image = Image.open(io.BytesIO(data)).convert("RGB")
+                augmented = random_transform(image, random.Random(job_seed(seed, label, member, copy)))
+                out = io.BytesIO()
+                augmented.save(out, format="JPEG", quality=JPEG_QUALITY)
+                shard.writestr(f"aug_{stem}_{copy}.jpg", out.getvalue())
+    finally:
+        for archive in archives.values():
+            archive.close()
+    tmp = f"{shard_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp, shard_path)
+    return len(jobs)
+
+
+# ----------------------------- Planning -------------------------------------------
+def plan(source_dir: str, target: int, keep_originals: bool) -> Dict[str, List[Job]]:
+    """Per label, the ordered jobs that bring it to `target` images."""
+    jobs: Dict[str, List[Job]] = {}
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith("-samples.zip"):
+            continue
+        label = name[:-len("-samples.zip")]
+        archive_path = os.path.join(source_dir, name)
+        members = source_images(archive_path)
+        if not members:
+            continue
+        label_jobs: List[Job] = [(archive_path, member, -1) for member in members] if keep_originals else []
+        needed = max(target - len(label_jobs), 0)
+        copies = math.ceil(needed / len(members))
+        augmented = [(archive_path, member, copy) for copy in range(copies) for member in members]
+        jobs[label] = label_jobs + augmented[:needed]
+    return jobs
+
+
+def params_digest(args: argparse.Namespace, source_dir: str) -> str:
+    """Identifies everything that determines a shard's contents (sources included)."""
+    digest = hashlib.sha256(json.dumps({
+        "seed": args.seed, "target": args.target, "shard_size": args.shard_size, "originals": args.keep_originals,
+        "transform": [ROTATION_RANGE, SHIFT_RANGE, SHEAR_RANGE, ZOOM_RANGE, JPEG_QUALITY],
+    }, sort_keys=True).encode("utf-8"))
+    for name in sorted(os.listdir(source_dir)):
+        if name.endswith("-samples.zip"):
+            stat = os.stat(os.path.join(source_dir, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:10]
+
+
+def merge(label: str, shard_paths: List[str], out_dir: str) -> str:
+    """Concatenate a label's shards into <Label>-samples.zip (same layout as the source archives)."""
+    path = os.path.join(out_dir, f"{label}-samples.zip")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as merged:
+        for shard_path in shard_paths:
+            with zipfile.ZipFile(shard_path) as shard:
+                for info in shard.infolist():
+                    merged.writestr(f"{label}-samples/{info.filename}", shard.read(info))
+    os.replace(tmp, path)
+    return path
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Augment the AR logo dataset in parallel, straight from the zips.")
+    parser.add_argument("--source", default=SOURCE_DIR, help="Folder of <Label>-samples.zip archives")
+    parser.add_argument("--out", default=OUT_DIR, help="Output folder (shards/ plus merged archives)")
+    parser.add_argument("--target", type=int, default=200, help="Images per label, originals included (default 200)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=32, help="Images per output shard")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-originals", dest="keep_originals", action="store_false",
+                        help="Only write augmented images")
+    parser.add_argument("--no-merge", dest="merge", action="store_false", help="Leave the output as shards")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    digest = params_digest(args, args.source)
+    shard_dir = os.path.join(args.out, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    shards: Dict[str, List[str]] = {}
+    pending: List[Tuple[str, List[Job], str]] = []
+    for label, jobs in plan(args.source, args.target, args.keep_originals).items():
+        for index in range(0, len(jobs), args.shard_size):
+            path = os.path.join(shard_dir, f"{label}-{digest}-{index // args.shard_size:05d}.zip")
+            shards.setdefault(label, []).append(path)
+            if not os.path.exists(path):
+                pending.append((label, jobs[index:index + args.shard_size], path))
+
+    total = sum(len(paths) for paths in shards.values())
+    print(f"{total} shards for {len(shards)} labels ({total - len(pending)} already done), "
+          f"{args.workers} worker(s), parameters {digest}")
+    start, images = time.perf_counter(), 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(augment_shard, jobs, label, args.seed, path): path for label, jobs, path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                images += future.result()
+                print(f"  [{done}/{len(pending)}] {os.path.basename(futures[future])}")
+    elapsed = time.perf_counter() - start
+    if images:
+        print(f"Wrote {images} images in {elapsed:.1f} s ({images / elapsed:.0f} images/s)")
+
+    if args.merge:
+        for label, paths in shards.items():
+            merge(label, paths, args.out)
+        print(f"Merged into {len(shards)} archive(s) in {args.out}")
+    with open(os.path.join(args.out, "manifest.json"), "w") as f:
+        json.dump({"parameters": digest, "seed": args.seed, "target": args.target, "source": args.source,
+                   "shards": {label: [os.path.basename(path) for path in paths] for label, paths in shards.items()}},
+                  f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
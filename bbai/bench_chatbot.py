@@ -0,0 +1,215 @@
+"""
+Load test for ``POST /chatbot``.
+
+Starts a fake Ollama server (``bbai.fake_ollama``) and the real Flask app on local ports,
+then sweeps concurrency levels and reports latency percentiles, time-to-first-token,
+token throughput and error rates. Nothing leaves the machine, so results are comparable
+between runs on the same box.
+
+    python -m bbai.bench_chatbot --concurrency 1,2,4,8,16 --requests 40 --token-latency 0.02
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from bbai.fake_ollama import FakeOllamaServer, add_config_arguments, config_from_args
+from bbai.serve import load_app_module
+
+# Open-ended questions that the structured fast path can't answer, so they reach the model
+LLM_PROMPTS = [
+    "What should I eat before a long study session?",
+    "Suggest a balanced lunch for someone training for a marathon.",
+    "I'm feeling tired after lunch every day, any food tips?",
+    "Can you plan a cheap and healthy day of meals on campus?",
+]
+# Menu lookups answered from the preparsed table
+STRUCTURED_PROMPTS = [
+    "How much is the Whopper?",
+    "How many calories in a Hamburger?",
+    "Vegetarian options at Pizza Hut",
+    "Cheapest dishes at Starbucks",
+]
+
+
+def load_flask_app():
+    """Import flask-app.py and build the app (this also changes into the repo directory)."""
+    return load_app_module().create_app()
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class RequestResult:
+    __slots__ = ("ok", "latency", "first_token", "tokens", "path", "error")
+
+    def __init__(self, ok: bool, latency: float, first_token: Optional[float] = None, tokens: int = 0,
+                 path: str = "", error: str = ""):
+        self.ok = ok
+        self.latency = latency
+        self.first_token = first_token
+        self.tokens = tokens
+        self.path = path
+        self.error = error
+
+
+def send_chatbot_request(host: str, port: int, prompt: str, stream: bool, timeout: float) -> RequestResult:
+    """POST one prompt and time the response, reading the body incrementally when streaming."""
+    body = json.dumps({"prompt": f"You are Byte Bite-AI.\n\nUser: {prompt}", "stream": stream})
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("POST", "/chatbot", body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        first_token = None
+        chunks = []
+        while True:
+            data = resp.read1(65536)
+            if not data:
+                break
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            chunks.append(data)
+        latency = time.perf_counter() - start
+        text = b"".join(chunks).decode("utf-8", "replace")
+        if not stream and resp.status == 200:
+            text = json.loads(text).get("response", "")
+        ok = resp.status == 200 and not text.startswith("Error querying Ollama")
+        return RequestResult(ok, latency, first_token, len(text.split()),
+                             resp.getheader("X-BBAI-Answer-Path", ""), "" if ok else f"HTTP {resp.status}")
+    except Exception as e:
+        return RequestResult(False, time.perf_counter() - start, error=type(e).__name__)
+    finally:
+        conn.close()
+
+
+def run_level(host: str, port: int, concurrency: int, total: int, prompts: List[str], stream: bool,
+              timeout: float) -> Dict[str, object]:
+    """Fire `total` requests with `concurrency` in flight and summarise them."""
+    counter = iter(range(total))
+    lock = threading.Lock()
+    results: List[RequestResult] = []
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            result = send_chatbot_request(host, port, prompts[index % len(prompts)], stream, timeout)
+            with lock:
+                results.append(result)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - wall_start
+
+    ok = [r for r in results if r.ok]
+    latencies = [r.latency * 1000 for r in ok]
+    first_tokens = [r.first_token * 1000 for r in ok if r.first_token is not None]
+    per_request_tps = [r.tokens / r.latency for r in ok if r.latency > 0 and r.tokens]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "throughput_rps": len(ok) / wall if wall else 0.0,
+        "latency_ms": {p: percentile(latencies, p) for p in (50, 95, 99)},
+        "ttft_ms": {p: percentile(first_tokens, p) for p in (50, 95, 99)},
+        "tokens_per_sec_total": sum(r.tokens for r in ok) / wall if wall else 0.0,
+        "tokens_per_sec_request_p50": statistics.median(per_request_tps) if per_request_tps else None,
+        "answer_paths": sorted({r.path for r in ok}),
+        "error_kinds": sorted({r.error for r in results if r.error}),
+    }
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:8.1f}"
+
+
+def print_report(rows: List[Dict[str, object]]) -> None:
+    print(f"{'conc':>4} {'reqs':>5} {'err%':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'ttft50':>8} {'ttft95':>8} {'ttft99':>8} {'tok/s':>8} {'tok/s/req':>9}")
+    for row in rows:
+        lat, ttft = row["latency_ms"], row["ttft_ms"]
+        print(f"{row['concurrency']:>4} {row['requests']:>5} {row['error_rate'] * 100:>6.1f} "
+              f"{row['throughput_rps']:>7.2f} {_fmt(lat[50])} {_fmt(lat[95])} {_fmt(lat[99])} "
+              f"{_fmt(ttft[50])} {_fmt(ttft[95])} {_fmt(ttft[99])} {row['tokens_per_sec_total']:>8.1f} "
+              f"{_fmt(row['tokens_per_sec_request_p50']):>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /chatbot against a fake Ollama backend.")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated levels (default 1,2,4,8,16)")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level (default 32)")
+    parser.add_argument("--structured-ratio", type=float, default=0.0,
+                        help="fraction of prompts that are menu lookups served by the fast path (default 0)")
+    parser.add_argument("--no-stream", action="store_true", help="use the JSON response instead of streaming")
+    parser.add_argument("--ollama-url", help="benchmark against this Ollama server instead of the fake one")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if args.json_path:
+        args.json_path = os.path.abspath(args.json_path)  # load_flask_app() changes directory
+
+    fake = None
+    if args.ollama_url:
+        os.environ["OLLAMA_HOST"] = args.ollama_url
+    else:
+        fake = FakeOllamaServer(("127.0.0.1", 0), config_from_args(args))
+        fake.start_background()
+        os.environ["OLLAMA_HOST"] = fake.url
+    os.environ["BBAI_OLLAMA_BACKEND"] = "http"
+
+    from werkzeug.serving import make_server
+    app = load_flask_app()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access log lines
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-flask", daemon=True).start()
+    host, port = "127.0.0.1", server.server_port
+
+    # Interleave structured lookups into the prompt list in the requested proportion
+    structured_every = int(round(1 / args.structured_ratio)) if args.structured_ratio > 0 else 0
+    prompts = [
+        STRUCTURED_PROMPTS[i % len(STRUCTURED_PROMPTS)] if structured_every and i % structured_every == 0
+        else LLM_PROMPTS[i % len(LLM_PROMPTS)]
+        for i in range(max(len(LLM_PROMPTS), structured_every or 1) * 4)
+    ]
+
+    print(f"Backend: {os.environ['OLLAMA_HOST']}  stream={not args.no_stream}  "
+          f"token_latency={args.token_latency}s tokens={args.tokens} parallel={args.parallel}")
+    send_chatbot_request(host, port, prompts[0], not args.no_stream, args.timeout)  # Warm-up (menu parse etc.)
+
+    rows = []
+    for level in (int(c) for c in args.concurrency.split(",") if c.strip()):
+        rows.append(run_level(host, port, level, args.requests, prompts, not args.no_stream, args.timeout))
+    print_report(rows)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=4)
+        print(f"Results written to {args.json_path}")
+
+    server.shutdown()
+    if fake is not None:
+        fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
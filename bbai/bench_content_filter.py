@@ -0,0 +1,85 @@
+"""
+Microbenchmark: the compiled content filter against the old per-word substring check.
+
+The old check (``any(word.lower() in about.lower() for word in forbidden_words)``) is
+reproduced here with the same word list, so both sides see identical terms. Reports the
+time per check for clean and flagged texts of a few lengths, plus the texts where the two
+disagree (substring hits inside innocent words such as "thinking" or "skill").
+
+    python -m bbai.bench_content_filter --repeat 2000
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+from bbai.content_filter import CONTENT_FILTER_PATH, ContentFilters
+
+SAMPLES = {
+    "short clean": "Loves pizza and coffee.",
+    "about (300 chars) clean": ("Second-year engineering student who enjoys cooking with friends, trying new cafes "
+                                "around campus, hiking on weekends and thinking about skill building. Big fan of "
+                                "spicy noodles, fresh fruit and a good flat white before lectures. Always keen to "
+                                "swap recipes and discover cheap eats nearby!"),
+    "about (300 chars) flagged": ("Second-year engineering student who enjoys cooking with friends, trying new cafes "
+                                  "around campus, hiking on weekends. Currently doing a juice fast and a crash diet "
+                                  "before summer, so mostly salads for me. Always keen to swap recipes and discover "
+                                  "cheap eats nearby!"),
+    "chat prompt clean": "What vegetarian options are there at Pizza Hut under $10?",
+}
+# Innocent texts the substring check used to reject
+FALSE_POSITIVES = ["I love thinking about food", "Working on my skills in the kitchen", "Therapist in training",
+                   "Grapes are my favourite snack", "Shitake mushroom fan", "Studying classic literature"]
+
+
+def legacy_words(path: str = CONTENT_FILTER_PATH) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        categories = json.load(f)["categories"]
+    return [term for category in categories.values() if "profile" in category["scopes"]
+            for term in category["terms"]]
+
+
+def time_per_call(check: Callable[[str], object], text: str, repeat: int) -> float:
+    """Best-of-3 microseconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            check(text)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1e6
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the compiled content filter with substring checks.")
+    parser.add_argument("--repeat", type=int, default=2000, help="Calls per timing run")
+    args = parser.parse_args(argv)
+
+    words = legacy_words()
+
+    def legacy(about: str) -> bool:
+        return any(word.lower() in about.lower() for word in words)
+
+    filters = ContentFilters()
+    profile = filters.scope("profile")
+    start = time.perf_counter()
+    ContentFilters().scope("profile")
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(words)} terms, automaton compiled in {compile_ms:.1f} ms "
+          f"({filters.stats()['states']['profile']} states)\n")
+    print(f"{'text':28} {'chars':>6} {'substring µs':>13} {'automaton µs':>13} {'speedup':>8}")
+    for name, text in SAMPLES.items():
+        old = time_per_call(legacy, text, args.repeat)
+        new = time_per_call(profile.first_match, text, args.repeat)
+        print(f"{name:28} {len(text):>6} {old:>13.2f} {new:>13.2f} {old / new:>7.1f}x")
+
+    print("\nTexts the substring check rejects but the whole-word filter accepts:")
+    for text in FALSE_POSITIVES:
+        hits = [word for word in words if word.lower() in text.lower()]
+        if hits and profile.is_clean(text):
+            print(f"  {text!r}: matched {', '.join(hits)}")
+
+
+if __name__ == "__main__":
+    main()
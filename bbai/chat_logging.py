@@ -0,0 +1,95 @@
+"""
+Non-blocking JSON Lines logging for chatbot requests.
+
+Request threads only put records on an in-memory queue (``QueueHandler``); a single
+``QueueListener`` thread formats them and writes to a file that rotates by size and by time,
+so history is kept across restarts instead of being wiped at boot.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024       # Rotate once the active file reaches 5 MB...
+DEFAULT_ROTATE_SECONDS = 24 * 60 * 60     # ...or once it is a day old, whichever comes first
+DEFAULT_BACKUP_COUNT = 14
+LOG_FILENAME = "ollama_query.jsonl"
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and belongs in the JSON
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as one JSON object per line, including any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over after a fixed interval."""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, interval: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.interval = interval
+        # Carry the age of an existing file over restarts so rotation isn't postponed by every reboot
+        created = os.path.getmtime(filename) if os.path.exists(filename) and os.path.getsize(filename) else time.time()
+        self.rollover_at = created + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.interval and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+def setup_chat_logger(log_folder: str, name: str = "ollama_logger",
+                      max_bytes: Optional[int] = None, rotate_seconds: Optional[int] = None,
+                      backup_count: Optional[int] = None, filename: Optional[str] = None) -> logging.Logger:
+    """
+    Configure `name` to log through a queue to a rotating JSON Lines file (`filename`, default
+    ollama_query.jsonl) and return it.
+    Limits default to the BBAI_LOG_MAX_BYTES / BBAI_LOG_ROTATE_SECONDS / BBAI_LOG_BACKUPS env vars.
+    Calling it again for the same logger is a no-op.
+    """
+    logger = logging.getLogger(name)
+    if getattr(logger, "_bbai_listener", None) is not None:
+        return logger
+
+    os.makedirs(log_folder, exist_ok=True)
+    file_handler = SizeAndTimeRotatingFileHandler(
+        os.path.join(log_folder, filename or LOG_FILENAME),
+        max_bytes=max_bytes if max_bytes is not None else int(os.getenv("BBAI_LOG_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        backup_count=backup_count if backup_count is not None else int(os.getenv("BBAI_LOG_BACKUPS", DEFAULT_BACKUP_COUNT)),
+        interval=rotate_seconds if rotate_seconds is not None else int(os.getenv("BBAI_LOG_ROTATE_SECONDS", DEFAULT_ROTATE_SECONDS)),
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Flush whatever is still queued on shutdown
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger._bbai_listener = listener
+    return logger
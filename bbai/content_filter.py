@@ -0,0 +1,161 @@
+"""
+Word-list content filter compiled into an Aho-Corasick automaton.
+
+The profile "About" check used to rebuild a ~180-entry list on every request and run
+``word in text.lower()`` for each entry, which is O(words x text) and flags innocent words
+that merely contain a term ("thinking" contains "thin", "skill" contains "kill"). Terms now
+live in ``static/json/content_filter.json``, grouped into categories that say which
+*scopes* (profile text, chatbot input...) they apply to. Each scope is compiled once into
+an automaton over *words*: the text is split into words once and scanned in a single pass,
+so only whole-word (and whole-phrase) matches count, a plural "s"/"es" included. The file is
+reloaded automatically when it changes.
+"""
+import json
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from bbai.menu import BASE_DIR
+
+CONTENT_FILTER_PATH = os.path.join(BASE_DIR, "static", "json", "content_filter.json")
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def words(text: str) -> List[str]:
+    """Casefolded words of `text`; punctuation, hyphens and underscores separate words."""
+    return _SEPARATORS.sub(" ", text.casefold()).split()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of any pattern in one pass over a sequence.
+    Patterns and text can be strings (symbols are characters) or tuples of words.
+    """
+
+    def __init__(self, patterns: Iterable[Sequence[Hashable]]):
+        self._goto: List[Dict[Hashable, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Sequence[Hashable]]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: Sequence[Hashable]) -> None:
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pattern)
+
+    def _link(self) -> None:
+        """Breadth-first pass setting failure links and merging outputs along them."""
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: Sequence[Hashable]) -> Iterator[Tuple[int, Sequence[Hashable]]]:
+        """Yield ``(end index, pattern)`` for every match, overlapping ones included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, symbol in enumerate(text):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            if out[state]:
+                for pattern in out[state]:
+                    yield index, pattern
+
+
+class ContentFilter:
+    """Whole-word matcher for a fixed set of terms (single words or phrases)."""
+
+    def __init__(self, terms: Iterable[str]):
+        self._terms: Dict[Tuple[str, ...], str] = {}  # word pattern -> term as listed
+        for term in terms:
+            *head, last = words(term) or [""]
+            if not last:
+                continue
+            for suffix in ("", "s", "es"):
+                self._terms.setdefault((*head, last + suffix), term)
+        self._automaton = AhoCorasick(self._terms)
+
+    def matches(self, text: str) -> List[str]:
+        """The terms found in `text` (each once, in order of appearance)."""
+        found: Dict[str, None] = {}
+        for _, pattern in self._automaton.find(words(text)):
+            found.setdefault(self._terms[pattern])
+        return list(found)
+
+    def first_match(self, text: str) -> Optional[str]:
+        for _, pattern in self._automaton.find(words(text)):
+            return self._terms[pattern]
+        return None
+
+    def is_clean(self, text: str) -> bool:
+        return self.first_match(text) is None
+
+
+class ContentFilters:
+    """Per-scope filters built from the categories file, rebuilt when the file changes."""
+
+    def __init__(self, path: str = CONTENT_FILTER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None
+        self._filters: Dict[str, ContentFilter] = {}
+        self.reloads = 0
+        self.checked: Dict[str, int] = {}
+        self.flagged: Dict[str, int] = {}
+
+    def _load(self) -> None:
+        stat = os.stat(self.path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                categories = json.load(f)["categories"]
+            terms_by_scope: Dict[str, List[str]] = {}
+            for category in categories.values():
+                for scope in category.get("scopes", []):
+                    terms_by_scope.setdefault(scope, []).extend(category.get("terms", []))
+            self._filters = {scope: ContentFilter(terms) for scope, terms in terms_by_scope.items()}
+            self._version = version
+            self.reloads += 1
+
+    def scope(self, name: str) -> ContentFilter:
+        """The filter for `name` (e.g. 'profile' or 'chatbot'); an unknown scope matches nothing."""
+        self._load()
+        return self._filters.get(name) or ContentFilter(())
+
+    def first_match(self, scope: str, text: str) -> Optional[str]:
+        match = self.scope(scope).first_match(text)
+        self.checked[scope] = self.checked.get(scope, 0) + 1
+        if match is not None:
+            self.flagged[scope] = self.flagged.get(scope, 0) + 1
+        return match
+
+    def stats(self) -> Dict[str, object]:
+        return {"reloads": self.reloads, "checked": dict(self.checked), "flagged": dict(self.flagged),
+                "states": {scope: len(f._automaton) for scope, f in self._filters.items()}}
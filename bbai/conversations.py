@@ -0,0 +1,143 @@
+"""
+Server-side chatbot conversations, one per logged-in user.
+
+Each conversation keeps the most recent turns verbatim and folds older ones into a rolling
+summary once a token budget is exceeded, so the history sent with every prompt has a fixed
+upper bound however long the chat runs. Idle conversations are evicted least-recently-used
+first, which caps memory for the whole process.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Optional, Tuple
+
+CHARS_PER_TOKEN = 4  # Rough estimate for English text; good enough for budgeting
+
+DEFAULT_MAX_TURNS = 8
+DEFAULT_HISTORY_TOKENS = 600
+DEFAULT_SUMMARY_TOKENS = 200
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_IDLE_SECONDS = 30 * 60
+
+Turn = Tuple[str, str]  # (user question, assistant answer)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _first_sentence(text: str, limit: int = 120) -> str:
+    text = " ".join(text.split())
+    for end in (". ", "? ", "! ", "\n"):
+        cut = text.find(end)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+def summarize_turn(turn: Turn) -> str:
+    """Default summariser: keep the gist of a turn without another model call."""
+    question, answer = turn
+    return f"User asked: {_first_sentence(question)} Assistant: {_first_sentence(answer)}"
+
+
+class Conversation:
+    """Ring buffer of recent turns plus a rolling summary of everything older."""
+
+    def __init__(self, max_turns: int, history_tokens: int, summary_tokens: int,
+                 summarizer: Callable[[Turn], str] = summarize_turn):
+        self.turns: Deque[Turn] = deque()
+        self.summary = ""
+        self.max_turns = max_turns
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.last_used = time.monotonic()
+
+    def _tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(q) + estimate_tokens(a) for q, a in self.turns)
+
+    def _fold_oldest(self) -> None:
+        """Move the oldest turn into the summary, trimming the summary's oldest text to its budget."""
+        summary = f"{self.summary} {self.summarizer(self.turns.popleft())}".strip()
+        max_chars = self.summary_tokens * CHARS_PER_TOKEN
+        if len(summary) > max_chars:
+            summary = "..." + summary[-max_chars:].split(" ", 1)[-1]
+        self.summary = summary
+
+    def add_turn(self, question: str, answer: str) -> None:
+        # Individual turns are clipped so a single huge answer can't blow the budget on its own
+        max_chars = self.history_tokens * CHARS_PER_TOKEN // 2
+        self.turns.append((question[:max_chars], answer[:max_chars]))
+        while len(self.turns) > self.max_turns or (len(self.turns) > 1 and self._tokens() > self.history_tokens):
+            self._fold_oldest()
+        self.last_used = time.monotonic()
+
+    def render(self) -> str:
+        """History block to place before the new question (empty for a fresh conversation)."""
+        lines = []
+        if self.summary:
+            lines.append(f"Summary of earlier conversation: {self.summary}")
+        for question, answer in self.turns:
+            lines.append(f"User: {question}")
+            lines.append(f"Assistant: {answer}")
+        return "\n".join(lines)
+
+
+class ConversationStore:
+    """Thread-safe LRU of conversations keyed by user, with idle expiry."""
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_seconds: Optional[float] = None,
+                 max_turns: Optional[int] = None, history_tokens: Optional[int] = None,
+                 summary_tokens: Optional[int] = None):
+        env = os.getenv
+        self.max_sessions = max_sessions or int(env("BBAI_CHAT_MAX_SESSIONS", DEFAULT_MAX_SESSIONS))
+        self.idle_seconds = idle_seconds or float(env("BBAI_CHAT_IDLE_SECONDS", DEFAULT_IDLE_SECONDS))
+        self.max_turns = max_turns or int(env("BBAI_CHAT_MAX_TURNS", DEFAULT_MAX_TURNS))
+        self.history_tokens = history_tokens or int(env("BBAI_CHAT_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS))
+        self.summary_tokens = summary_tokens or int(env("BBAI_CHAT_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS))
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self, now: float) -> None:
+        # Oldest entries are at the front, so stop at the first one that is still fresh
+        while self._sessions:
+            key, conversation = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - conversation.last_used < self.idle_seconds:
+                break
+            del self._sessions[key]
+            self.evictions += 1
+
+    def history(self, key: str) -> str:
+        """Rendered history for `key`, or '' if the user has no live conversation."""
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+            conversation = self._sessions.get(key)
+            if conversation is None:
+                return ""
+            self._sessions.move_to_end(key)
+            conversation.last_used = now
+            return conversation.render()
+
+    def add_turn(self, key: str, question: str, answer: str) -> None:
+        with self._lock:
+            conversation = self._sessions.get(key)
+            if conversation is None:
+                conversation = Conversation(self.max_turns, self.history_tokens, self.summary_tokens)
+                self._sessions[key] = conversation
+            else:
+                self._sessions.move_to_end(key)
+            conversation.add_turn(question, answer)
+            self._evict(time.monotonic())
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                    "evictions": self.evictions, "history_token_budget": self.history_tokens}
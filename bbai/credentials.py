@@ -0,0 +1,120 @@
+"""
+In-memory index over ``static/json/credentials.json``.
+
+Login, signup and every ``get_current_user`` call used to re-read and linearly scan the whole
+file. The records are now loaded once per file version (mtime + size) and indexed by email and
+by name and by ID, so lookups are O(1) and the only I/O on the hot path is a stat(). Routes that still
+write the file directly are picked up automatically on the next lookup.
+"""
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from bbai.metrics import read_json, write_json
+
+Record = Dict[str, Any]
+
+
+def new_user_id() -> str:
+    return uuid.uuid4().hex
+
+
+class CredentialStore:
+    """Cached, indexed view of a credentials JSON file (a list of {name, email, password, ...})."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None
+        self._records: List[Record] = []
+        self._by_email: Dict[str, Record] = {}
+        self._by_name: Dict[str, Record] = {}
+        self._by_id: Dict[str, Record] = {}
+        self.reloads = 0
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _index(self, records: List[Record], version: Optional[Tuple[int, int]]) -> None:
+        self._records = records
+        self._by_email = {record.get("email"): record for record in records}
+        self._by_id = {record["id"]: record for record in records if "id" in record}
+        # Names aren't unique; keep the first match like the old linear scan did
+        self._by_name = {}
+        for record in records:
+            self._by_name.setdefault(record.get("name"), record)
+        self._version = version
+
+    def _refresh(self) -> None:
+        version = self._file_version()
+        if version == self._version:
+            return
+        with self._lock:
+            version = self._file_version()
+            if version == self._version:
+                return
+            records: List[Record] = []
+            if version is not None:
+                records = read_json(self.path)
+            self._index(records, version)
+            self.reloads += 1
+
+    # ----------------------------- Reads -------------------------------------
+    def records(self) -> List[Record]:
+        """Copies of every record, safe for the caller to modify and pass back to save()."""
+        self._refresh()
+        return [dict(record) for record in self._records]
+
+    def by_email(self, email: str) -> Optional[Record]:
+        self._refresh()
+        record = self._by_email.get(email)
+        return dict(record) if record is not None else None
+
+    def by_name(self, name: str) -> Optional[Record]:
+        self._refresh()
+        record = self._by_name.get(name)
+        return dict(record) if record is not None else None
+
+    def by_id(self, user_id: str) -> Optional[Record]:
+        self._refresh()
+        record = self._by_id.get(user_id)
+        return dict(record) if record is not None else None
+
+    def email_exists(self, email: str) -> bool:
+        self._refresh()
+        return email in self._by_email
+
+    # ----------------------------- Writes ------------------------------------
+    def save(self, records: List[Record]) -> None:
+        """Write the whole list back (pretty-printed, as before) and re-index it."""
+        with self._lock:
+            write_json(self.path, records)
+            self._index([dict(record) for record in records], self._file_version())
+
+    def ensure_ids(self) -> int:
+        """Give every record without one a stable random ID (sessions refer to users by it)."""
+        records = self.records()
+        missing = [record for record in records if not record.get("id")]
+        for record in missing:
+            record["id"] = new_user_id()
+        if missing:
+            self.save(records)
+        return len(missing)
+
+    def update(self, email: str, **fields: Any) -> bool:
+        """Change fields of one record in place on disk; returns False if the email is unknown."""
+        records = self.records()
+        for record in records:
+            if record.get("email") == email:
+                record.update(fields)
+                self.save(records)
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"records": len(self._records), "reloads": self.reloads}
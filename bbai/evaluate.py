@@ -0,0 +1,205 @@
+"""
+Batch evaluation of the AR logo model: accuracy per class, confusion matrix and CPU throughput.
+
+    python -m bbai.evaluate                                  # wo- and w-Augmentation, float32
+    python -m bbai.evaluate --dataset wo --precision int8 --batch-sizes 1,4,16
+    python -m bbai.evaluate --dataset .bbai-cache/augmented  # any folder of <Label>-samples.zip
+
+The model runs with the server's NumPy runtime (bbai.inference), the same code that answers
+``/api/ar/predict``, so the report covers what is actually served. It replaces the one-off
+PNGs in ``AR-View Model/Metrics`` with data files written next to them:
+
+* ``evaluation.json``: per dataset, accuracy, per-class accuracy (recall) and precision, the
+  confusion matrix, the speed results below and the machine they were measured on;
+* ``confusion-matrix-<dataset>.csv`` (rows are true labels, columns are predictions) and
+  ``accuracy-class-<dataset>.csv``, for plotting.
+
+Accuracy is exact and repeatable. Speed is measured on the first ``--bench-frames`` decoded
+samples: for each batch size, one warm-up batch, then ``--repeat`` passes. It reports
+images/sec and the mean/p50/p95 latency per batch. JPEG decoding is timed separately, so
+runtime changes and image-pipeline changes show up on their own lines.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from bbai.menu import BASE_DIR
+from bbai.model_variants import (DATASET_DIR, DATASETS, PRECISIONS, ModelVariants, archive_samples,
+                                 build_variant, source_digest)
+
+OUT_DIR = os.path.join(BASE_DIR, "AR-View Model", "Metrics")
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+
+
+def datasets(spec: str) -> Dict[str, str]:
+    """Dataset name -> folder: wo, w, all, or a path to a folder of samples archives."""
+    if spec in DATASETS:
+        return {folder.split("-")[0]: os.path.join(DATASET_DIR, folder) for folder in DATASETS[spec]}
+    return {os.path.basename(os.path.normpath(spec)): spec}
+
+
+def batches(samples: Iterator[Tuple[str, bytes]], size: int) -> Iterator[List[Tuple[str, bytes]]]:
+    batch: List[Tuple[str, bytes]] = []
+    for sample in samples:
+        batch.append(sample)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_model(precision: str):
+    """NumpyModel + labels for `precision` (variants are built if missing)."""
+    from bbai.inference import NumpyModel, load_weights
+
+    variants = ModelVariants()
+    directory = variants.directory(precision)
+    if not os.path.exists(os.path.join(directory, "model.json")):
+        build_variant(precision, out_dir=variants.out_dir)
+    with open(os.path.join(directory, "model.json"), "r") as f:
+        model_json = json.load(f)
+    with open(os.path.join(variants.directory("float32"), "metadata.json"), "r") as f:
+        labels = json.load(f)["labels"]
+    return NumpyModel(model_json["modelTopology"], load_weights(directory, model_json["weightsManifest"])), labels
+
+
+# ----------------------------- Accuracy -------------------------------------------
+def evaluate_accuracy(model, labels: List[str], folder: str, batch_size: int,
+                      keep: int = 0) -> Tuple[Dict[str, Any], List[Any]]:
+    """Confusion matrix and per-class scores over every sample in `folder`, plus the first `keep` decoded frames."""
+    from bbai.inference import prepare_frame
+
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    kept: List[Any] = []
+    decode_seconds = 0.0
+    for batch in batches(archive_samples(folder), batch_size):
+        start = time.perf_counter()
+        frames = np.stack([prepare_frame(data) for _, data in batch])
+        decode_seconds += time.perf_counter() - start
+        predicted = model.predict(frames).argmax(axis=1)
+        for (label, _), guess in zip(batch, predicted):
+            confusion[labels.index(label), guess] += 1
+        if keep > 0:
+            kept.append(frames[:keep])
+            keep -= len(kept[-1])
+
+    total = int(confusion.sum())
+    correct = np.diag(confusion)
+    per_class = {}
+    for index, label in enumerate(labels):
+        samples, predicted_as = int(confusion[index].sum()), int(confusion[:, index].sum())
+        per_class[label] = {
+            "samples": samples,
+            "correct": int(correct[index]),
+            "accuracy": round(int(correct[index]) / samples, 4) if samples else None,
+            "precision": round(int(correct[index]) / predicted_as, 4) if predicted_as else None,
+        }
+    result = {
+        "samples": total,
+        "accuracy": round(int(correct.sum()) / total, 4) if total else None,
+        "per_class": per_class,
+        "confusion_matrix": confusion.tolist(),
+        "decode_images_per_sec": round(total / decode_seconds, 1) if decode_seconds else None,
+    }
+    return result, kept
+
+
+# ----------------------------- Speed ----------------------------------------------
+def benchmark(model, frames, batch_sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    """Images/sec and per-batch latency of model.predict() for each batch size."""
+    rows = []
+    for size in batch_sizes:
+        chunks = [frames[i:i + size] for i in range(0, len(frames) - size + 1, size)] or [frames[:size]]
+        model.predict(chunks[0])  # Warm-up: allocator and BLAS thread start-up
+        latencies = []
+        for _ in range(repeat):
+            for chunk in chunks:
+                start = time.perf_counter()
+                model.predict(chunk)
+                latencies.append(time.perf_counter() - start)
+        latencies_ms = np.array(latencies) * 1000
+        images = sum(len(chunk) for chunk in chunks) * repeat
+        rows.append({
+            "batch_size": size,
+            "batches": len(latencies),
+            "images_per_sec": round(images / (latencies_ms.sum() / 1000), 1),
+            "latency_ms_mean": round(float(latencies_ms.mean()), 2),
+            "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "latency_ms_p95": round(float(np.percentile(latencies_ms, 95)), 2),
+        })
+    return rows
+
+
+def environment() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "processor": platform.processor() or None, "cpu_count": os.cpu_count()}
+
+
+def write_csvs(out_dir: str, name: str, labels: List[str], result: Dict[str, Any]) -> None:
+    with open(os.path.join(out_dir, f"confusion-matrix-{name}.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["true \\ predicted"] + labels)
+        for label, row in zip(labels, result["confusion_matrix"]):
+            writer.writerow([label] + row)
+    with open(os.path.join(out_dir, f"accuracy-class-{name}.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["label", "samples", "correct", "accuracy", "precision"])
+        for label, row in result["per_class"].items():
+            writer.writerow([label, row["samples"], row["correct"], row["accuracy"], row["precision"]])
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the AR logo model: per-class accuracy, confusion matrix, CPU speed.")
+    parser.add_argument("--dataset", default="all",
+                        help="wo, w, all (default) or a folder of <Label>-samples.zip archives")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)),
+                        help="Comma-separated batch sizes to time (default 1,8,32)")
+    parser.add_argument("--bench-frames", type=int, default=128, help="Decoded frames used for timing")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the frames per batch size")
+    parser.add_argument("--out", default=OUT_DIR, help="Folder for evaluation.json and the CSVs")
+    args = parser.parse_args(argv)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+
+    start = time.perf_counter()
+    model, labels = load_model(args.precision)
+    load_ms = (time.perf_counter() - start) * 1000
+    os.makedirs(args.out, exist_ok=True)
+
+    report: Dict[str, Any] = {"precision": args.precision, "source_digest": source_digest(),
+                              "load_ms": round(load_ms, 1), "labels": labels, "datasets": {}}
+    bench_frames: List[Any] = []
+    for name, folder in datasets(args.dataset).items():
+        result, frames = evaluate_accuracy(model, labels, folder, max(batch_sizes),
+                                           args.bench_frames - sum(len(chunk) for chunk in bench_frames))
+        report["datasets"][name] = result
+        write_csvs(args.out, name, labels, result)
+        bench_frames.extend(frames)
+        print(f"{name}: {result['samples']} samples, accuracy {result['accuracy']:.2%}, "
+              f"decode {result['decode_images_per_sec']} images/s")
+        for label, row in result["per_class"].items():
+            if row["accuracy"] is not None and row["accuracy"] < 1:
+                print(f"  {label}: {row['correct']}/{row['samples']}")
+
+    frames = np.concatenate(bench_frames)[:args.bench_frames]
+    report["speed"] = {"frames": len(frames), "repeat": args.repeat, "environment": environment(),
+                       "batches": benchmark(model, frames, batch_sizes, args.repeat)}
+    with open(os.path.join(args.out, "evaluation.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'batch':>5} {'images/s':>9} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    for row in report["speed"]["batches"]:
+        print(f"{row['batch_size']:>5} {row['images_per_sec']:>9.1f} {row['latency_ms_mean']:>8.2f} "
+              f"{row['latency_ms_p50']:>7.2f} {row['latency_ms_p95']:>7.2f}")
+    print(f"Wrote {os.path.join(args.out, 'evaluation.json')}")
+
+
+if __name__ == "__main__":
+    main()
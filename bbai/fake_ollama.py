@@ -0,0 +1,172 @@
+"""
+Fake Ollama server for offline benchmarking.
+
+Implements the parts of the Ollama HTTP API the app uses (``POST /api/generate``, streaming and
+non-streaming, plus ``GET /api/tags``) with configurable prompt-evaluation time, per-token
+latency and a cap on concurrently generating requests, so queueing and streaming behaviour can
+be measured without a model.
+
+    python -m bbai.fake_ollama --port 11434 --token-latency 0.02 --tokens 64 --parallel 1
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+WORDS = ("Here", "are", "some", "healthy", "options", "from", "the", "Campus", "Hub", "menu")
+
+
+class FakeOllamaConfig:
+    """Timing knobs for the fake model."""
+
+    def __init__(self, token_latency: float = 0.02, tokens: int = 64, prompt_eval_ms_per_kchar: float = 5.0,
+                 parallel: int = 1, model: str = "orca-mini:latest"):
+        self.token_latency = token_latency            # Seconds between streamed tokens (1 / tokens-per-second)
+        self.tokens = tokens                          # Tokens generated per response
+        self.prompt_eval_ms_per_kchar = prompt_eval_ms_per_kchar  # Simulated prompt evaluation cost
+        self.parallel = parallel                      # Like OLLAMA_NUM_PARALLEL; extra requests wait their turn
+        self.model = model
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeOllamaServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # Keep benchmark output readable
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.server.config.model}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        prompt = payload.get("prompt", "")
+        stream = payload.get("stream", True)
+
+        with self.server.slots:  # Only `parallel` requests generate at once
+            start = time.perf_counter()
+            prompt_eval = self.server.prompt_eval_seconds(prompt, payload.get("system", ""))
+            time.sleep(prompt_eval)
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in self.server.tokens():
+                    time.sleep(self.server.config.token_latency)
+                    self._write_chunk({"model": self.server.config.model, "created_at": _now(),
+                                       "response": token, "done": False})
+                self._write_chunk(self.server.final_chunk(prompt, start, prompt_eval))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                tokens = list(self.server.tokens())
+                time.sleep(self.server.config.token_latency * len(tokens))
+                body = self.server.final_chunk(prompt, start, prompt_eval)
+                body["response"] = "".join(tokens)
+                self._send_json(200, body)
+
+    def _write_chunk(self, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fake model's configuration."""
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: Optional[FakeOllamaConfig] = None):
+        super().__init__(address, _Handler)
+        self.config = config or FakeOllamaConfig()
+        self.slots = threading.BoundedSemaphore(max(1, self.config.parallel))
+        self._cached_system = ""  # Last system prompt evaluated, standing in for Ollama's prompt cache
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def prompt_eval_seconds(self, prompt: str, system: str = "") -> float:
+        """A repeated system prompt is a cache hit, so only the new prompt text costs anything."""
+        chars = len(prompt)
+        if system and system != self._cached_system:
+            chars += len(system)
+            self._cached_system = system
+        return chars / 1000 * self.config.prompt_eval_ms_per_kchar / 1000
+
+    def tokens(self):
+        for i in range(self.config.tokens):
+            yield WORDS[i % len(WORDS)] + " "
+
+    def final_chunk(self, prompt: str, start: float, prompt_eval: float) -> dict:
+        total_ns = int((time.perf_counter() - start) * 1e9)
+        return {
+            "model": self.config.model, "created_at": _now(), "response": "", "done": True,
+            "context": [1, 2, 3],
+            "total_duration": total_ns,
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": self.config.tokens,
+            "eval_duration": int(self.config.tokens * self.config.token_latency * 1e9),
+        }
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        thread.start()
+        return thread
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--token-latency", type=float, default=0.02, help="seconds between tokens (default 0.02)")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per response (default 64)")
+    parser.add_argument("--prompt-eval-ms-per-kchar", type=float, default=5.0,
+                        help="simulated prompt evaluation cost per 1000 prompt characters (default 5)")
+    parser.add_argument("--parallel", type=int, default=1, help="requests generated concurrently (default 1)")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOllamaConfig:
+    return FakeOllamaConfig(token_latency=args.token_latency, tokens=args.tokens,
+                            prompt_eval_ms_per_kchar=args.prompt_eval_ms_per_kchar, parallel=args.parallel)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), config_from_args(args))
+    print(f"Fake Ollama listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
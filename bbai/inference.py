@@ -0,0 +1,423 @@
+"""
+Server-side inference for the AR view's restaurant-logo model.
+
+The AR page normally runs ``static/tm-ByteBite-model`` in the browser with TF.js, which is
+slow on low-end phones. This module loads the same model.json/weights.bin into NumPy. The
+model is a Teachable Machine MobileNetV2 feature extractor followed by a small dense head.
+Batch normalisation is folded into the preceding convolutions at load time, so a forward
+pass is mostly BLAS matrix multiplies.
+
+``/api/ar/predict`` decodes each frame on the request thread, then hands it to a
+``MicroBatcher``, which runs the model on one thread. By default it runs each frame on its
+own: on the CPU this model is fastest at batch 1 (see ``AR-View Model/Metrics/evaluation.json``:
+75.8 images/s at batch 1, 71.6 at 8, 51.4 at 32). Batching is opt-in. Set
+``BBAI_AR_MAX_BATCH`` and ``BBAI_AR_BATCH_WAIT_MS`` to collect frames that arrive within a
+few milliseconds of each other into one batch, for hardware where that pays off. Preprocessing matches ``@teachablemachine/image``: centre square crop, 224x224,
+pixels scaled to [-1, 1].
+"""
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bbai.menu import BASE_DIR
+from bbai.metrics import REGISTRY
+
+MODEL_DIR = os.path.join(BASE_DIR, "static", "tm-ByteBite-model")
+DEFAULT_MAX_BATCH = 1  # Batching is slower on the CPU for this model; see evaluation.json
+DEFAULT_BATCH_WAIT_MS = 0
+MAX_FRAME_PIXELS = 40_000_000  # Refuse decompression bombs before decoding, like profile pictures
+
+BATCH_SIZE = REGISTRY.histogram("bbai_ar_batch_size", "Frames per AR inference batch.", (),
+                                (1, 2, 3, 4, 6, 8, 12, 16, 32))
+BATCH_LATENCY = REGISTRY.histogram("bbai_ar_batch_duration_seconds", "Forward-pass time per AR inference batch.")
+
+
+class ModelError(RuntimeError):
+    """The model files use a layer or weight format this runtime doesn't implement."""
+
+
+class FrameRejected(ValueError):
+    """A frame that is not an image Pillow can decode, or has too many pixels."""
+
+
+# ----------------------------- Weights ------------------------------------------
+QUANTIZED_DTYPES = {"float16": "<f2", "uint8": "u1", "uint16": "<u2"}
+
+
+def load_weights(model_dir: str, manifest: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Read every weight group named in a TF.js weights manifest into float32 arrays, decoding
+    quantized entries (float16, or uint8/uint16 with ``value = q * scale + min``) like TF.js does.
+    """
+    weights = {}
+    for group in manifest:
+        data = b"".join(_read(os.path.join(model_dir, path.split("?")[0])) for path in group["paths"])
+        offset = 0
+        for spec in group["weights"]:
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            if spec["dtype"] != "float32":
+                raise ModelError(f"Unsupported weight dtype {spec['dtype']} for {spec['name']}")
+            quantization = spec.get("quantization")
+            stored = QUANTIZED_DTYPES.get(quantization["dtype"]) if quantization else "<f4"
+            if stored is None:
+                raise ModelError(f"Unsupported quantization {quantization['dtype']} for {spec['name']}")
+            raw = np.frombuffer(data, stored, count, offset)
+            offset += raw.nbytes
+            value = raw.astype(np.float32)
+            if quantization and "scale" in quantization:
+                value = value * np.float32(quantization["scale"]) + np.float32(quantization["min"])
+            weights[spec["name"]] = value.reshape(spec["shape"])
+    return weights
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ----------------------------- Graph --------------------------------------------
+class _Layer:
+    __slots__ = ("name", "kind", "config", "inputs", "params")
+
+    def __init__(self, name: str, kind: str, config: Dict[str, Any], inputs: List[str]):
+        self.name = name
+        self.kind = kind
+        self.config = config
+        self.inputs = inputs
+        self.params: Dict[str, Any] = {}
+
+
+def _flatten(topology: Dict[str, Any], previous: Optional[str], layers: List[_Layer]) -> Optional[str]:
+    """
+    Append the layers of a (possibly nested) Sequential or functional Model in execution order;
+    returns the name of the layer producing its output.
+    """
+    config = topology["config"]
+    entries = config["layers"] if isinstance(config, dict) else config
+    functional = topology["class_name"] in ("Model", "Functional")
+    for entry in entries:
+        kind, layer_config = entry["class_name"], entry["config"]
+        if kind in ("Sequential", "Model", "Functional"):
+            previous = _flatten(entry, previous, layers)
+            continue
+        name = layer_config["name"]
+        if kind == "InputLayer":
+            layers.append(_Layer(name, "Identity", layer_config, [previous] if previous else []))
+            previous = name
+            continue
+        if functional:
+            inputs = [node[0] for node in entry["inbound_nodes"][0]]
+        else:
+            inputs = [previous] if previous else []
+        layers.append(_Layer(name, kind, layer_config, inputs))
+        previous = name
+    if functional:
+        return config["output_layers"][0][0]
+    return previous
+
+
+class NumpyModel:
+    """A Keras/TF.js layers model evaluated with NumPy (the layer types MobileNet + a dense head use)."""
+
+    SUPPORTED = {"Identity", "ZeroPadding2D", "Conv2D", "DepthwiseConv2D", "BatchNormalization", "ReLU",
+                 "Activation", "Add", "GlobalAveragePooling2D", "Flatten", "Dense", "Dropout"}
+
+    def __init__(self, topology: Dict[str, Any], weights: Dict[str, Any]):
+        layers: List[_Layer] = []
+        self.output = _flatten(topology, None, layers)
+        unsupported = {layer.kind for layer in layers} - self.SUPPORTED
+        if unsupported:
+            raise ModelError(f"Unsupported layers: {', '.join(sorted(unsupported))}")
+        self.input_name = layers[0].name
+        self.input_shape = tuple(layers[0].config.get("batch_input_shape", [None, 224, 224, 3])[1:])
+        for layer in layers:
+            self._bind(layer, weights)
+        self.layers = self._fold_batch_norm(layers)
+        # Drop each activation after its last reader so a batch only holds a few live tensors
+        last_read: Dict[str, int] = {}
+        for index, layer in enumerate(self.layers):
+            for name in layer.inputs:
+                last_read[name] = index
+        self._release = [[name for name in layer.inputs if last_read[name] == index and name != self.output]
+                         for index, layer in enumerate(self.layers)]
+
+    @staticmethod
+    def _bind(layer: _Layer, weights: Dict[str, Any]) -> None:
+        def get(suffix: str):
+            value = weights.get(f"{layer.name}/{suffix}")
+            return None if value is None else np.asarray(value, dtype=np.float32)
+
+        if layer.kind in ("Conv2D", "Dense"):
+            layer.params = {"kernel": get("kernel"), "bias": get("bias")}
+        elif layer.kind == "DepthwiseConv2D":
+            layer.params = {"kernel": get("depthwise_kernel"), "bias": get("bias")}
+        elif layer.kind == "BatchNormalization":
+            eps = layer.config.get("epsilon", 1e-3)
+            mean, variance = get("moving_mean"), get("moving_variance")
+            gamma = get("gamma") if layer.config.get("scale", True) else np.ones_like(mean)
+            beta = get("beta") if layer.config.get("center", True) else np.zeros_like(mean)
+            scale = gamma / np.sqrt(variance + eps)
+            layer.params = {"scale": scale, "shift": beta - mean * scale}
+
+    @staticmethod
+    def _fold_batch_norm(layers: List[_Layer]) -> List[_Layer]:
+        """Merge each BatchNormalization into the convolution feeding it (when nothing else reads it)."""
+        by_name = {layer.name: layer for layer in layers}
+        readers: Dict[str, int] = {}
+        for layer in layers:
+            for name in layer.inputs:
+                readers[name] = readers.get(name, 0) + 1
+        renamed: Dict[str, str] = {}
+        kept = []
+        for layer in layers:
+            layer.inputs = [renamed.get(name, name) for name in layer.inputs]
+            source = by_name.get(layer.inputs[0]) if layer.kind == "BatchNormalization" and layer.inputs else None
+            if source is not None and source.kind in ("Conv2D", "DepthwiseConv2D") and readers[source.name] == 1:
+                scale, shift = layer.params["scale"], layer.params["shift"]
+                kernel = source.params["kernel"]
+                if source.kind == "Conv2D":
+                    kernel = kernel * scale  # (kh, kw, in, out): scale output channels
+                else:
+                    kernel = kernel * scale.reshape(1, 1, -1, 1)  # (kh, kw, channels, 1)
+                bias = source.params["bias"]
+                source.params = {"kernel": np.ascontiguousarray(kernel, dtype=np.float32),
+                                 "bias": (shift if bias is None else bias * scale + shift).astype(np.float32)}
+                renamed[layer.name] = source.name
+                continue
+            kept.append(layer)
+        return kept
+
+    # ----------------------------- Ops -------------------------------------
+    @staticmethod
+    def _same_padding(size: int, kernel: int, stride: int) -> Tuple[int, int]:
+        out = -(-size // stride)
+        total = max((out - 1) * stride + kernel - size, 0)
+        return total // 2, total - total // 2
+
+    def _pad_for(self, x, config: Dict[str, Any], kernel: Tuple[int, int]):
+        if config.get("padding", "valid") != "same":
+            return x
+        stride = config.get("strides", [1, 1])
+        top, bottom = self._same_padding(x.shape[1], kernel[0], stride[0])
+        left, right = self._same_padding(x.shape[2], kernel[1], stride[1])
+        if top or bottom or left or right:
+            x = np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+        return x
+
+    def _conv2d(self, x, layer: _Layer):
+        kernel, bias = layer.params["kernel"], layer.params["bias"]
+        kh, kw, cin, cout = kernel.shape
+        sh, sw = layer.config.get("strides", [1, 1])
+        x = self._pad_for(x, layer.config, (kh, kw))
+        n, h, w, _ = x.shape
+        oh, ow = (h - kh) // sh + 1, (w - kw) // sw + 1
+        if kh == kw == 1:
+            patches = x[:, ::sh, ::sw, :][:, :oh, :ow, :]
+            out = patches.reshape(-1, cin) @ kernel.reshape(cin, cout)
+        else:
+            windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))[:, ::sh, ::sw]
+            # windows: (n, oh, ow, cin, kh, kw) -> rows of kh*kw*cin in kernel order
+            patches = windows[:, :oh, :ow].transpose(0, 1, 2, 4, 5, 3).reshape(-1, kh * kw * cin)
+            out = patches @ kernel.reshape(kh * kw * cin, cout)
+        out = out.reshape(n, oh, ow, cout)
+        if bias is not None:
+            out += bias
+        return out
+
+    def _depthwise(self, x, layer: _Layer):
+        kernel, bias = layer.params["kernel"], layer.params["bias"]
+        kh, kw = kernel.shape[:2]
+        sh, sw = layer.config.get("strides", [1, 1])
+        x = self._pad_for(x, layer.config, (kh, kw))
+        n, h, w, c = x.shape
+        oh, ow = (h - kh) // sh + 1, (w - kw) // sw + 1
+        out = np.zeros((n, oh, ow, c), dtype=np.float32)
+        for i in range(kh):
+            for j in range(kw):
+                out += x[:, i:i + (oh - 1) * sh + 1:sh, j:j + (ow - 1) * sw + 1:sw, :] * kernel[i, j, :, 0]
+        if bias is not None:
+            out += bias
+        return out
+
+    @staticmethod
+    def _activation(x, name: Optional[str]):
+        if name in (None, "linear"):
+            return x
+        if name == "relu":
+            return np.maximum(x, 0, out=x)
+        if name == "relu6":
+            return np.clip(x, 0, 6, out=x)
+        if name == "softmax":
+            e = np.exp(x - x.max(axis=-1, keepdims=True))
+            return e / e.sum(axis=-1, keepdims=True)
+        raise ModelError(f"Unsupported activation {name}")
+
+    def predict(self, batch):
+        """`batch`: float32 array (n, 224, 224, 3) scaled to [-1, 1]; returns (n, classes) probabilities."""
+        values = {self.input_name: np.asarray(batch, dtype=np.float32)}
+        for layer, release in zip(self.layers, self._release):
+            x = values[layer.inputs[0]] if layer.inputs else values[self.input_name]
+            kind, config = layer.kind, layer.config
+            if kind in ("Identity", "Dropout"):
+                y = x
+            elif kind == "ZeroPadding2D":
+                (top, bottom), (left, right) = config["padding"]
+                y = np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+            elif kind == "Conv2D":
+                y = self._activation(self._conv2d(x, layer), config.get("activation"))
+            elif kind == "DepthwiseConv2D":
+                y = self._activation(self._depthwise(x, layer), config.get("activation"))
+            elif kind == "BatchNormalization":
+                y = x * layer.params["scale"] + layer.params["shift"]
+            elif kind == "ReLU":
+                y = np.maximum(x, 0) if config.get("max_value") is None else np.clip(x, 0, config["max_value"])
+            elif kind == "Activation":
+                y = self._activation(x.copy(), config.get("activation"))
+            elif kind == "Add":
+                y = values[layer.inputs[0]] + values[layer.inputs[1]]
+            elif kind == "GlobalAveragePooling2D":
+                y = x.mean(axis=(1, 2))
+            elif kind == "Flatten":
+                y = x.reshape(x.shape[0], -1)
+            else:  # Dense
+                y = x @ layer.params["kernel"]
+                if layer.params["bias"] is not None:
+                    y = y + layer.params["bias"]
+                y = self._activation(y, config.get("activation"))
+            values[layer.name] = y
+            for name in release:
+                del values[name]
+        return values[self.output]
+
+
+# ----------------------------- Frames -------------------------------------------
+def prepare_frame(data: bytes, size: int = 224):
+    """Decode an image like the TF.js client sees a frame: centre square crop, resize, scale to [-1, 1]."""
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_FRAME_PIXELS:
+            raise FrameRejected("Frame is too large")
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except FrameRejected:
+        raise
+    except Exception as e:  # OSError, Image.DecompressionBombError, ValueError...
+        raise FrameRejected("Not a supported image") from e
+    side = min(image.size)
+    left, top = (image.width - side) // 2, (image.height - side) // 2
+    image = image.resize((size, size), Image.BILINEAR, box=(left, top, left + side, top + side))
+    return np.asarray(image, dtype=np.float32) / 127.0 - 1.0  # Same scaling as @teachablemachine/image
+
+
+# ----------------------------- Batching -----------------------------------------
+class MicroBatcher:
+    """Single inference thread that groups frames submitted within a short window into one batch."""
+
+    def __init__(self, model: NumpyModel, max_batch: Optional[int] = None, wait_ms: Optional[float] = None):
+        self.model = model
+        self.max_batch = max_batch or int(os.getenv("BBAI_AR_MAX_BATCH", DEFAULT_MAX_BATCH))
+        self.wait = (wait_ms if wait_ms is not None else float(os.getenv("BBAI_AR_BATCH_WAIT_MS", DEFAULT_BATCH_WAIT_MS))) / 1000
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+
+    def _ensure_thread(self) -> None:
+        # Started on first use, so a preforking server's workers each get their own thread
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="bbai-ar-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, frame) -> Future:
+        future: Future = Future()
+        self._ensure_thread()
+        self._queue.put((frame, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    pending.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            try:
+                probabilities = self.model.predict(np.stack([frame for frame, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            BATCH_LATENCY.observe(time.perf_counter() - start)
+            BATCH_SIZE.observe(len(pending))
+            self.batches += 1
+            self.frames += len(pending)
+            for row, (_, future) in zip(probabilities, pending):
+                future.set_result(row)
+
+
+class LogoRecognizer:
+    """The AR model plus its labels, loaded once (call load() before forking to share it)."""
+
+    def __init__(self, model_dir: str = MODEL_DIR):
+        self.model_dir = model_dir
+        self.labels: List[str] = []
+        self.image_size = 224
+        self._batcher: Optional[MicroBatcher] = None
+        self._lock = threading.Lock()
+        self.load_ms = 0.0
+
+    def load(self) -> "LogoRecognizer":
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    start = time.perf_counter()
+                    with open(os.path.join(self.model_dir, "model.json"), "r") as f:
+                        model_json = json.load(f)
+                    with open(os.path.join(self.model_dir, "metadata.json"), "r") as f:
+                        metadata = json.load(f)
+                    weights = load_weights(self.model_dir, model_json["weightsManifest"])
+                    model = NumpyModel(model_json["modelTopology"], weights)
+                    self.labels = metadata["labels"]
+                    self.image_size = metadata.get("imageSize", model.input_shape[0])
+                    self._batcher = MicroBatcher(model)
+                    self.load_ms = (time.perf_counter() - start) * 1000
+        return self
+
+    def prepare(self, data: bytes):
+        """Decode one frame into the model's input array."""
+        self.load()
+        return prepare_frame(data, self.image_size)
+
+    def classify(self, arrays: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Probability vectors (label order) for frames already passed through prepare()."""
+        self.load()
+        futures = [self._batcher.submit(array) for array in arrays]
+        return [future.result(timeout) for future in futures]
+
+    def predict(self, frames: List[bytes], timeout: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """Per frame, ``[{"className", "probability"}, ...]`` in label order (the shape TF.js returns)."""
+        probabilities = self.classify([self.prepare(data) for data in frames], timeout)
+        return [[{"className": label, "probability": float(p)} for label, p in zip(self.labels, row)]
+                for row in probabilities]
+
+    def stats(self) -> Dict[str, Any]:
+        batcher = self._batcher
+        return {"loaded": batcher is not None, "load_ms": round(self.load_ms, 1),
+                "batches": batcher.batches if batcher else 0, "frames": batcher.frames if batcher else 0,
+                "max_batch": batcher.max_batch if batcher else None}
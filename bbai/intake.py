@@ -0,0 +1,120 @@
+"""
+Per-user, per-day nutrition intake, kept up to date as orders come in.
+
+orders.json stores only the dish name, restaurant and price of each order. Finding a user's
+daily kilojoules used to mean joining every order against menu.csv by name. ``IntakeView``
+does that join once, through the menu's normalised (restaurant, dish) index, so
+``"Double Steakhouse "`` still finds ``Double Steakhouse``. The result is a materialised
+view: user -> day -> totals.
+
+``/update_orders`` adds each new order to the view without re-reading the file. The view is
+rebuilt from scratch only when orders.json or menu.csv changed some other way (a rename
+rewriting ``userName``, another worker's order, an edited menu). That is detected with the
+same mtime + size versioning as the other JSON caches.
+"""
+import os
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bbai.menu import MenuTable, load_menu
+from bbai.metrics import read_json
+
+ORDER_DATE_FORMAT = "%d/%m/%Y"  # How /update_orders writes "Date"
+
+Version = Optional[Tuple[int, int]]
+
+
+def file_version(path: str) -> Version:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _new_day() -> Dict[str, Any]:
+    return {"kilojoules": 0.0, "orders": 0, "unmatched": 0, "spent": 0.0}
+
+
+class IntakeView:
+    """user name -> {day: {kilojoules, orders, unmatched, spent}}, joined against the menu."""
+
+    def __init__(self, orders_path: str, menu_loader: Callable[[], MenuTable] = load_menu):
+        self.orders_path = orders_path
+        self.menu_loader = menu_loader
+        self._lock = threading.Lock()
+        self._days: Dict[str, Dict[date, Dict[str, Any]]] = {}
+        self._version: Version = None
+        self._menu_version: Version = None
+        self.rebuilds = 0
+        self.incremental = 0
+
+    def _add(self, order: Dict[str, Any], menu: MenuTable) -> None:
+        try:
+            day = datetime.strptime(str(order.get("Date", "")), ORDER_DATE_FORMAT).date()
+        except ValueError:
+            return
+        user = order.get("userName") or ""
+        totals = self._days.setdefault(user, {}).setdefault(day, _new_day())
+        totals["orders"] += 1
+        try:
+            totals["spent"] += float(order.get("Price") or 0)
+        except (TypeError, ValueError):
+            pass
+        item = menu.order_item(order.get("Restaurant") or "", order.get("Name of dish") or "")
+        if item is None or item.kilojoules is None:
+            totals["unmatched"] += 1
+        else:
+            totals["kilojoules"] += item.kilojoules
+
+    def _refresh(self) -> None:
+        """Rebuild the whole view if orders.json or the menu changed since it was built (lock held)."""
+        menu = self.menu_loader()
+        version = file_version(self.orders_path)
+        if version == self._version and menu.version == self._menu_version:
+            return
+        self._days = {}
+        for order in (read_json(self.orders_path, "orders") if version is not None else []):
+            self._add(order, menu)
+        self._version, self._menu_version = version, menu.version
+        self.rebuilds += 1
+
+    def record(self, order: Dict[str, Any], previous_version: Version, version: Version) -> None:
+        """
+        Fold in an order that was just appended to orders.json. `previous_version` and `version`
+        are file_version() from just before and just after that write, taken by the caller while
+        holding the orders.json write lock. If the view was current before the write, one order is
+        all that changed; otherwise the next read rebuilds it. The file is not re-read here: by now
+        it may already hold another request's write.
+        """
+        with self._lock:
+            menu = self.menu_loader()
+            if previous_version is None or previous_version != self._version or menu.version != self._menu_version:
+                return
+            self._add(order, menu)
+            self._version = version
+            self.incremental += 1
+
+    def days(self, user: str, start: Optional[date] = None) -> List[Tuple[date, Dict[str, Any]]]:
+        """The user's days in date order (from `start` on), each with a copy of its totals."""
+        with self._lock:
+            self._refresh()
+            days = self._days.get(user, {})
+            return [(day, dict(totals)) for day, totals in sorted(days.items()) if start is None or day >= start]
+
+    def chart(self, user: str, start: Optional[date] = None) -> Dict[str, List[Any]]:
+        """Parallel lists shaped like /get-weight-data's chart data (dates as d-m-yyyy)."""
+        days = self.days(user, start)
+        return {
+            "date_data": [f"{day.day}-{day.month}-{day.year}" for day, _ in days],
+            "kilojoule_data": [round(totals["kilojoules"], 1) for _, totals in days],
+            "order_data": [totals["orders"] for _, totals in days],
+            "unmatched_data": [totals["unmatched"] for _, totals in days],
+            "spent_data": [round(totals["spent"], 2) for _, totals in days],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._days), "days": sum(len(days) for days in self._days.values()),
+                    "rebuilds": self.rebuilds, "incremental": self.incremental}
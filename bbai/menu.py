@@ -0,0 +1,217 @@
+"""
+Preparsed, in-memory copy of ``static/menu.csv``.
+
+The CSV is parsed once per file version (mtime + size) into typed ``MenuItem`` rows so
+routes can answer lookups without re-reading or re-parsing the file on every request.
+"""
+import csv
+import io
+import os
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MENU_CSV_PATH = os.path.join(BASE_DIR, "static", "menu.csv")
+HEALTHIEST_PER_TYPE = 3  # Lowest-KJ dishes listed per Type in a restaurant summary
+
+# Spoken / written names for every outlet, keyed by the label used in menu.csv and metadata.json
+RESTAURANT_ALIASES: Dict[str, List[str]] = {
+    "Amami": ["amami"],
+    "Boost": ["boost", "boost juice"],
+    "BurgerKing": ["burger king", "burgerking", "bk"],
+    "CafeCuba": ["cafe cuba", "cafecuba", "café cuba"],
+    "Joli": ["joli", "j oli", "j'oli"],
+    "Ottoman": ["ottoman", "ottoman posh turkish", "posh turkish"],
+    "PizzaHut": ["pizza hut", "pizzahut"],
+    "Starbucks": ["starbucks"],
+}
+
+
+class MenuItem(NamedTuple):
+    """A single row of menu.csv with its values already converted."""
+    name: str
+    restaurant: str
+    type: str
+    price: Optional[float]
+    kilojoules: Optional[float]
+    serving_size: Optional[float]
+    vegetarian: bool
+    gluten: bool
+    nuts: bool
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and collapse everything that isn't a letter or digit into single spaces."""
+    return " ".join(re.sub(r"[^0-9a-zé]+", " ", text.lower().replace("'", "")).split())
+
+
+def _to_float(value: str) -> Optional[float]:
+    """Parse values such as '€1.85', '"1,050.00"' or '8.95', returning None if empty/invalid."""
+    cleaned = re.sub(r"[^0-9.\-]", "", value or "")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _to_flag(value: str) -> bool:
+    return (value or "").strip().lower() == "yes"
+
+
+def _price_range(items: List[MenuItem]) -> Optional[Dict[str, float]]:
+    prices = [item.price for item in items if item.price is not None]
+    if not prices:
+        return None
+    return {"min": min(prices), "max": max(prices), "mean": round(sum(prices) / len(prices), 2)}
+
+
+def restaurant_summary(label: str, items: List[MenuItem]) -> Dict[str, Any]:
+    """
+    What the AR view shows once it recognises an outlet: the lowest-KJ dishes of each Type,
+    dietary counts and price ranges (overall and per Type).
+    """
+    by_type: Dict[str, List[MenuItem]] = {}
+    for item in items:
+        by_type.setdefault(item.type, []).append(item)
+    kilojoules = [item.kilojoules for item in items if item.kilojoules is not None]
+    types = {}
+    for dish_type, dishes in sorted(by_type.items()):
+        rated = sorted((item for item in dishes if item.kilojoules is not None), key=lambda item: item.kilojoules)
+        types[dish_type] = {
+            "items": len(dishes),
+            "price": _price_range(dishes),
+            "healthiest": [{
+                "name": item.name,
+                "kilojoules": item.kilojoules,
+                "price": item.price,
+                "serving_size": item.serving_size,
+                "vegetarian": item.vegetarian,
+                "gluten_free": not item.gluten,
+                "nut_free": not item.nuts,
+            } for item in rated[:HEALTHIEST_PER_TYPE]],
+        }
+    return {
+        "restaurant": label,
+        "items": len(items),
+        "vegetarian": sum(item.vegetarian for item in items),
+        "gluten_free": sum(not item.gluten for item in items),
+        "nut_free": sum(not item.nuts for item in items),
+        "price": _price_range(items),
+        "kilojoules": {"min": min(kilojoules), "max": max(kilojoules),
+                       "mean": round(sum(kilojoules) / len(kilojoules), 2)} if kilojoules else None,
+        "types": types,
+    }
+
+
+def read_menu_text(path: str) -> Tuple[str, str]:
+    """
+    Read the menu file and return ``(text, encoding)``.
+    UTF-8 is tried first; chardet is only consulted when that fails.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        return raw.decode('utf-8-sig'), 'utf-8'
+    except UnicodeDecodeError:
+        import chardet  # Only needed for files that were saved in a legacy encoding
+        encoding = chardet.detect(raw)['encoding'] or 'latin-1'
+        return raw.decode(encoding, errors='replace'), encoding
+
+
+class MenuTable:
+    """All menu items plus the lookup indexes used by the chatbot fast path and the AR view."""
+
+    def __init__(self, items: List[MenuItem], version: Tuple[int, int], encoding: str = 'utf-8'):
+        self.items = items
+        self.version = version
+        self.encoding = encoding
+
+        # Normalised dish name -> every item sold under that name (some dishes exist at several outlets)
+        self.by_name: Dict[str, List[MenuItem]] = {}
+        self.by_restaurant: Dict[str, List[MenuItem]] = {}
+        # (restaurant label, normalised dish name) -> item: the join key for orders.json rows
+        self.by_restaurant_dish: Dict[Tuple[str, str], MenuItem] = {}
+        for item in items:
+            self.by_name.setdefault(normalize(item.name), []).append(item)
+            self.by_restaurant.setdefault(item.restaurant, []).append(item)
+            self.by_restaurant_dish.setdefault((item.restaurant, normalize(item.name)), item)
+
+        # Per-outlet summaries for the AR view, keyed by the metadata.json labels
+        self.summaries: Dict[str, Dict[str, Any]] = {
+            label: restaurant_summary(label, rows) for label, rows in self.by_restaurant.items()
+        }
+
+        # Longest names first so "chicken supreme" wins over "chicken"
+        self.dish_names = sorted(self.by_name, key=len, reverse=True)
+        self.restaurant_aliases = sorted(
+            ((normalize(alias), label) for label, aliases in RESTAURANT_ALIASES.items() for alias in aliases),
+            key=lambda pair: len(pair[0]),
+            reverse=True
+        )
+
+    @classmethod
+    def from_csv(cls, path: str = MENU_CSV_PATH) -> "MenuTable":
+        """Parse menu.csv into a new table."""
+        stat = os.stat(path)
+        text, encoding = read_menu_text(path)
+        items = []
+        for row in csv.DictReader(io.StringIO(text)):
+            name = (row.get("Name") or "").strip()
+            if not name:
+                continue
+            items.append(MenuItem(
+                name=name,
+                restaurant=(row.get("Restaurant") or "").strip(),
+                type=(row.get("Type") or "").strip(),
+                price=_to_float(row.get("Price", "")),
+                kilojoules=_to_float(row.get("Calories (KJ)", "")),
+                serving_size=_to_float(row.get("Serving Size (g)", "")),
+                vegetarian=_to_flag(row.get("Is Vegetarian?", "")),
+                gluten=_to_flag(row.get("Has Gluten?", "")),
+                nuts=_to_flag(row.get("Has Nuts?", "")),
+            ))
+        return cls(items, (stat.st_mtime_ns, stat.st_size), encoding)
+
+    def find_dishes(self, normalized_text: str) -> List[MenuItem]:
+        """Return the items for the longest dish name mentioned in the (normalised) text."""
+        padded = f" {normalized_text} "
+        for dish in self.dish_names:
+            if f" {dish} " in padded:
+                return self.by_name[dish]
+        return []
+
+    def order_item(self, restaurant: str, dish: str) -> Optional[MenuItem]:
+        """The menu item an order refers to; names are matched ignoring case, spacing and punctuation."""
+        label = restaurant if restaurant in self.by_restaurant else self.find_restaurant(normalize(restaurant or ""))
+        return self.by_restaurant_dish.get((label, normalize(dish or "")))
+
+    def find_restaurant(self, normalized_text: str) -> Optional[str]:
+        """Return the restaurant label mentioned in the (normalised) text, if any."""
+        padded = f" {normalized_text} "
+        for alias, label in self.restaurant_aliases:
+            if f" {alias} " in padded:
+                return label
+        return None
+
+
+_menu_lock = threading.Lock()
+_menu_cache: Dict[str, MenuTable] = {}
+
+
+def load_menu(path: str = MENU_CSV_PATH) -> MenuTable:
+    """
+    Return the parsed menu, re-parsing only when the file on disk has changed.
+    The stat() call is the only I/O on the hot path.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    table = _menu_cache.get(path)
+    if table is not None and table.version == version:
+        return table
+    with _menu_lock:
+        table = _menu_cache.get(path)
+        if table is None or table.version != version:
+            table = MenuTable.from_csv(path)
+            _menu_cache[path] = table
+        return table
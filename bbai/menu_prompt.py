@@ -0,0 +1,174 @@
+"""
+Menu context prefix for the chatbot, rendered once per menu version and reused by Ollama.
+
+Every LLM request used to re-detect the CSV encoding, re-read the file, re-render the table
+and send it all as a fresh prompt, so Ollama evaluated the same ~60 KB prefix every time. The
+prefix is now rendered once per menu.csv version and pinned, either as the ``system`` prompt
+(identical bytes on every call, so Ollama's prompt cache matches it) or as the ``context``
+returned by a one-off priming call. Per-request evaluation then only covers the question.
+"""
+import io
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bbai.menu import MENU_CSV_PATH, load_menu, read_menu_text
+from bbai.menu_query import split_user_prompt
+from bbai.ollama import OllamaClient, OllamaError
+
+PREFIX_HEADER = "Here is the data from the CSV file:\n"
+PRIME_PROMPT = "Reply with OK."
+CACHE_MODES = ("system", "context", "off")
+DEFAULT_PRIME_RETRY_SECONDS = 60.0
+
+
+def render_menu_prefix(path: str = MENU_CSV_PATH) -> str:
+    """Render menu.csv as the fixed-width table the model has always been given."""
+    import pandas as pd  # ~0.4 s to import, so it is only paid when the first LLM request needs the prefix
+
+    text, _ = read_menu_text(path)
+    df = pd.read_csv(io.StringIO(text))
+    return PREFIX_HEADER + df.to_string(index=False)
+
+
+class MenuPromptCache:
+    """Owns the rendered prefix for the current menu version and the Ollama state primed from it."""
+
+    def __init__(self, client: OllamaClient, path: str = MENU_CSV_PATH, mode: Optional[str] = None,
+                 prime_retry_seconds: Optional[float] = None):
+        self.client = client
+        self.path = path
+        self.mode = (mode or os.getenv("BBAI_PROMPT_CACHE_MODE", "system")).lower()
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"BBAI_PROMPT_CACHE_MODE must be one of {CACHE_MODES}, not {self.mode!r}")
+        if client.backend == "cli":
+            self.mode = "off"  # `ollama run` takes a single prompt; nothing can be pinned
+        self.prime_retry_seconds = prime_retry_seconds or float(
+            os.getenv("BBAI_PROMPT_PRIME_RETRY_SECONDS", DEFAULT_PRIME_RETRY_SECONDS))
+
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None
+        self._prefix = ""
+        self._context: Optional[List[int]] = None
+        self.prefix_eval_ms: Optional[float] = None  # What evaluating the prefix costs Ollama, from the priming call
+        self._priming = False
+        self._prime_after = 0.0  # monotonic time before which a failed prime is not retried
+
+        self.prefix_renders = 0
+        self.primes = 0
+        self.prime_failures = 0
+        self.requests = 0
+        self.saved_ms_total = 0.0
+
+    # ----------------------------- Prefix ------------------------------------
+    def prefix(self) -> str:
+        """Return the rendered prefix, re-rendering (and re-priming) only when menu.csv changes."""
+        version = load_menu(self.path).version
+        if version == self._version:
+            return self._prefix
+        with self._lock:
+            if version != self._version:
+                self._prefix = render_menu_prefix(self.path)
+                self._version = version
+                self._context = None
+                self.prefix_eval_ms = None
+                self._prime_after = 0.0
+                self.prefix_renders += 1
+            return self._prefix
+
+    def _prime(self, prefix: str) -> None:
+        """
+        Have Ollama evaluate the prefix once, recording its cost (and the context, in context mode).
+        One thread primes while the others carry on unprimed; a failure is retried only after
+        `prime_retry_seconds`, so an Ollama outage does not double every request's calls.
+        """
+        if self.mode == "off" or self.prefix_eval_ms is not None:
+            return
+        with self._lock:
+            if self.prefix_eval_ms is not None or self._priming or time.monotonic() < self._prime_after:
+                return
+            self._priming = True
+            version = self._version
+        try:
+            if self.mode == "context":
+                body = self.client.generate_raw(prefix, options={"num_predict": 1})
+            else:
+                body = self.client.generate_raw(PRIME_PROMPT, system=prefix, options={"num_predict": 1})
+        except OllamaError as e:
+            print(f"Error priming the menu prompt (retrying in {self.prime_retry_seconds:g} s): {e}")
+            with self._lock:
+                self._priming = False
+                self._prime_after = time.monotonic() + self.prime_retry_seconds
+                self.prime_failures += 1
+            return
+        with self._lock:
+            self._priming = False
+            if version != self._version:
+                return  # menu.csv changed meanwhile; the next request primes the new prefix
+            if self.mode == "context":
+                self._context = body.get("context")
+            self.prefix_eval_ms = body.get("prompt_eval_duration", 0) / 1e6
+            self.primes += 1
+
+    # ----------------------------- Requests ----------------------------------
+    def build_request(self, user_prompt: str, history: str = "") -> Tuple[str, Dict[str, Any]]:
+        """
+        Return ``(prompt, extra /api/generate fields)`` for a chat-page prompt.
+        `history` is the user's (bounded) conversation so far and goes right before the question.
+        """
+        prefix = self.prefix()
+        instructions, question = split_user_prompt(user_prompt)
+        turn = "\n\n".join(part for part in (history, f"User: {question}") if part)
+        if self.mode == "off":
+            return "\n\n".join(part for part in (prefix, instructions, turn) if part), {}
+
+        self._prime(prefix)
+        if self.mode == "context" and self._context:
+            return "\n\n".join(part for part in (instructions, turn) if part), {"context": self._context}
+        # The page's instructions are static too, so they are pinned alongside the menu
+        system = f"{prefix}\n\n{instructions}" if instructions else prefix
+        return turn, {"system": system}
+
+    def _record(self, final_chunk: Dict[str, Any], info: Dict[str, Any]) -> None:
+        """Fill `info` with this request's prompt-eval time and the prefix-eval time it avoided."""
+        self.requests += 1
+        eval_ms = final_chunk.get("prompt_eval_duration", 0) / 1e6
+        info["prompt_eval_ms"] = round(eval_ms, 3)
+        if self.prefix_eval_ms is not None:
+            saved = max(0.0, self.prefix_eval_ms - eval_ms)
+            self.saved_ms_total += saved
+            info["prefix_eval_saved_ms"] = round(saved, 3)
+
+    def generate(self, user_prompt: str, info: Optional[Dict[str, Any]] = None, history: str = "") -> str:
+        prompt, fields = self.build_request(user_prompt, history)
+        if self.client.backend == "cli":
+            return self.client.generate(prompt)
+        body = self.client.generate_raw(prompt, **fields)
+        self._record(body, info if info is not None else {})
+        return body.get("response", "").strip()
+
+    def generate_stream(self, user_prompt: str, info: Optional[Dict[str, Any]] = None,
+                        history: str = "") -> Iterator[str]:
+        prompt, fields = self.build_request(user_prompt, history)
+        if self.client.backend == "cli":
+            yield self.client.generate(prompt)
+            return
+        for chunk in self.client.stream_chunks(prompt, **fields):
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                self._record(chunk, info if info is not None else {})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "menu_version": list(self._version) if self._version else None,
+            "prefix_chars": len(self._prefix),
+            "prefix_renders": self.prefix_renders,
+            "primes": self.primes,
+            "prime_failures": self.prime_failures,
+            "prefix_eval_ms": self.prefix_eval_ms,
+            "requests": self.requests,
+            "prefix_eval_saved_ms_total": round(self.saved_ms_total, 3),
+        }
@@ -0,0 +1,183 @@
+"""
+Structured-query fast path for the chatbot.
+
+Questions that are really lookups over menu.csv columns (price, kilojoules, dietary flags,
+which outlet sells a dish, cheapest / lightest options) are answered straight from the
+preparsed ``MenuTable``. Anything else returns None and falls through to the LLM.
+"""
+import re
+from typing import Callable, List, Optional, Tuple
+
+from bbai.menu import MenuItem, MenuTable, RESTAURANT_ALIASES, normalize
+
+KJ_PER_KCAL = 4.184
+MAX_LISTED_ITEMS = 8
+MAX_QUESTION_WORDS = 30  # Longer prompts are conversational, not lookups
+
+# Nutrients that menu.csv doesn't have - these must go to the model rather than be misread as price questions
+UNSUPPORTED_TOPICS = re.compile(
+    r"\b(protein|sugar|sugars|fat|fats|carb|carbs|carbohydrates?|salt|sodium|fib(?:re|er)|vitamins?|"
+    r"allerg(?:y|ies|ens?)|dairy|lactose|vegan|halal|recipe|ingredients?|why|recommend|suggest|should)\b"
+)
+PRICE_WORDS = re.compile(r"\b(price|prices|priced|cost|costs|how much is|how much does|how much for|how much are)\b")
+ENERGY_WORDS = re.compile(r"\b(calorie|calories|kcal|kj|kilojoules?|energy)\b")
+VEGETARIAN_WORDS = re.compile(r"\b(vegetarian|veggie)\b")
+GLUTEN_WORDS = re.compile(r"\b(gluten|gluten free|coeliac|celiac)\b")
+NUT_WORDS = re.compile(r"\b(nut|nuts|nut free|peanuts?)\b")
+WHERE_WORDS = re.compile(r"\b(where|which restaurant|which outlet|what restaurant|who sells|who serves|served at)\b")
+LIST_WORDS = re.compile(r"\b(options|dishes|items|list|show|what|which|menu|anything)\b")
+CHEAPEST_WORDS = re.compile(r"\b(cheapest|least expensive|lowest price|most affordable)\b")
+LIGHTEST_WORDS = re.compile(r"\b(lowest calorie|least calories|fewest calories|lightest|lowest kj|least kj)\b")
+UNDER_PRICE = re.compile(r"\b(?:under|below|less than|cheaper than)\s*(?:eur|euro|euros)?\s*(\d+(?:\s\d+)?)\s*(?:eur|euro|euros)?\b")
+UNDER_ENERGY = re.compile(r"\b(?:under|below|less than)\s*(\d+)\s*(kj|kcal|calories)\b")
+
+USER_MARKER = re.compile(r"(?:^|\n)\s*User:\s*", re.IGNORECASE)
+
+
+def split_user_prompt(prompt: str) -> Tuple[str, str]:
+    """
+    The chat page prepends its instructions to every message. Return ``(instructions, question)``,
+    where the question is whatever follows the last 'User:' marker.
+    """
+    markers = list(USER_MARKER.finditer(prompt))
+    if not markers:
+        return "", prompt.strip()
+    last = markers[-1]
+    return prompt[:last.start()].strip(), prompt[last.end():].strip()
+
+
+def extract_user_question(prompt: str) -> str:
+    """Return just the user's question from a chat-page prompt."""
+    return split_user_prompt(prompt)[1]
+
+
+def _display_restaurant(label: str) -> str:
+    return {"BurgerKing": "Burger King", "PizzaHut": "Pizza Hut", "CafeCuba": "Cafe Cuba",
+            "Joli": "J'oli", "Boost": "Boost Juice"}.get(label, label)
+
+
+def _price(item: MenuItem) -> str:
+    return f"€{item.price:.2f}" if item.price is not None else "an unlisted price"
+
+
+def _energy(item: MenuItem) -> str:
+    if item.kilojoules is None:
+        return "no listed energy value"
+    text = f"{item.kilojoules:.0f} kJ ({item.kilojoules / KJ_PER_KCAL:.0f} kcal)"
+    if item.serving_size:
+        text += f" per {item.serving_size:.0f} g serving"
+    return text
+
+
+def _describe_items(items: List[MenuItem], describe: Callable[[MenuItem], str]) -> str:
+    """Join one sentence per matching item (one per outlet for dishes sold in several places)."""
+    return " ".join(describe(item) for item in items)
+
+
+def _list_items(items: List[MenuItem], detail: Callable[[MenuItem], str]) -> str:
+    shown = items[:MAX_LISTED_ITEMS]
+    lines = "\n".join(f"- {item.name} ({detail(item)})" for item in shown)
+    if len(items) > len(shown):
+        lines += f"\n...and {len(items) - len(shown)} more."
+    return lines
+
+
+def _answer_about_dish(text: str, items: List[MenuItem]) -> Optional[str]:
+    """Answer column lookups for a dish that was named in the question."""
+    if ENERGY_WORDS.search(text):
+        return _describe_items(items, lambda i: f"{i.name} at {_display_restaurant(i.restaurant)} has {_energy(i)}.")
+    if PRICE_WORDS.search(text):
+        return _describe_items(items, lambda i: f"{i.name} at {_display_restaurant(i.restaurant)} costs {_price(i)}.")
+
+    flag_checks = (
+        (VEGETARIAN_WORDS, "vegetarian", lambda i: i.vegetarian, "is", "is not"),
+        (GLUTEN_WORDS, "gluten", lambda i: i.gluten, "contains", "does not contain"),
+        (NUT_WORDS, "nuts", lambda i: i.nuts, "contains", "does not contain"),
+    )
+    for pattern, word, flag, yes, no in flag_checks:
+        if pattern.search(text):
+            return _describe_items(
+                items,
+                lambda i: f"{i.name} at {_display_restaurant(i.restaurant)} {yes if flag(i) else no} {word}."
+            )
+
+    if WHERE_WORDS.search(text):
+        outlets = ", ".join(sorted({_display_restaurant(i.restaurant) for i in items}))
+        return f"{items[0].name} is served at {outlets}."
+    return None
+
+
+def _answer_about_restaurant(text: str, label: str, table: MenuTable) -> Optional[str]:
+    """Answer filtered listings (dietary flags, budget, cheapest/lightest) for one outlet."""
+    items = list(table.by_restaurant.get(label, []))
+    if not items:
+        return None
+    name = _display_restaurant(label)
+    filters = []  # Adjectives placed before "options"
+    limits = []   # Budget / energy caps placed after it
+
+    if VEGETARIAN_WORDS.search(text):
+        items = [i for i in items if i.vegetarian]
+        filters.append("vegetarian")
+    if re.search(r"\b(gluten free|no gluten|without gluten)\b", text):
+        items = [i for i in items if not i.gluten]
+        filters.append("gluten-free")
+    if re.search(r"\b(nut free|no nuts|without nuts)\b", text):
+        items = [i for i in items if not i.nuts]
+        filters.append("nut-free")
+
+    under_energy = UNDER_ENERGY.search(text)
+    if under_energy:
+        limit = float(under_energy.group(1))
+        if under_energy.group(2) != "kj":
+            limit *= KJ_PER_KCAL
+        items = [i for i in items if i.kilojoules is not None and i.kilojoules < limit]
+        limits.append(f"under {under_energy.group(1)} {under_energy.group(2)}")
+    else:
+        under_price = UNDER_PRICE.search(text)
+        if under_price:
+            limit = float(under_price.group(1).replace(" ", "."))
+            items = [i for i in items if i.price is not None and i.price < limit]
+            limits.append(f"under €{limit:.2f}")
+
+    options = " ".join(filters + ["options"] + limits)
+    if CHEAPEST_WORDS.search(text):
+        priced = sorted((i for i in items if i.price is not None), key=lambda i: i.price)
+        if not priced:
+            return None
+        return f"The cheapest {options} at {name} are:\n" + _list_items(priced, _price)
+    if LIGHTEST_WORDS.search(text):
+        rated = sorted((i for i in items if i.kilojoules is not None), key=lambda i: i.kilojoules)
+        if not rated:
+            return None
+        return f"The lowest-energy {options} at {name} are:\n" + _list_items(rated, _energy)
+
+    if (filters or limits) and LIST_WORDS.search(text):
+        if not items:
+            return f"{name} has no {options} on the menu."
+        return f"{name} has {len(items)} {options}:\n" + _list_items(items, _price)
+    return None
+
+
+def answer_structured_query(question: str, table: MenuTable) -> Optional[str]:
+    """
+    Return a direct answer for menu lookups, or None when the question needs the LLM.
+    Only questions that name a known dish or outlet *and* a supported column are answered.
+    """
+    text = normalize(question.replace("€", " eur "))
+    if not text or len(text.split()) > MAX_QUESTION_WORDS or UNSUPPORTED_TOPICS.search(text):
+        return None
+
+    restaurant = table.find_restaurant(text)
+    items = table.find_dishes(text)
+    # A dish name can also be an outlet name (e.g. "Boost"); prefer the outlet listing in that case
+    if items and restaurant and all(normalize(i.name) in {normalize(a) for a in RESTAURANT_ALIASES[restaurant]}
+                                    for i in items):
+        items = []
+    if items:
+        if restaurant:
+            items = [i for i in items if i.restaurant == restaurant] or items
+        return _answer_about_dish(text, items)
+    if restaurant:
+        return _answer_about_restaurant(text, restaurant, table)
+    return None
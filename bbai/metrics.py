@@ -0,0 +1,229 @@
+"""
+In-process metrics, exposed at ``/metrics`` in the Prometheus text format.
+
+Recorded:
+
+* request count and latency per Flask route (the URL rule, not the raw path) and method,
+  plus the number of requests in flight;
+* duration and size of every JSON data-file read and write, per store (users, credentials,
+  orders, weight...);
+* Ollama call latency and errors per call type.
+
+Recording is a dict lookup, a bisect and a few additions under a per-metric lock, so the
+cost per request is a few microseconds. No client library is needed. Metrics are per process:
+under ``bbai.serve --workers N`` each worker keeps its own, so scrape a single-worker
+deployment or treat each scrape as a sample of one worker.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Werkzeug accepts any method token, so anything else is one label rather than a new series per token
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}"
+                                for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[Any]] = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self._series.items())
+        lines = self.header()
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """The metrics of this process, rendered in registration order."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("bbai_http_requests_total", "Requests handled, by route, method and status.",
+                                 ("route", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram("bbai_http_request_duration_seconds",
+                                  "Time to produce the response (streamed bodies excluded), by route and method.",
+                                  ("route", "method"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("bbai_http_requests_in_flight", "Requests currently being handled.")
+JSON_IO_LATENCY = REGISTRY.histogram("bbai_json_io_duration_seconds",
+                                     "JSON data-file read/write time, by store and operation.", ("store", "op"))
+JSON_IO_BYTES = REGISTRY.histogram("bbai_json_io_bytes", "JSON data-file size per read/write, by store and operation.",
+                                   ("store", "op"), SIZE_BUCKETS)
+OLLAMA_LATENCY = REGISTRY.histogram("bbai_ollama_request_duration_seconds",
+                                    "Ollama call time (whole generation), by call type.", ("call",))
+OLLAMA_ERRORS = REGISTRY.counter("bbai_ollama_errors_total", "Failed Ollama calls, by call type.", ("call",))
+
+
+# ----------------------------- JSON data files --------------------------------
+def store_name(path: str) -> str:
+    """'static/json/users.json' -> 'users'."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def read_json(path: str, store: Optional[str] = None) -> Any:
+    """json.load() a data file, recording the time taken and the file size."""
+    start = time.perf_counter()
+    with open(path, "r") as f:
+        size = os.fstat(f.fileno()).st_size
+        data = json.load(f)
+    store = store or store_name(path)
+    JSON_IO_LATENCY.observe(time.perf_counter() - start, store, "read")
+    JSON_IO_BYTES.observe(size, store, "read")
+    return data
+
+
+def write_json(path: str, data: Any, store: Optional[str] = None, indent: Optional[int] = 4) -> None:
+    """json.dump() a data file (pretty-printed, like every writer in the app), recording time and size."""
+    start = time.perf_counter()
+    with open(path, "w") as f:
+        json.dump(data, f, indent=indent)
+        size = f.tell()
+    store = store or store_name(path)
+    JSON_IO_LATENCY.observe(time.perf_counter() - start, store, "write")
+    JSON_IO_BYTES.observe(size, store, "write")
+
+
+# ----------------------------- Flask requests ---------------------------------
+def instrument_app(app) -> None:
+    """Time every request; the route label is the URL rule so 404 probes can't add series."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _metrics_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_record(exc):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return  # before_request never ran (e.g. the request was rejected while routing)
+        HTTP_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        status = "500" if exc is not None else str(g.pop("metrics_status", 500))
+        method = request.method if request.method in HTTP_METHODS else "other"
+        HTTP_LATENCY.observe(time.perf_counter() - start, route, method)
+        HTTP_REQUESTS.inc(route, method, status)
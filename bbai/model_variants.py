@@ -0,0 +1,243 @@
+"""
+Smaller builds of the AR logo model: float16 and 8-bit quantized weights.
+
+``weights.bin`` is 2.1 MB of float32. The build writes two TF.js-compatible variants next to
+the static-asset cache (``.bbai-cache/models/<precision>/``). Both use the quantization
+fields of the TF.js weights manifest, which ``tf.loadLayersModel`` decodes itself:
+
+* ``float16``: half-precision weights, half the size;
+* ``int8``: per-tensor affine 8-bit (``value = q * scale + min``), a quarter of the size.
+
+    python -m bbai.model_variants                 # build + accuracy-vs-size report (wo-Augmentation set)
+    python -m bbai.model_variants --dataset all   # also the augmented set (slower)
+
+The report runs every variant over the labelled samples in ``AR-View Model/Dataset``. It
+records top-1 accuracy, agreement with float32 and the largest probability difference, and
+is saved as ``report.json``. The app only offers a variant whose accuracy is within
+``BBAI_MODEL_MAX_ACCURACY_DROP`` (default 1 percentage point) of float32. float16 is also
+offered before any report exists, since its rounding error is far below what changes a
+prediction. ``/model?precision=int8,float16`` then serves the smallest acceptable variant
+the client listed. The weights are dequantized when loaded, so server-side inference
+(bbai.inference) gets smaller files and the same speed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from bbai.menu import BASE_DIR
+
+SOURCE_DIR = os.path.join(BASE_DIR, "static", "tm-ByteBite-model")
+VARIANTS_DIR = os.getenv("BBAI_MODEL_VARIANTS_DIR", os.path.join(BASE_DIR, ".bbai-cache", "models"))
+DATASET_DIR = os.path.join(BASE_DIR, "AR-View Model", "Dataset")
+PRECISIONS = ("float32", "float16", "int8")  # float32 is the source model itself
+DEFAULT_MAX_ACCURACY_DROP = 0.01
+BUILD_FORMAT = 1  # Bump when build_variant() output changes, so existing builds are redone
+
+
+def asset_key(precision: str, name: str) -> str:
+    """Static-asset registry key of a variant's model.json / weights.bin."""
+    return f"model/{name}" if precision == "float32" else f"model/{precision}/{name}"
+
+
+# ----------------------------- Quantization ---------------------------------------
+def _quantize(value, precision: str) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """Encoded bytes of one float32 tensor and the manifest 'quantization' entry for it."""
+    if precision == "float16":
+        return value.astype("<f2").tobytes(), {"dtype": "float16"}
+    low, high = float(value.min()), float(value.max())
+    scale = (high - low) / 255 if high > low else 1.0
+    quantized = np.clip(np.round((value - low) / scale), 0, 255).astype(np.uint8)
+    return quantized.tobytes(), {"dtype": "uint8", "scale": scale, "min": low}
+
+
+def build_variant(precision: str, source_dir: str = SOURCE_DIR, out_dir: str = VARIANTS_DIR) -> str:
+    """Write model.json + weights.bin for `precision` and return its directory."""
+    from bbai.inference import load_weights
+
+    with open(os.path.join(source_dir, "model.json"), "r") as f:
+        model = json.load(f)
+    weights = load_weights(source_dir, model["weightsManifest"])
+    chunks: List[bytes] = []
+    manifest = []
+    for group in model["weightsManifest"]:
+        specs = []
+        for spec in group["weights"]:
+            data, quantization = _quantize(weights[spec["name"]], precision)
+            chunks.append(data)
+            specs.append({"name": spec["name"], "shape": spec["shape"], "dtype": "float32",
+                          "quantization": quantization})
+        # The query keeps the variant's weights URL distinct even when served without fingerprints
+        manifest.append({"paths": [f"weights.bin?precision={precision}"], "weights": specs})
+    model["weightsManifest"] = manifest
+
+    directory = os.path.join(out_dir, precision)
+    os.makedirs(directory, exist_ok=True)
+    for name, data in (("weights.bin", b"".join(chunks)),
+                       ("model.json", json.dumps(model, separators=(",", ":")).encode("utf-8"))):
+        tmp = os.path.join(directory, f"{name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(directory, name))
+    return directory
+
+
+def source_digest(source_dir: str = SOURCE_DIR) -> str:
+    digest = hashlib.sha256()
+    for name in ("model.json", "weights.bin"):
+        with open(os.path.join(source_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# ----------------------------- Evaluation -----------------------------------------
+DATASETS = {"wo": ["wo-Augmentation"], "w": ["w-Augmentation"], "all": ["wo-Augmentation", "w-Augmentation"]}
+
+
+def archive_samples(directory: str) -> Iterator[Tuple[str, bytes]]:
+    """(label, image bytes) from every <Label>-samples.zip in `directory`, read without extracting."""
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith("-samples.zip"):
+            continue
+        label = name[:-len("-samples.zip")]
+        with zipfile.ZipFile(os.path.join(directory, name)) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX") or "/." in info.filename:
+                    continue
+                yield label, archive.read(info)
+
+
+def dataset_samples(which: str = "wo") -> Iterator[Tuple[str, bytes]]:
+    """(label, image bytes) from the zipped Teachable Machine samples; `which` is wo, w or all."""
+    for folder in DATASETS[which]:
+        yield from archive_samples(os.path.join(DATASET_DIR, folder))
+
+
+def evaluate(which: str = "wo", precisions=PRECISIONS, out_dir: str = VARIANTS_DIR) -> Dict[str, Any]:
+    """Accuracy, agreement with float32, size and speed of every variant on the dataset."""
+    from bbai.inference import NumpyModel, load_weights, prepare_frame
+
+    with open(os.path.join(SOURCE_DIR, "metadata.json"), "r") as f:
+        labels = json.load(f)["labels"]
+    samples = list(dataset_samples(which))
+    frames = np.stack([prepare_frame(data) for _, data in samples])
+    truth = np.array([labels.index(label) for label, _ in samples])
+
+    results: Dict[str, Dict[str, Any]] = {}
+    reference = None
+    for precision in precisions:
+        directory = SOURCE_DIR if precision == "float32" else os.path.join(out_dir, precision)
+        with open(os.path.join(directory, "model.json"), "r") as f:
+            model_json = json.load(f)
+        start = time.perf_counter()
+        model = NumpyModel(model_json["modelTopology"], load_weights(directory, model_json["weightsManifest"]))
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        probabilities = np.concatenate([model.predict(frames[i:i + 8]) for i in range(0, len(frames), 8)])
+        ms_per_frame = (time.perf_counter() - start) * 1000 / len(frames)
+        if reference is None:
+            reference = probabilities
+        predicted = probabilities.argmax(axis=1)
+        results[precision] = {
+            "weights_bytes": os.path.getsize(os.path.join(directory, "weights.bin")),
+            "accuracy": round(float((predicted == truth).mean()), 4),
+            "agreement": round(float((predicted == reference.argmax(axis=1)).mean()), 4),
+            "max_probability_diff": round(float(np.abs(probabilities - reference).max()), 5),
+            "load_ms": round(load_ms, 1),
+            "ms_per_frame": round(ms_per_frame, 2),
+        }
+    return {"source_digest": source_digest(), "dataset": which, "samples": len(samples), "variants": results}
+
+
+# ----------------------------- Serving --------------------------------------------
+class ModelVariants:
+    """Which precisions exist and are accurate enough, and which one a client should get."""
+
+    def __init__(self, out_dir: str = VARIANTS_DIR):
+        self.out_dir = out_dir
+        self.max_drop = float(os.getenv("BBAI_MODEL_MAX_ACCURACY_DROP", DEFAULT_MAX_ACCURACY_DROP))
+        self.available: List[str] = ["float32"]
+        self.report: Optional[Dict[str, Any]] = None
+
+    def report_path(self) -> str:
+        return os.path.join(self.out_dir, "report.json")
+
+    def build(self) -> None:
+        """(Re)build missing variants and pick the offered ones (cheap: no evaluation here)."""
+        digest = source_digest()
+        try:
+            with open(self.report_path(), "r") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = None
+        self.report = report if report and report.get("source_digest") == digest else None
+
+        stamp = os.path.join(self.out_dir, "source_digest")
+        try:
+            with open(stamp, "r") as f:
+                fresh = f.read().strip() == f"{digest}-{BUILD_FORMAT}"
+        except OSError:
+            fresh = False
+        for precision in PRECISIONS[1:]:
+            if not fresh or not os.path.exists(os.path.join(self.out_dir, precision, "weights.bin")):
+                build_variant(precision, out_dir=self.out_dir)
+        if not fresh:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(stamp, "w") as f:
+                f.write(f"{digest}-{BUILD_FORMAT}")
+        self.available = ["float32"] + [precision for precision in PRECISIONS[1:] if self.acceptable(precision)]
+
+    def acceptable(self, precision: str) -> bool:
+        if self.report is None:
+            return precision == "float16"  # Rounding far below what moves a prediction; int8 needs the report
+        variants = self.report["variants"]
+        if precision not in variants or "float32" not in variants:
+            return False
+        return variants["float32"]["accuracy"] - variants[precision]["accuracy"] <= self.max_drop
+
+    def directory(self, precision: str) -> str:
+        return SOURCE_DIR if precision == "float32" else os.path.join(self.out_dir, precision)
+
+    def directories(self) -> Dict[str, str]:
+        return {precision: self.directory(precision) for precision in PRECISIONS}
+
+    def choose(self, accepted: Optional[str]) -> str:
+        """Smallest offered precision among the client's comma-separated list (float32 if none match)."""
+        wanted = {part.strip().lower() for part in (accepted or "").split(",")}
+        for precision in reversed(PRECISIONS):  # Smallest first
+            if precision in wanted and precision in self.available:
+                return precision
+        return "float32"
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Build float16/int8 variants of the AR model and report accuracy vs size.")
+    parser.add_argument("--dataset", choices=("wo", "w", "all"), default="wo",
+                        help="Samples to evaluate on: wo-Augmentation (default), w-Augmentation or both")
+    args = parser.parse_args(argv)
+
+    for precision in PRECISIONS[1:]:
+        build_variant(precision)
+    report = evaluate(args.dataset)
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+    with open(os.path.join(VARIANTS_DIR, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['samples']} samples ({args.dataset}), source {report['source_digest']}")
+    print(f"{'variant':10} {'weights':>10} {'accuracy':>9} {'agree':>7} {'max Δp':>8} {'load ms':>8} {'ms/frame':>9}")
+    for precision, row in report["variants"].items():
+        print(f"{precision:10} {row['weights_bytes']:>10} {row['accuracy']:>9.2%} {row['agreement']:>7.2%} "
+              f"{row['max_probability_diff']:>8.4f} {row['load_ms']:>8.1f} {row['ms_per_frame']:>9.2f}")
+    variants = ModelVariants()
+    variants.build()
+    print(f"Offered to clients: {', '.join(variants.available)} "
+          f"(max accuracy drop {variants.max_drop:.1%}, BBAI_MODEL_MAX_ACCURACY_DROP)")
+
+
+if __name__ == "__main__":
+    main()
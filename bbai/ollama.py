@@ -0,0 +1,126 @@
+"""
+Client for the local Ollama server.
+
+The default backend talks to Ollama's HTTP API (``/api/generate``), which streams tokens as
+newline-delimited JSON and avoids spawning an ``ollama run`` process per request. The old
+CLI path is kept behind ``BBAI_OLLAMA_BACKEND=cli``.
+"""
+import json
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterator, Optional
+
+from bbai.metrics import OLLAMA_ERRORS, OLLAMA_LATENCY
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+DEFAULT_MODEL = "orca-mini:latest"
+DEFAULT_TIMEOUT = 300  # Seconds; generation on a laptop CPU can be slow
+
+
+class OllamaError(RuntimeError):
+    """Raised when the Ollama backend can't be reached or returns an error."""
+
+
+def _observe(call: str, start: float, failed: bool) -> None:
+    OLLAMA_LATENCY.observe(time.perf_counter() - start, call)
+    if failed:
+        OLLAMA_ERRORS.inc(call)
+
+
+class OllamaClient:
+    """Thin wrapper over /api/generate with both blocking and streaming calls."""
+
+    def __init__(self, host: Optional[str] = None, model: Optional[str] = None,
+                 backend: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        host = host or os.getenv("OLLAMA_HOST", DEFAULT_HOST)
+        if not host.startswith(("http://", "https://")):
+            host = f"http://{host}"  # OLLAMA_HOST is often given as host:port
+        self.host = host.rstrip("/")
+        self.model = model or os.getenv("BBAI_OLLAMA_MODEL", DEFAULT_MODEL)
+        self.backend = (backend or os.getenv("BBAI_OLLAMA_BACKEND", "http")).lower()
+        self.timeout = timeout
+
+    # ----------------------------- HTTP API ---------------------------------
+    def _post(self, payload: Dict[str, Any]):
+        request = urllib.request.Request(
+            f"{self.host}/api/generate",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            raise OllamaError(f"Ollama returned HTTP {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise OllamaError(f"Could not reach Ollama at {self.host}: {e}") from e
+
+    def stream_chunks(self, prompt: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """Yield every NDJSON chunk from a streaming /api/generate call (the last one has done=True)."""
+        payload = {"model": self.model, "prompt": prompt, "stream": True, **fields}
+        start, failed = time.perf_counter(), True
+        try:
+            with self._post(payload) as response:
+                for line in response:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise OllamaError(chunk["error"])
+                    yield chunk
+            failed = False
+        except GeneratorExit:
+            failed = False  # The consumer stopped reading (e.g. the client disconnected)
+            raise
+        finally:
+            _observe("stream", start, failed)
+
+    def generate_stream(self, prompt: str, **fields: Any) -> Iterator[str]:
+        """Yield response text as it is generated."""
+        if self.backend == "cli":
+            yield self.generate(prompt)
+            return
+        for chunk in self.stream_chunks(prompt, **fields):
+            if chunk.get("response"):
+                yield chunk["response"]
+
+    def generate_raw(self, prompt: str, **fields: Any) -> Dict[str, Any]:
+        """Run a non-streaming /api/generate call and return Ollama's whole reply (timings, context...)."""
+        start, failed = time.perf_counter(), True
+        try:
+            with self._post({"model": self.model, "prompt": prompt, "stream": False, **fields}) as response:
+                body = json.loads(response.read())
+            if body.get("error"):
+                raise OllamaError(body["error"])
+            failed = False
+        finally:
+            _observe("generate", start, failed)
+        return body
+
+    def generate(self, prompt: str, **fields: Any) -> str:
+        """Return the full response text for a prompt."""
+        if self.backend == "cli":
+            return self._generate_cli(prompt)
+        return self.generate_raw(prompt, **fields).get("response", "").strip()
+
+    # ----------------------------- CLI fallback ------------------------------
+    def _generate_cli(self, prompt: str) -> str:
+        # Use subprocess to properly execute Ollama without shell=True
+        start, failed = time.perf_counter(), True
+        try:
+            result = subprocess.run(
+                ["ollama", "run", self.model],
+                input=prompt,
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+            )
+            if result.returncode != 0:
+                raise OllamaError(result.stderr.strip() or f"ollama exited with status {result.returncode}")
+            failed = False
+        finally:
+            _observe("cli", start, failed)
+        return result.stdout.strip()
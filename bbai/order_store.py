@@ -0,0 +1,380 @@
+"""
+orders.json as a compact column store: one NumPy array per field instead of one dict per order.
+
+``json.load`` of orders.json builds a dict for every order, with its own "Name of dish",
+"Restaurant", "userName" and "Date" strings. That costs hundreds of bytes per order and a
+Python loop for every question asked of the history. ``OrderStore`` keeps the same orders as
+six columns of 4 bytes a row:
+
+* ``user``, ``restaurant`` and ``dish`` are dictionary codes (int32) into per-column lists of
+  the distinct strings, so each name is stored once however many orders repeat it;
+* ``day`` is the order date as days since 1970-01-01 (int32, ``MISSING_DAY`` if unparseable);
+* ``second`` is the order time as seconds after midnight (int32, ``MISSING_SECOND`` for orders
+  written before /update_orders recorded a "Time");
+* ``price`` is float32 (NaN if unparseable).
+
+The columns are persisted to ``BBAI_ORDER_STORE_PATH`` (default ``.bbai-cache/orders.bin``):
+a fixed header, the six columns each with room for ``capacity`` rows, then a log of the
+dictionary strings, one JSON ``[column, string]`` line per new string. Loading memory-maps the
+file, so a worker starts with millions of orders in a few milliseconds and workers share the
+pages. ``/update_orders`` appends its order in place: four bytes into the free space of each
+column, a line per new string, then the header. That is O(1) per order; only a full column
+rewrites the file, at twice the capacity. The header records the orders.json version
+(mtime + size) the rows match and is written last, so a half-finished append reads as stale.
+As with the other JSON caches, any other change to orders.json triggers a rebuild.
+
+To compare it with orders.json on a synthetic history:
+    python -m bbai.order_store --synthetic 1000000
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bbai.intake import ORDER_DATE_FORMAT, Version, file_version
+from bbai.menu import BASE_DIR
+from bbai.metrics import read_json
+
+STORE_PATH = os.getenv("BBAI_ORDER_STORE_PATH", os.path.join(BASE_DIR, ".bbai-cache", "orders.bin"))
+ORDERS_PATH = os.path.join(BASE_DIR, "static", "json", "orders.json")
+MAGIC = b"BBAIORD3"
+HEADER = struct.Struct("<8sqqQQ")  # magic, source mtime_ns, source size, rows, capacity
+MIN_CAPACITY = 1024
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("user", "<i4"), ("restaurant", "<i4"), ("dish", "<i4"), ("day", "<i4"), ("second", "<i4"), ("price", "<f4"),
+)
+DICTIONARY_COLUMNS = ("user", "restaurant", "dish")
+FIELDS = {"user": "userName", "restaurant": "Restaurant", "dish": "Name of dish"}  # column -> orders.json key
+EPOCH = date(1970, 1, 1)
+MISSING_DAY = -2 ** 31
+MISSING_SECOND = -1
+ORDER_TIME_FORMAT = "%H:%M:%S"  # How /update_orders writes "Time"
+
+
+def day_number(value: Any) -> int:
+    """An orders.json "Date" (dd/mm/yyyy) as days since 1970-01-01, or MISSING_DAY."""
+    try:
+        return (datetime.strptime(str(value), ORDER_DATE_FORMAT).date() - EPOCH).days
+    except ValueError:
+        return MISSING_DAY
+
+
+def second_number(value: Any) -> int:
+    """An orders.json "Time" (HH:MM:SS) as seconds after midnight, or MISSING_SECOND."""
+    try:
+        moment = datetime.strptime(str(value), ORDER_TIME_FORMAT)
+    except ValueError:
+        return MISSING_SECOND
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def day_date(number: int) -> Optional[date]:
+    return None if number == MISSING_DAY else EPOCH + timedelta(days=int(number))
+
+
+def _price(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class Dictionary:
+    """Distinct strings of one column and their codes, in first-seen order."""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = values or []
+        self.codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value: Any) -> int:
+        value = "" if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def encode(orders: Sequence[Dict[str, Any]], dictionaries: Dict[str, Dictionary]) -> Dict[str, np.ndarray]:
+    """Column arrays for orders.json rows, adding new strings to `dictionaries`."""
+    buffers = {name: array("f" if name == "price" else "i") for name, _ in COLUMNS}
+    for order in orders:
+        for name in DICTIONARY_COLUMNS:
+            buffers[name].append(dictionaries[name].code(order.get(FIELDS[name])))
+        buffers["day"].append(day_number(order.get("Date", "")))
+        buffers["second"].append(second_number(order.get("Time", "")))
+        buffers["price"].append(_price(order.get("Price")))
+    return {name: np.frombuffer(buffers[name], dtype=dtype) if len(buffers[name]) else np.zeros(0, dtype=dtype)
+            for name, dtype in COLUMNS}
+
+
+def _header(version: Version, rows: int, capacity: int) -> bytes:
+    mtime, size = version if version is not None else (-1, -1)
+    return HEADER.pack(MAGIC, mtime, size, rows, capacity)
+
+
+def _column_offset(index: int, capacity: int) -> int:
+    return HEADER.size + index * capacity * 4
+
+
+def _dictionary_lines(entries: Sequence[Tuple[str, str]]) -> bytes:
+    return b"".join(json.dumps([name, value]).encode("utf-8") + b"\n" for name, value in entries)
+
+
+def save(path: str, columns: Dict[str, np.ndarray], dictionaries: Dict[str, Dictionary], version: Version) -> int:
+    """Write the store file atomically, with room to append as many rows again. Returns the capacity."""
+    rows = len(columns["user"])
+    capacity = max(MIN_CAPACITY, 2 * rows)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_header(version, rows, capacity))
+        for name, dtype in COLUMNS:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            f.write(bytes((capacity - rows) * 4))
+        f.write(_dictionary_lines([(name, value) for name in DICTIONARY_COLUMNS for value in dictionaries[name].values]))
+    os.replace(tmp, path)  # Workers with the old file mapped keep reading it
+    return capacity
+
+
+def map_columns(path: str, rows: int, capacity: int) -> Dict[str, np.ndarray]:
+    """Read-only views of the first `rows` rows of each column."""
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(raw) < _column_offset(len(COLUMNS), capacity):
+        raise ValueError(f"{path} is truncated")
+    return {name: raw[_column_offset(index, capacity):_column_offset(index, capacity) + rows * 4].view(dtype)
+            for index, (name, dtype) in enumerate(COLUMNS)}
+
+
+def load(path: str):
+    """(columns memory-mapped read-only, dictionaries, source version, capacity) of a store file."""
+    with open(path, "rb") as f:
+        magic, mtime, size, rows, capacity = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or rows > capacity:
+            raise ValueError(f"{path} is not an order store")
+        f.seek(_column_offset(len(COLUMNS), capacity))
+        log = f.read()
+    dictionaries = {name: Dictionary() for name in DICTIONARY_COLUMNS}
+    lines = log.split(b"\n")[:-1]  # The last piece is empty, or a line still being appended
+    for name, value in json.loads(b"[" + b",".join(lines) + b"]"):
+        dictionaries[name].code(value)
+    return map_columns(path, rows, capacity), dictionaries, (None if mtime < 0 else (mtime, size)), capacity
+
+
+def append(path: str, row: Dict[str, np.ndarray], strings: Sequence[Tuple[str, str]], rows: int, capacity: int,
+           previous_version: Version, version: Version) -> bool:
+    """
+    Write one encoded row and its new dictionary strings into the free space of the file, then
+    the header. False, with nothing written, if the file isn't the one `rows`, `capacity` and
+    `previous_version` describe (replaced by another worker) or has no room left.
+    """
+    with open(path, "r+b") as f:
+        if f.read(HEADER.size) != _header(previous_version, rows, capacity) or rows >= capacity:
+            return False
+        for index, (name, dtype) in enumerate(COLUMNS):
+            f.seek(_column_offset(index, capacity) + rows * 4)
+            f.write(np.ascontiguousarray(row[name], dtype=dtype).tobytes())
+        if strings:
+            f.seek(0, os.SEEK_END)
+            f.write(_dictionary_lines(strings))
+        f.flush()
+        f.seek(0)
+        f.write(_header(version, rows + 1, capacity))
+    return True
+
+
+class OrderStore:
+    """orders.json as dictionary-encoded columns, memory-mapped from a binary file."""
+
+    def __init__(self, orders_path: str = ORDERS_PATH, store_path: str = STORE_PATH):
+        self.orders_path = orders_path
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self._columns: Dict[str, Any] = {}
+        self._dictionaries: Dict[str, Dictionary] = {}
+        self._capacity = 0
+        self._version: Version = None
+        self._current = False
+        self.mapped = 0
+        self.rebuilds = 0
+        self.incremental = 0
+        self.appended = 0
+        self.load_ms = 0.0
+
+    def _refresh(self) -> None:
+        """Map the store file, or rebuild it from orders.json if it is missing or stale (lock held)."""
+        version = file_version(self.orders_path)
+        if self._current and version == self._version:
+            return
+        start = time.perf_counter()
+        try:
+            columns, dictionaries, built_from, capacity = load(self.store_path)
+        except (OSError, ValueError, KeyError):
+            built_from = None
+        if built_from is None or built_from != version:
+            dictionaries = {name: Dictionary() for name in DICTIONARY_COLUMNS}
+            columns = encode(read_json(self.orders_path, "orders") if version is not None else [], dictionaries)
+            capacity = self._save(columns, dictionaries, version)
+            self.rebuilds += 1
+        else:
+            self.mapped += 1
+        self._columns, self._dictionaries, self._capacity = columns, dictionaries, capacity
+        self._version, self._current = version, True
+        self.load_ms = (time.perf_counter() - start) * 1000
+
+    def _save(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, Dictionary], version: Version) -> int:
+        """Write the whole file; the capacity to append to, or 0 (appends then stay in memory) if it failed."""
+        try:
+            return save(self.store_path, columns, dictionaries, version)
+        except OSError as e:
+            print(f"Error writing {self.store_path}: {e}")
+            return 0
+
+    def load(self) -> None:
+        with self._lock:
+            self._refresh()
+
+    def record(self, order: Dict[str, Any], previous_version: Version, version: Version) -> None:
+        """
+        Append an order that was just appended to orders.json, in memory and in the store file.
+        `previous_version` and `version` are file_version() from just before and just after that
+        write, taken under the caller's write lock. If the store was current before the write,
+        this order is all that changed; otherwise the next read rebuilds it.
+        """
+        with self._lock:
+            if not self._current or previous_version is None or previous_version != self._version:
+                return
+            known = {name: len(self._dictionaries[name].values) for name in DICTIONARY_COLUMNS}
+            row = encode([order], self._dictionaries)
+            strings = [(name, value) for name in DICTIONARY_COLUMNS for value in self._dictionaries[name].values[known[name]:]]
+            rows = len(self._columns["user"])
+            self._version = version
+            self.incremental += 1
+            try:
+                if self._capacity and append(self.store_path, row, strings, rows, self._capacity, previous_version, version):
+                    self._columns = map_columns(self.store_path, rows + 1, self._capacity)
+                    self.appended += 1
+                    return
+            except (OSError, ValueError) as e:
+                print(f"Error appending to {self.store_path}: {e}")
+            self._columns = {name: np.concatenate([self._columns[name], row[name]]) for name, _ in COLUMNS}
+            self._capacity = self._save(self._columns, self._dictionaries, version)
+            if self._capacity:
+                self._columns = map_columns(self.store_path, rows + 1, self._capacity)
+
+    def columns(self) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        """The column arrays (read-only) and the dictionary values, current with orders.json."""
+        _, columns, values = self.since(None)
+        return columns, values
+
+    def since(self, start: Optional[date]) -> Tuple[Version, Dict[str, Any], Dict[str, List[str]]]:
+        """
+        The orders.json version the store matches, with the columns of the rows dated `start` or
+        later (all rows if None) and the dictionary values, read together so they agree.
+        """
+        with self._lock:
+            self._refresh()
+            columns = dict(self._columns)
+            if start is not None:
+                mask = columns["day"] >= (start - EPOCH).days
+                columns = {name: column[mask] for name, column in columns.items()}
+            return self._version, columns, {name: d.values for name, d in self._dictionaries.items()}
+
+    def counts(self, by: Sequence[str], start: Optional[date] = None) -> List[Tuple[Tuple[Any, ...], int]]:
+        """
+        Orders per distinct combination of the `by` columns (user/restaurant/dish/day/second), from
+        `start` on, decoded back to strings and dates. One vectorised pass over the columns.
+        """
+        _, columns, values = self.since(start)
+        keys = np.stack([columns[name] for name in by])
+        if keys.shape[1] == 0:
+            return []
+        combos, totals = np.unique(keys, axis=1, return_counts=True)
+        decode = [(lambda code, name=name: values[name][code]) if name in values else day_date if name == "day" else int
+                  for name in by]
+        return [(tuple(fn(int(code)) for fn, code in zip(decode, combo)), int(total))
+                for combo, total in zip(combos.T, totals)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = len(self._columns.get("user", ()))
+            return {"rows": rows, "column_bytes": sum(column.nbytes for column in self._columns.values()),
+                    "distinct": {name: len(d.values) for name, d in self._dictionaries.items()},
+                    "capacity": self._capacity, "mapped": self.mapped, "rebuilds": self.rebuilds,
+                    "incremental": self.incremental, "appended_in_place": self.appended,
+                    "load_ms": round(self.load_ms, 2)}
+
+
+def synthetic_orders(count: int, users: int = 20000, seed: int = 0) -> List[Dict[str, Any]]:
+    """orders.json-shaped rows drawn from the menu, over the last two years."""
+    from bbai.menu import load_menu
+
+    items = [(item.restaurant, item.name, item.price) for item in load_menu().items]
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(items), size=count)
+    people = rng.integers(users, size=count)
+    days = rng.integers(730, size=count)
+    today = date.today()
+    return [{"Date": (today - timedelta(days=int(day))).strftime(ORDER_DATE_FORMAT), "Name of dish": items[pick][1],
+             "Restaurant": items[pick][0], "Price": items[pick][2], "userName": f"User {person}"}
+            for pick, person, day in zip(picks, people, days)]
+
+
+def main(argv=None) -> None:
+    import tempfile
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Build the columnar order store and compare it with orders.json.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Benchmark this many generated orders instead of orders.json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        orders_path = ORDERS_PATH
+        if args.synthetic:
+            orders_path = os.path.join(tmp, "orders.json")
+            with open(orders_path, "w") as f:
+                json.dump(synthetic_orders(args.synthetic), f)
+        store_path = os.path.join(tmp, "orders.bin") if args.synthetic else STORE_PATH
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        orders = read_json(orders_path)
+        json_ms = (time.perf_counter() - start) * 1000
+        json_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        spent: Dict[str, float] = {}
+        for order in orders:
+            spent[order["userName"]] = spent.get(order["userName"], 0.0) + _price(order["Price"])
+        loop_ms = (time.perf_counter() - start) * 1000
+        del orders
+
+        store = OrderStore(orders_path, store_path)
+        store.load()  # Builds the file
+        store = OrderStore(orders_path, store_path)
+        start = time.perf_counter()
+        columns, values = store.columns()
+        map_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        prices = np.nan_to_num(columns["price"]).astype(np.float64)
+        totals = np.bincount(columns["user"], weights=prices, minlength=len(values["user"]))
+        scan_ms = (time.perf_counter() - start) * 1000
+        stats = store.stats()
+
+    print(f"{stats['rows']} orders, {stats['distinct']}")
+    print(f"  orders.json: load {json_ms:9.1f} ms, {json_bytes / 2 ** 20:8.1f} MiB of dicts, "
+          f"spend per user {loop_ms:8.1f} ms")
+    print(f"  order store: map  {map_ms:9.1f} ms, {stats['column_bytes'] / 2 ** 20:8.1f} MiB of columns, "
+          f"spend per user {scan_ms:8.1f} ms ({len(totals)} users)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Password hashing off the request threads.
+
+Hashing is deliberately expensive, so a burst of logins used to pin every CPU the server had
+and starve unrelated routes. Hash and verify calls now run in a small bounded thread pool
+(hashlib releases the GIL while it works) with a cap on how many jobs may wait. The hash
+method is configurable, and hashes made with an older method are upgraded on the next
+successful login.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = "scrypt"  # Same default as werkzeug; e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:1000000"
+DEFAULT_MAX_QUEUE = 32
+
+
+class HashQueueFull(RuntimeError):
+    """Raised when too many hash jobs are already waiting; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """Bounded worker pool for generate/check_password_hash, with timing statistics."""
+
+    def __init__(self, method: Optional[str] = None, workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        self.method = method or os.getenv("BBAI_PASSWORD_METHOD", DEFAULT_METHOD)
+        # Leave at least one core for the rest of the app
+        self.workers = workers or int(os.getenv("BBAI_HASH_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+        self.max_queue = max_queue or int(os.getenv("BBAI_HASH_QUEUE", DEFAULT_MAX_QUEUE))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._prefix: Optional[str] = None
+
+        self.jobs = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.cpu_ms_total = 0.0
+
+    # ----------------------------- Pool --------------------------------------
+    def _executor(self) -> ThreadPoolExecutor:
+        # Created on first use so a forked worker gets its own threads
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bbai-hash")
+        return self._pool
+
+    def _run(self, func, *args, info: Optional[Dict[str, Any]] = None):
+        """Run `func` in the pool and wait for it, recording queue wait and CPU time in `info`."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashQueueFull("Too many password checks in progress")
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            cpu_start = time.thread_time()
+            result = func(*args)
+            return result, (started - submitted) * 1000, (time.thread_time() - cpu_start) * 1000
+
+        try:
+            result, queue_ms, cpu_ms = self._executor().submit(job).result()
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.jobs += 1
+            self.queue_ms_total += queue_ms
+            self.queue_ms_max = max(self.queue_ms_max, queue_ms)
+            self.cpu_ms_total += cpu_ms
+        if info is not None:
+            info["hash_queue_ms"] = round(info.get("hash_queue_ms", 0) + queue_ms, 3)
+            info["hash_cpu_ms"] = round(info.get("hash_cpu_ms", 0) + cpu_ms, 3)
+        return result
+
+    # ----------------------------- Hashing -----------------------------------
+    def _method_prefix(self) -> str:
+        """The `method:params` part werkzeug writes for the configured method, e.g. 'scrypt:32768:8:1'."""
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", self.method, salt_length=1).split("$", 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        return stored_hash.split("$", 1)[0] != self._method_prefix()
+
+    def hash(self, password: str, info: Optional[Dict[str, Any]] = None) -> str:
+        return self._run(generate_password_hash, password, self.method, info=info)
+
+    def verify(self, stored_hash: str, password: str,
+               info: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Check `password` against `stored_hash`. Returns ``(ok, new_hash)`` where `new_hash` is set
+        when the password was right but the stored hash used outdated parameters.
+        """
+        def check() -> Tuple[bool, Optional[str]]:
+            if not check_password_hash(stored_hash, password):
+                return False, None
+            if self.needs_rehash(stored_hash):
+                return True, generate_password_hash(password, self.method)
+            return True, None
+
+        ok, new_hash = self._run(check, info=info)
+        if new_hash is not None:
+            with self._lock:
+                self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = self.jobs or 1
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "jobs": self.jobs,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "queue_ms_avg": round(self.queue_ms_total / jobs, 3),
+                "queue_ms_max": round(self.queue_ms_max, 3),
+                "cpu_ms_avg": round(self.cpu_ms_total / jobs, 3),
+                "cpu_ms_total": round(self.cpu_ms_total, 3),
+            }
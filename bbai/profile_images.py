@@ -0,0 +1,146 @@
+"""
+Profile picture processing: uploads become small, content-addressed thumbnails.
+
+Uploads used to be stored as-is (up to 10 MB) as ``<username>.<ext>`` and sent to every avatar
+slot at full size, and the fixed name meant browsers kept showing a stale picture. Each upload
+is now decoded, EXIF orientation applied and metadata dropped, center-cropped and resized to
+a few square sizes, saved as WebP and JPEG under ``<content hash>-<size>.<ext>``. A name never
+changes meaning, so the files can be cached forever. The work runs on a dedicated worker so
+large decodes don't tie up request threads.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+SIZES = {"sm": 96, "md": 256, "lg": 512}  # Nav/chat avatars, profile card, full view (2x the CSS size)
+STORED_SIZE = "md"  # The JPEG recorded as profile_pic, so anything using the bare filename still works
+MAX_PIXELS = 40_000_000  # Refuse decompression bombs long before Pillow's own limit
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+HASHED_NAME = re.compile(r"^(?P<digest>[0-9a-f]{16})-(?P<size>sm|md|lg)\.(?P<ext>jpg|webp)$")
+
+
+class ImageRejected(ValueError):
+    """The upload is not an image Pillow can decode, or it is too large."""
+
+
+def content_name(digest: str, size: str, ext: str) -> str:
+    return f"{digest}-{size}.{ext}"
+
+
+def is_hashed(filename: Optional[str]) -> bool:
+    return bool(filename and HASHED_NAME.match(os.path.basename(filename)))
+
+
+def variant(filename: str, size: str, ext: str) -> Optional[str]:
+    """Sibling of a processed picture at another size/format, or None for legacy (unprocessed) files."""
+    match = HASHED_NAME.match(os.path.basename(filename))
+    if not match:
+        return None
+    return os.path.join(os.path.dirname(filename), content_name(match["digest"], size, ext))
+
+
+def avatar(path: str, size: str) -> Dict[str, Optional[str]]:
+    """
+    Template helper: ``{"jpg": ..., "webp": ...}`` URLs of `path` at `size`. Legacy pictures
+    (e.g. default.png) only have their original file, so ``webp`` is None and ``jpg`` is `path`.
+    """
+    jpg = variant(path, size, "jpg")
+    return {"jpg": jpg or path, "webp": variant(path, size, "webp")}
+
+
+def process_image(data: bytes, folder: str) -> str:
+    """Decode, normalise and write every size/format of `data`; returns the stored (md JPEG) filename."""
+    from PIL import Image, ImageOps  # Pillow is only needed once someone uploads a picture
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    stored = content_name(digest, STORED_SIZE, "jpg")
+    if all(os.path.exists(os.path.join(folder, content_name(digest, size, ext)))
+           for size in SIZES for ext in ("jpg", "webp")):
+        return stored  # Same picture uploaded before
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise ImageRejected("Image is too large")
+        image.draft("RGB", (max(SIZES.values()) * 2,) * 2)  # Let JPEG decode at a reduced scale
+        image = ImageOps.exif_transpose(image)  # Applies the orientation tag; saving below drops EXIF
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    except ImageRejected:
+        raise
+    except Exception as e:
+        raise ImageRejected("Not a supported image") from e
+
+    for size, pixels in SIZES.items():
+        thumb = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        for ext, options in (("jpg", {"format": "JPEG", "quality": JPEG_QUALITY, "optimize": True, "progressive": True}),
+                             ("webp", {"format": "WEBP", "quality": WEBP_QUALITY, "method": 4})):
+            path = os.path.join(folder, content_name(digest, size, ext))
+            tmp = f"{path}.{os.getpid()}.tmp"
+            thumb.save(tmp, **options)
+            os.replace(tmp, path)
+    return stored
+
+
+def remove_variants(filename: str, folder: str) -> None:
+    """Delete every size/format of a processed picture (legacy files are deleted as-is)."""
+    match = HASHED_NAME.match(filename)
+    names: List[str] = ([content_name(match["digest"], size, ext) for size in SIZES for ext in ("jpg", "webp")]
+                        if match else [filename])
+    for name in names:
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+
+
+class ImageProcessor:
+    """Single background worker for uploads; callers may wait briefly for the result."""
+
+    def __init__(self, folder: str, workers: Optional[int] = None):
+        self.folder = folder
+        self.workers = workers or int(os.getenv("BBAI_IMAGE_WORKERS", 1))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bbai-image")
+        return self._pool
+
+    def submit(self, data: bytes, on_done: Callable[[str], None]) -> Future:
+        """
+        Process `data` in the background and call `on_done(stored filename)` from the worker.
+        Errors from `on_done` are printed here, since nobody may be waiting on the future, and
+        then raised from it; `on_done` should clean up the stored files itself.
+        """
+        def job() -> str:
+            try:
+                stored = process_image(data, self.folder)
+            except ImageRejected:
+                self.rejected += 1
+                raise
+            try:
+                on_done(stored)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error saving profile picture {stored}: {e}")
+                raise
+            self.processed += 1
+            return stored
+        return self._executor().submit(job)
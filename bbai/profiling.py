@@ -0,0 +1,180 @@
+"""
+Opt-in per-request profiling.
+
+Off by default, and then nothing is installed: no hooks, no per-request check. Enable with
+
+* ``BBAI_PROFILE_RATE=0.01``: profile a random 1% of requests, and/or
+* ``BBAI_PROFILE_ON_DEMAND=1``: profile any request carrying ``X-BBAI-Profile: <token>``
+  (the same token as the stats endpoints).
+
+Each profiled request writes one file to ``BBAI_PROFILE_DIR`` (default ``.bbai-cache/profiles``)
+named ``<timestamp>_<METHOD>_<route>_<ms>ms`` and tags the response with
+``X-BBAI-Profile-File``. ``BBAI_PROFILE_FORMAT`` picks the profiler:
+
+* ``cprofile`` (default): deterministic, written as ``.prof``; open with
+  ``python -m pstats`` or snakeviz.
+* ``sample``: a thread samples the request's stack every ``BBAI_PROFILE_INTERVAL_MS``
+  (default 5). It is written as collapsed stacks (``.folded``) for flamegraph.pl or
+  speedscope, and its overhead doesn't grow with the number of calls.
+
+Only the newest ``BBAI_PROFILE_KEEP`` (default 200) files are kept.
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+from bbai.menu import BASE_DIR
+
+PROFILE_HEADER = "X-BBAI-Profile"
+DEFAULT_DIR = os.path.join(BASE_DIR, ".bbai-cache", "profiles")
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts identical stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bbai-profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own_file = __file__
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own_file:
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _stop(handle) -> None:
+    if isinstance(handle, cProfile.Profile):
+        handle.disable()
+    else:
+        handle.stop()
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes one profile file per profiled request."""
+
+    def __init__(self, authenticate: Optional[Callable[[str], bool]] = None):
+        env = os.getenv
+        self.rate = float(env("BBAI_PROFILE_RATE", 0))
+        self.on_demand = env("BBAI_PROFILE_ON_DEMAND", "0") == "1" and authenticate is not None
+        self.directory = env("BBAI_PROFILE_DIR", DEFAULT_DIR)
+        self.format = env("BBAI_PROFILE_FORMAT", "cprofile").lower()
+        self.interval = float(env("BBAI_PROFILE_INTERVAL_MS", 5)) / 1000
+        self.keep = int(env("BBAI_PROFILE_KEEP", 200))
+        self._authenticate = authenticate
+        self.profiled = 0
+        self.skipped = 0  # cProfile couldn't start because another profiler was active
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.on_demand
+
+    def wanted(self, request) -> bool:
+        if self.on_demand:
+            token = request.headers.get(PROFILE_HEADER)
+            if token and self._authenticate(token):
+                return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def start(self):
+        if self.format == "sample":
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            return sampler
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Python 3.12+ allows one active profiler per process
+            self.skipped += 1
+            return None
+        return profiler
+
+    def _filename(self, method: str, route: str, elapsed_ms: float) -> str:
+        stamp = time.strftime("%Y%m%dT%H%M%S") + f"{time.time() % 1:.3f}"[1:]
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+        extension = "folded" if self.format == "sample" else "prof"
+        return f"{stamp}_{method}_{slug}_{elapsed_ms:.0f}ms.{extension}"
+
+    def finish(self, handle, method: str, route: str, elapsed_ms: float) -> str:
+        """Stop `handle` (from start()) and write its profile; returns the file name."""
+        _stop(handle)
+        os.makedirs(self.directory, exist_ok=True)
+        name = self._filename(method, route, elapsed_ms)
+        path = os.path.join(self.directory, name)
+        if isinstance(handle, cProfile.Profile):
+            handle.dump_stats(path)
+        else:
+            handle.dump(path)
+        self.profiled += 1
+        self._prune()
+        return name
+
+    def _prune(self) -> None:
+        names = sorted(os.listdir(self.directory))  # Timestamp first, so name order is age order
+        for name in names[:max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def init_app(self, app) -> None:
+        """Install the request hooks, but only when profiling is enabled."""
+        if not self.enabled:
+            return
+        from flask import g, request
+
+        @app.before_request
+        def _profile_start():
+            if self.wanted(request):
+                handle = self.start()
+                if handle is not None:
+                    g.profile = (handle, time.perf_counter())
+
+        @app.after_request
+        def _profile_finish(response):
+            started = g.pop("profile", None)
+            if started is not None:
+                handle, start = started
+                route = request.url_rule.rule if request.url_rule is not None else request.path
+                name = self.finish(handle, request.method, route, (time.perf_counter() - start) * 1000)
+                response.headers["X-BBAI-Profile-File"] = name
+            return response
+
+        @app.teardown_request
+        def _profile_abort(exc):
+            started = g.pop("profile", None)  # Still set only if the view raised
+            if started is not None:
+                _stop(started[0])
+
+        mode = [f"{self.rate:.2%} of requests"] if self.rate > 0 else []
+        if self.on_demand:
+            mode.append(f"on demand ({PROFILE_HEADER})")
+        print(f"Request profiling ({self.format}): {' and '.join(mode)} -> {self.directory}")
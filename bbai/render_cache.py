@@ -0,0 +1,133 @@
+"""
+Caches behind the logged-in pages (dashboard, chatbot, AR view, FAQs, profile).
+
+Each of those pages used to look up the user, stat their profile picture and, for the profile
+page, re-read users.json and a country-codes file picked per request. Reference data is now
+loaded once, JSON data files are re-parsed only when they change on disk, profile-picture
+checks are memoized per user, and rendered pages are kept per render context with an ETag so
+a repeat view is a dictionary lookup (or a 304).
+"""
+import hashlib
+import os
+import platform
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Response
+
+from bbai.menu import BASE_DIR
+from bbai.metrics import read_json
+
+DEFAULT_PAGE_CACHE_SIZE = 512
+
+
+def country_codes_path() -> str:
+    """The country-codes file for this OS (Windows doesn't render flag emoji, so its copy has none)."""
+    name = "COUNTRY_CODES_MAC.json" if platform.system().lower() in ("darwin", "linux") else "COUNTRY_CODES_WIN.json"
+    return os.path.join(BASE_DIR, "static", "json", name)
+
+
+class JsonFile:
+    """
+    A JSON data file parsed once per version (mtime + size); callers must treat the data as read-only.
+    With `watch=False` it is reference data: parsed on first use and never stat()ed again.
+    """
+
+    def __init__(self, path: str, index_key: Optional[str] = None, watch: bool = True):
+        self.path = path
+        self.index_key = index_key
+        self.watch = watch
+        self._lock = threading.Lock()
+        self.version: Optional[Tuple[int, int]] = None
+        self.data: Any = None
+        self.index: Dict[Any, Any] = {}
+
+    def load(self) -> Any:
+        if not self.watch and self.version is not None:
+            return self.data
+        stat = os.stat(self.path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    data = read_json(self.path)
+                    index = {}
+                    if self.index_key:
+                        for row in data:
+                            index.setdefault(row.get(self.index_key), row)  # First match, like next()
+                    self.data, self.index, self.version = data, index, version
+        return self.data
+
+    def get(self, key: Any) -> Any:
+        self.load()
+        return self.index.get(key)
+
+
+class ProfilePictures:
+    """Memoized 'does this user's picture exist, else the default' per user."""
+
+    def __init__(self, folder: str, default: str):
+        self.folder = folder
+        self.default = default
+        self._resolved: Dict[Hashable, Tuple[str, str]] = {}  # user -> (stored name, resolved name)
+
+    def resolve(self, user_key: Hashable, filename: Optional[str]) -> str:
+        cached = self._resolved.get(user_key)
+        if cached is not None and cached[0] == filename:
+            return cached[1]
+        resolved = filename if filename and os.path.exists(os.path.join(self.folder, filename)) else self.default
+        self._resolved[user_key] = (filename, resolved)
+        return resolved
+
+    def invalidate(self, user_key: Hashable) -> None:
+        self._resolved.pop(user_key, None)
+
+
+class PageCache:
+    """LRU of rendered pages keyed by everything their render context depends on."""
+
+    def __init__(self, max_pages: Optional[int] = None):
+        self.max_pages = max_pages or int(os.getenv("BBAI_PAGE_CACHE_SIZE", DEFAULT_PAGE_CACHE_SIZE))
+        self._pages: "OrderedDict[Hashable, Tuple[str, str]]" = OrderedDict()  # key -> (etag, html)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def respond(self, key: Hashable, render: Callable[[], str], request) -> Response:
+        """Serve the page for `key`, rendering only on a miss and answering 304 when the ETag matches."""
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            html = render()
+            entry = (hashlib.sha1(html.encode("utf-8")).hexdigest()[:20], html)
+            with self._lock:
+                self.misses += 1
+                self._pages[key] = entry
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+
+        etag, html = entry
+        if request.if_none_match.contains(etag):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(html, mimetype="text/html")
+        response.set_etag(etag)
+        # Per-user pages: browsers may keep them but must revalidate; shared caches must not
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pages": len(self._pages), "hits": self.hits, "misses": self.misses,
+                    "not_modified": self.not_modified}
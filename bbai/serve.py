@@ -0,0 +1,133 @@
+"""
+Production entry point: run the app under a real WSGI server.
+
+    python -m bbai.serve --workers 2 --threads 8 --port 1000
+
+On Linux/macOS this uses gunicorn (``pip install gunicorn``) with threaded workers. Startup
+is split in three:
+
+1. ``init_deployment()`` runs once, in the parent: writes that must not race between workers
+   (user-ID backfill, static asset build, the opt-in library installer).
+2. With preloading (the default), the app is built and ``warm_shared_data()`` loads the menu,
+   the menu prompt, the asset index and the reference JSON in the parent, so forked workers
+   share those pages copy-on-write.
+3. ``init_worker()`` runs in every worker after fork: the chat logger's writer thread and its
+   per-worker log file.
+
+Where fork isn't available (Windows) it falls back to waitress: one process, many threads.
+In-process state (chat memory, caches) is per worker, so a user's chat history is only kept
+while their requests land on the same worker; use one worker if that matters.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLASK_APP_PATH = os.path.join(BASE_DIR, "flask-app.py")
+
+DEFAULT_PORT = 1000  # Same port as `python flask-app.py`; the chatbot page posts to it
+DEFAULT_TIMEOUT = 300  # Slow LLM answers must not get a worker killed
+
+
+def load_app_module() -> ModuleType:
+    """Import flask-app.py (not importable by name because of the hyphen)."""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.chdir(BASE_DIR)  # The app resolves static/ and templates/ relative to the working directory
+    spec = importlib.util.spec_from_file_location("flask_app", FLASK_APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    env = os.getenv
+    parser = argparse.ArgumentParser(description="Serve Byte Bite-AI with a production WSGI server.")
+    parser.add_argument("--host", default=env("BBAI_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(env("BBAI_PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=int(env("BBAI_WORKERS", 1)),
+                        help="Worker processes (gunicorn only; default 1, see the module docstring)")
+    parser.add_argument("--threads", type=int, default=int(env("BBAI_THREADS", 8)),
+                        help="Threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(env("BBAI_WORKER_TIMEOUT", DEFAULT_TIMEOUT)),
+                        help="Seconds before a silent worker is restarted (gunicorn)")
+    parser.add_argument("--max-requests", type=int, default=int(env("BBAI_MAX_REQUESTS", 0)),
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Build the app in each worker instead of once in the parent")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "waitress"), default=env("BBAI_SERVER", "auto"))
+    return parser.parse_args(argv)
+
+
+def serve_gunicorn(module: ModuleType, args: argparse.Namespace) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def __init__(self):
+            self.application = None
+            super().__init__()
+
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "timeout": args.timeout,
+                "graceful_timeout": 30,
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests // 10,
+                "preload_app": args.preload,
+                "post_fork": lambda server, worker: module.init_worker(),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # With preload this runs once in the parent; otherwise once in every worker
+            if self.application is None:
+                self.application = module.create_app(init_worker_now=False)
+                if args.preload:
+                    module.warm_shared_data()
+                module.report_startup()
+            return self.application
+
+    Application().run()
+
+
+def serve_waitress(module: ModuleType, args: argparse.Namespace) -> None:
+    from waitress import serve
+
+    if args.workers > 1:
+        print(f"waitress runs a single process; ignoring --workers {args.workers}, using {args.threads} threads.")
+    app = module.create_app(init_worker_now=False)
+    module.warm_shared_data()
+    module.init_worker()
+    module.report_startup()
+    serve(app, host=args.host, port=args.port, threads=args.threads, channel_timeout=args.timeout)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if hasattr(os, "fork") else "waitress"
+    if importlib.util.find_spec(server) is None:
+        sys.exit(f"{server} is not installed; pip install {server}")
+
+    os.environ.setdefault("BBAI_WORKER_LOGS", "1" if server == "gunicorn" and args.workers > 1 else "0")
+
+    module = load_app_module()
+    module.init_deployment()
+    os.environ["BBAI_DEPLOYMENT_READY"] = "1"  # create_app() in this process or any worker skips it
+
+    if server == "gunicorn":
+        serve_gunicorn(module, args)
+    else:
+        serve_waitress(module, args)
+
+
+if __name__ == "__main__":
+    main()
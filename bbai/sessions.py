@@ -0,0 +1,152 @@
+"""
+Signed session tokens and a short-lived cache of the users they refer to.
+
+The server used to trust the ``BBAIcurrentuser`` cookie (a display name the browser can edit)
+and look it up in credentials.json on every page. Logins now get an HttpOnly cookie holding
+a signed, timestamped token with the user's stable ID; resolving it is a signature check
+plus a dictionary lookup, and renaming a user no longer invalidates their session.
+
+Tokens also carry the user's session generation (``session_generation`` in credentials.json).
+Changing the password bumps it, which revokes every token issued before on every device.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from bbai.credentials import CredentialStore
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_PATH = os.getenv("BBAI_SESSION_SECRET_PATH", os.path.join(BASE_DIR, ".bbai-cache", "session-secret"))
+SESSION_COOKIE = "BBAIsession"
+SESSION_MAX_AGE = 30 * 24 * 60 * 60  # Matches the 30-day "remember me" cookies
+DEFAULT_CACHE_TTL = 60.0
+DEFAULT_CACHE_SIZE = 1024
+GENERATION_FIELD = "session_generation"
+
+
+def persistent_secret(path: str = SECRET_PATH) -> str:
+    """
+    The signing secret kept at `path`, created (owner-only, 0600) on first use. Tokens have to
+    survive restarts and redeploys, so the key is never regenerated once it exists.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    secret = secrets.token_hex(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process created it first; use theirs
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secret)
+    return secret
+
+
+class SessionManager:
+    """Issues and verifies session tokens; user records are cached per ID for a short TTL."""
+
+    def __init__(self, store: CredentialStore, cache_ttl: Optional[float] = None,
+                 cache_size: Optional[int] = None, max_age: int = SESSION_MAX_AGE):
+        self.store = store
+        self.cache_ttl = cache_ttl or float(os.getenv("BBAI_USER_CACHE_TTL", DEFAULT_CACHE_TTL))
+        self.cache_size = cache_size or int(os.getenv("BBAI_USER_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        self.max_age = max_age
+        self._serializer: Optional[URLSafeTimedSerializer] = None
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.revoked = 0
+
+    def init_app(self, app) -> None:
+        """
+        Sign tokens with BBAI_SESSION_SECRET, or the app's secret key (FLASK_SECRET_KEY or the
+        persisted secret), so every worker and every restart accepts the same cookies.
+        """
+        secret = os.getenv("BBAI_SESSION_SECRET") or app.secret_key
+        self._serializer = URLSafeTimedSerializer(secret, salt="bbai-session")
+
+    # ----------------------------- Tokens ------------------------------------
+    def issue(self, user: Dict[str, Any]) -> str:
+        return self._serializer.dumps({"uid": user["id"], "gen": user.get(GENERATION_FIELD, 0)})
+
+    def claims(self, token: Optional[str]) -> Optional[Tuple[str, int]]:
+        """The user ID and session generation inside a valid, unexpired token, else None."""
+        if not token or self._serializer is None:
+            return None
+        try:
+            payload = self._serializer.loads(token, max_age=self.max_age)
+            uid, generation = payload["uid"], payload.get("gen", 0)
+        except (BadSignature, KeyError, TypeError, AttributeError):
+            self.rejected += 1
+            return None
+        return uid, generation
+
+    def resolve(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        The credentials record for a session token, or None if it is invalid, revoked or the user
+        is gone. Other workers notice a revocation once their cached record expires (cache_ttl).
+        """
+        claims = self.claims(token)
+        if claims is None:
+            return None
+        uid, generation = claims
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(uid)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(uid)
+                self.hits += 1
+                user = entry[1]
+            else:
+                user = None
+        if user is None:
+            self.misses += 1
+            user = self.store.by_id(uid)
+            if user is None:
+                return None
+            with self._lock:
+                self._cache[uid] = (now + self.cache_ttl, user)
+                self._cache.move_to_end(uid)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if user.get(GENERATION_FIELD, 0) != generation:
+            self.revoked += 1
+            return None
+        return dict(user)
+
+    def revoke(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Invalidate every token issued to `user` so far; returns the updated record."""
+        current = self.store.by_id(user["id"]) or user
+        generation = current.get(GENERATION_FIELD, 0) + 1
+        if not self.store.update(user["email"], **{GENERATION_FIELD: generation}):
+            return None
+        self.invalidate(user["id"])
+        return self.store.by_id(user["id"])
+
+    # ----------------------------- Cache -------------------------------------
+    def invalidate(self, uid: Optional[str] = None) -> None:
+        """Drop one cached user (after their record changes), or all of them."""
+        with self._lock:
+            if uid is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(uid, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached_users": len(self._cache), "cache_ttl": self.cache_ttl, "hits": self.hits,
+                    "misses": self.misses, "rejected_tokens": self.rejected, "revoked_tokens": self.revoked}
@@ -0,0 +1,39 @@
+"""
+Startup timing for the Flask app.
+
+``STARTUP`` collects how long each import group and initialisation step takes, so the
+cold-start cost of a worker can be read straight from the boot output.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+
+class StartupReport:
+    """Ordered list of (phase, milliseconds) measured since the process started importing the app."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def lines(self) -> List[str]:
+        width = max((len(name) for name, _ in self.phases), default=0)
+        return [f"  {name.ljust(width)}  {ms:8.1f} ms" for name, ms in self.phases]
+
+    def as_dict(self) -> dict:
+        return {"phases_ms": {name: round(ms, 3) for name, ms in self.phases},
+                "total_ms": round(self.total_ms(), 3)}
+
+
+STARTUP = StartupReport()
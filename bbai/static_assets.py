@@ -0,0 +1,287 @@
+"""
+Fingerprinted, precompressed delivery of the front-end assets and the Teachable Machine model.
+
+Every file under ``assets/`` and ``assets2/`` plus the model files is hashed once, and gzip
+(and brotli, when the ``brotli`` package is installed) variants of the compressible ones are
+written to a cache directory at startup. A manifest keyed by mtime and size means later startups
+only redo files that changed. Responses carry strong ETags and answer ``If-None-Match`` with
+304. URLs that include the current content hash (``?v=<hash>``, added by ``url_for``) are
+served as ``immutable`` for a year.
+
+Run ``python -m bbai.static_assets`` to build the cache ahead of time and print the report.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Response, send_file
+
+from bbai.menu import BASE_DIR
+from bbai.model_variants import PRECISIONS, VARIANTS_DIR, asset_key
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip alone still covers every browser
+    brotli = None
+
+CACHE_DIR = os.getenv("BBAI_STATIC_CACHE_DIR", os.path.join(BASE_DIR, ".bbai-cache", "static"))
+COMPRESSIBLE = {".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".html", ".xml", ".csv",
+                ".ttf", ".eot", ".otf", ".ico", ".bin", ".less", ".scss"}
+MIN_COMPRESS_SIZE = 1024
+MIN_SAVING = 0.05  # Keep a variant only if it is at least 5% smaller
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # In order of preference
+
+Transform = Callable[[bytes], bytes]
+
+
+class Asset:
+    """One servable file: where its bytes live, its content hash and its precompressed variants."""
+    __slots__ = ("key", "source", "transform", "path", "digest", "size", "mimetype", "variants")
+
+    def __init__(self, key: str, source: str, transform: Optional[Transform] = None):
+        self.key = key
+        self.source = source
+        self.transform = transform
+        self.path = source  # Replaced by a cache file when the served bytes differ from the source
+        self.digest = ""
+        self.size = 0
+        self.mimetype = mimetypes.guess_type(source)[0] or "application/octet-stream"
+        self.variants: Dict[str, Tuple[str, int]] = {}  # encoding -> (path, size)
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # Strong ETags must differ between representations of the same resource (unquoted here)
+        return f"{self.digest}-{encoding}" if encoding else self.digest
+
+
+class AssetRegistry:
+    """All fingerprinted assets, keyed by '<prefix>/<relative path>'."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.assets: Dict[str, Asset] = {}
+        self._order: List[Asset] = []
+        self._lock = threading.Lock()
+        self.built = False
+        self.rebuilt = 0
+
+    # ----------------------------- Registration ------------------------------
+    def add_file(self, key: str, path: str, transform: Optional[Transform] = None) -> None:
+        asset = Asset(key, path, transform)
+        self.assets[key] = asset
+        self._order.append(asset)
+
+    def add_directory(self, prefix: str, directory: str) -> None:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue  # .DS_Store and friends
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, directory).replace(os.sep, "/")
+                self.add_file(f"{prefix}/{rel}", path)
+
+    def version(self, key: str) -> Optional[str]:
+        asset = self.assets.get(key)
+        return asset.digest if asset is not None and asset.digest else None
+
+    # ----------------------------- Build -------------------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, "manifest.json")
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        try:
+            with open(self._manifest_path(), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _cache_file(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], digest + suffix)
+
+    def _write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # Atomic, so concurrent workers never serve half a file
+
+    def _reuse(self, asset: Asset, entry: Optional[dict], stat: os.stat_result) -> bool:
+        """Fill `asset` from its manifest entry if the source is unchanged and the cache files exist."""
+        if asset.transform is not None or not entry:
+            return False
+        if entry.get("mtime_ns") != stat.st_mtime_ns or entry.get("source_size") != stat.st_size:
+            return False
+        variants = {}
+        for encoding, size in entry.get("variants", {}).items():
+            path = self._cache_file(entry["digest"], dict(ENCODINGS)[encoding])
+            if not os.path.exists(path):
+                return False
+            variants[encoding] = (path, size)
+        if brotli is not None and entry.get("compressible") and "br" not in variants and not entry.get("br_checked"):
+            return False  # brotli was installed since the last build
+        asset.digest, asset.size, asset.variants = entry["digest"], entry["size"], variants
+        return True
+
+    def _build_asset(self, asset: Asset, stat: os.stat_result) -> dict:
+        with open(asset.source, "rb") as f:
+            data = f.read()
+        if asset.transform is not None:
+            data = asset.transform(data)
+        asset.digest = hashlib.sha256(data).hexdigest()[:16]
+        asset.size = len(data)
+        if asset.transform is not None:
+            asset.path = self._cache_file(asset.digest, os.path.splitext(asset.source)[1])
+            if not os.path.exists(asset.path):
+                self._write(asset.path, data)
+
+        compressible = os.path.splitext(asset.source)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE
+        asset.variants = {}
+        if compressible:
+            encoders = {"gzip": lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                encoders["br"] = lambda raw: brotli.compress(raw, quality=int(os.getenv("BBAI_BROTLI_QUALITY", 9)))
+            for encoding, suffix in ENCODINGS:
+                if encoding not in encoders:
+                    continue
+                path = self._cache_file(asset.digest, suffix)
+                if os.path.exists(path):
+                    size = os.path.getsize(path)
+                else:
+                    encoded = encoders[encoding](data)
+                    size = len(encoded)
+                    if size <= len(data) * (1 - MIN_SAVING):
+                        self._write(path, encoded)
+                if size <= len(data) * (1 - MIN_SAVING):
+                    asset.variants[encoding] = (path, size)
+        self.rebuilt += 1
+        return {"mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size, "digest": asset.digest,
+                "size": asset.size, "compressible": compressible, "br_checked": brotli is not None,
+                "variants": {encoding: size for encoding, (_, size) in asset.variants.items()}}
+
+    def build(self) -> None:
+        """Hash every asset and make sure its compressed variants exist, reusing the previous build."""
+        with self._lock:
+            manifest = self._load_manifest()
+            updated: Dict[str, dict] = {}
+            for asset in self._order:
+                try:
+                    stat = os.stat(asset.source)
+                except FileNotFoundError:
+                    self.assets.pop(asset.key, None)
+                    continue
+                entry = manifest.get(asset.key)
+                if self._reuse(asset, entry, stat):
+                    updated[asset.key] = entry
+                else:
+                    updated[asset.key] = self._build_asset(asset, stat)
+            self._order = [asset for asset in self._order if asset.key in self.assets]
+            if updated != manifest:
+                self._write(self._manifest_path(), json.dumps(updated, indent=1).encode("utf-8"))
+            self.built = True
+
+    # ----------------------------- Serving -----------------------------------
+    def respond(self, key: str, request) -> Optional[Response]:
+        """
+        Response for `key`, honouring Accept-Encoding and If-None-Match, or None if the asset
+        isn't registered (the caller then falls back to send_from_directory).
+        """
+        asset = self.assets.get(key)
+        if asset is None or not asset.digest:
+            return None
+        encoding = next((name for name, _ in ENCODINGS
+                         if name in asset.variants and request.accept_encodings[name]), None)
+        path = asset.variants[encoding][0] if encoding else asset.path
+        etag = asset.etag(encoding)
+        cache_control = IMMUTABLE if request.args.get("v") == asset.digest else REVALIDATE
+
+        if request.if_none_match.contains(etag) or request.if_none_match.contains(asset.digest):
+            response = Response(status=304)
+        else:
+            response = send_file(path, mimetype=asset.mimetype, conditional=False, etag=False,
+                                 max_age=None)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        return response
+
+    # ----------------------------- Report ------------------------------------
+    def report(self) -> List[dict]:
+        """Per-asset sizes, sorted by the bytes the best variant saves."""
+        rows = []
+        for asset in self._order:
+            best = min((size for _, size in asset.variants.values()), default=asset.size)
+            rows.append({"asset": asset.key, "bytes": asset.size,
+                         "gzip": asset.variants.get("gzip", (None, None))[1],
+                         "br": asset.variants.get("br", (None, None))[1],
+                         "saved": asset.size - best})
+        return sorted(rows, key=lambda row: row["saved"], reverse=True)
+
+    def summary(self) -> str:
+        rows = self.report()
+        total = sum(row["bytes"] for row in rows)
+        saved = sum(row["saved"] for row in rows)
+        compressed = sum(1 for row in rows if row["saved"])
+        return (f"{len(rows)} assets, {compressed} precompressed, {saved / 1e6:.1f} of "
+                f"{total / 1e6:.1f} MB saved per full download ({self.rebuilt} rebuilt)")
+
+
+def _pin_weights(registry: AssetRegistry, weights_key: str) -> Transform:
+    """model.json transform: point the weights manifest at the fingerprinted weights URL."""
+    def transform(data: bytes) -> bytes:
+        model = json.loads(data)
+        version = registry.version(weights_key)
+        for group in model.get("weightsManifest", []):
+            paths = []
+            for path in group["paths"]:
+                base = path.split("&v=")[0].split("?v=")[0]
+                paths.append(f"{base}{'&' if '?' in base else '?'}v={version}" if version else base)
+            group["paths"] = paths
+        return json.dumps(model, separators=(",", ":")).encode("utf-8")
+    return transform
+
+
+def default_registry() -> AssetRegistry:
+    """The app's assets: both asset folders and the Teachable Machine model and its variants (weights first)."""
+    registry = AssetRegistry()
+    model_dir = os.path.join(BASE_DIR, "static", "tm-ByteBite-model")
+    registry.add_file("model/weights.bin", os.path.join(model_dir, "weights.bin"))
+    registry.add_file("model/metadata.json", os.path.join(model_dir, "metadata.json"))
+    registry.add_file("model/model.json", os.path.join(model_dir, "model.json"),
+                      _pin_weights(registry, "model/weights.bin"))
+    # float16/int8 builds (bbai.model_variants); dropped at build time if they don't exist yet
+    for precision in PRECISIONS[1:]:
+        variant_dir = os.path.join(VARIANTS_DIR, precision)
+        registry.add_file(asset_key(precision, "weights.bin"), os.path.join(variant_dir, "weights.bin"))
+        registry.add_file(asset_key(precision, "model.json"), os.path.join(variant_dir, "model.json"),
+                          _pin_weights(registry, asset_key(precision, "weights.bin")))
+    registry.add_directory("assets", os.path.join(BASE_DIR, "assets"))
+    registry.add_directory("assets2", os.path.join(BASE_DIR, "assets2"))
+    return registry
+
+
+def main() -> None:
+    show_all = "--all" in sys.argv[1:]
+    registry = default_registry()
+    registry.build()
+    rows = registry.report()
+    print(f"{'asset':60} {'bytes':>10} {'gzip':>10} {'br':>10} {'saved':>10}")
+    for row in rows if show_all else [row for row in rows if row["saved"]]:
+        print(f"{row['asset'][:60]:60} {row['bytes']:>10} {row['gzip'] or '-':>10} "
+              f"{row['br'] or '-':>10} {row['saved']:>10}")
+    print(registry.summary())
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were built (pip install brotli).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Campus-wide "what's popular right now": order counts per dish and per restaurant over the
+last hour, day and week.
+
+Each window is a ring of time buckets: 60 one-minute buckets for the hour, 24 hourly for the
+day, 28 six-hour buckets for the week. Adding an order touches one bucket and a running
+window total, so it is O(1). A bucket that falls out of the window is subtracted from the
+total the next time its slot comes round or the window is read. Top-k is then ``heapq``
+over the window total instead of a scan of every order.
+
+Exact counts keep one entry per distinct key per bucket. With ``BBAI_TRENDING_SKETCH=1``
+each bucket is a count-min sketch instead (``BBAI_TRENDING_SKETCH_WIDTH`` x
+``BBAI_TRENDING_SKETCH_DEPTH`` counters, default 2048 x 4), which bounds memory however
+many dishes appear. Top-k then ranks a bounded candidate set of recently seen keys
+(``BBAI_TRENDING_CANDIDATES``, default 1024) by their estimates. Estimates may overcount,
+never undercount.
+
+The counters mirror orders.json, which every worker writes to, so each worker answers with
+the same campus-wide counts. They are built from the last week of the order store
+(bbai.order_store), versioned by orders.json's mtime + size like the other JSON caches. A
+worker's own ``/update_orders`` adds its order in O(1). An order written by another worker
+changes the version, and the next read re-seeds from the store in one vectorised pass.
+Orders are placed at their recorded "Time". Older orders without one count at noon of their
+day, or at midnight for today's orders before noon has come.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from bbai.intake import Version, file_version
+from bbai.menu import load_menu
+from bbai.order_store import EPOCH, MISSING_SECOND, OrderStore
+
+WINDOWS: Dict[str, Tuple[int, int]] = {  # name -> (span in seconds, buckets)
+    "hour": (3600, 60),
+    "day": (86400, 24),
+    "week": (7 * 86400, 28),
+}
+KINDS = ("dish", "restaurant")
+DEFAULT_SKETCH_WIDTH = 2048
+DEFAULT_SKETCH_DEPTH = 4
+DEFAULT_CANDIDATES = 1024
+UNTIMED_SECOND = 12 * 3600  # Where orders without a "Time" are placed in their day
+
+
+def menu_names(restaurant: str, dish: str) -> Tuple[str, str]:
+    """Count an order under its menu.csv restaurant label and dish name when it matches one."""
+    item = load_menu().order_item(restaurant, dish)
+    return (item.restaurant, item.name) if item is not None else (restaurant.strip(), dish.strip())
+
+
+class RingCounter:
+    """Exact counts per key over a sliding window of time buckets."""
+
+    def __init__(self, span: int, buckets: int):
+        self.width = span / buckets
+        self.buckets = buckets
+        self._slots: List[Optional[Tuple[int, Counter]]] = [None] * buckets  # (bucket index, counts)
+        self.totals: Counter = Counter()
+
+    def _expire(self, position: int) -> None:
+        index, counts = self._slots[position]
+        self.totals.subtract(counts)
+        for key in counts:
+            if self.totals[key] <= 0:
+                del self.totals[key]
+        self._slots[position] = None
+
+    def add(self, key: Hashable, timestamp: float, amount: int = 1) -> None:
+        index = int(timestamp // self.width)
+        position = index % self.buckets
+        slot = self._slots[position]
+        if slot is not None and slot[0] != index:
+            if slot[0] > index:
+                return  # Older than the window this slot already covers
+            self._expire(position)
+            slot = None
+        if slot is None:
+            slot = self._slots[position] = (index, Counter())
+        slot[1][key] += amount
+        self.totals[key] += amount
+
+    def advance(self, now: float) -> None:
+        oldest = int(now // self.width) - self.buckets
+        for position, slot in enumerate(self._slots):
+            if slot is not None and slot[0] <= oldest:
+                self._expire(position)
+
+    def top(self, k: int, now: float) -> List[Tuple[Hashable, int]]:
+        self.advance(now)
+        return heapq.nlargest(k, self.totals.items(), key=lambda item: item[1])
+
+    def size(self) -> int:
+        return len(self.totals) + sum(len(slot[1]) for slot in self._slots if slot is not None)
+
+
+class SketchRing:
+    """The same sliding window over count-min sketches: fixed memory, approximate (over-)counts."""
+
+    def __init__(self, span: int, buckets: int, width: int, depth: int, candidates: int):
+        self.width = span / buckets
+        self.buckets = buckets
+        self.sketch_width = width
+        self.depth = depth
+        self.candidates = candidates
+        self._slots: List[Optional[int]] = [None] * buckets  # Bucket index held by each slot
+        self._counts = np.zeros((buckets, depth, width), dtype=np.int32)
+        self.window = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+        self._seen: Dict[Hashable, int] = {}  # Candidate key -> last bucket index it was added in
+
+    def _columns(self, key: Hashable):
+        return np.array([hash((row, key)) % self.sketch_width for row in range(self.depth)])
+
+    def _expire(self, position: int) -> None:
+        self.window -= self._counts[position]
+        self._counts[position] = 0
+        self._slots[position] = None
+
+    def add(self, key: Hashable, timestamp: float, amount: int = 1) -> None:
+        index = int(timestamp // self.width)
+        position = index % self.buckets
+        held = self._slots[position]
+        if held is not None and held != index:
+            if held > index:
+                return
+            self._expire(position)
+        self._slots[position] = index
+        columns = self._columns(key)
+        self._counts[position, self._rows, columns] += amount
+        self.window[self._rows, columns] += amount
+        self._seen[key] = max(index, self._seen.get(key, index))
+        if len(self._seen) > 2 * self.candidates:
+            self._trim()
+
+    def estimate(self, key: Hashable) -> int:
+        return int(self.window[self._rows, self._columns(key)].min())
+
+    def _trim(self) -> None:
+        """Keep the `candidates` keys with the highest estimates."""
+        keep = heapq.nlargest(self.candidates, self._seen, key=self.estimate)
+        self._seen = {key: self._seen[key] for key in keep}
+
+    def advance(self, now: float) -> None:
+        oldest = int(now // self.width) - self.buckets
+        for position, index in enumerate(self._slots):
+            if index is not None and index <= oldest:
+                self._expire(position)
+        self._seen = {key: index for key, index in self._seen.items() if index > oldest}
+
+    def top(self, k: int, now: float) -> List[Tuple[Hashable, int]]:
+        self.advance(now)
+        estimates = ((key, self.estimate(key)) for key in self._seen)
+        return [(key, count) for key, count in heapq.nlargest(k, estimates, key=lambda item: item[1]) if count > 0]
+
+    def size(self) -> int:
+        return len(self._seen)
+
+
+class TrendingCounters:
+    """Per-dish and per-restaurant counters for every window, kept in step with orders.json."""
+
+    def __init__(self, orders: OrderStore, sketch: Optional[bool] = None):
+        env = os.getenv
+        self.orders = orders
+        self.sketch = sketch if sketch is not None else env("BBAI_TRENDING_SKETCH", "0") == "1"
+        self.width = int(env("BBAI_TRENDING_SKETCH_WIDTH", DEFAULT_SKETCH_WIDTH))
+        self.depth = int(env("BBAI_TRENDING_SKETCH_DEPTH", DEFAULT_SKETCH_DEPTH))
+        self.candidates = int(env("BBAI_TRENDING_CANDIDATES", DEFAULT_CANDIDATES))
+        self._counters: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self._version: Version = None
+        self._current = False
+        self.reseeds = 0
+        self.recorded = 0
+        self.seeded = 0
+
+    def _add(self, restaurant: str, dish: str, timestamp: float, amount: int = 1) -> None:
+        for window in WINDOWS:
+            self._counters["dish", window].add((restaurant, dish), timestamp, amount)
+            self._counters["restaurant", window].add(restaurant, timestamp, amount)
+
+    def _refresh(self) -> None:
+        """Re-seed from the last week of the order store if orders.json changed since (lock held)."""
+        if self._current and file_version(self.orders.orders_path) == self._version:
+            return
+        now = time.time()
+        start = datetime.fromtimestamp(now - WINDOWS["week"][0]).date()
+        version, columns, values = self.orders.since(start)
+        self._counters = {(kind, window): (SketchRing(span, buckets, self.width, self.depth, self.candidates)
+                                           if self.sketch else RingCounter(span, buckets))
+                          for kind in KINDS for window, (span, buckets) in WINDOWS.items()}
+        self.seeded = 0
+        if len(columns["day"]):
+            days, day_index = np.unique(columns["day"], return_inverse=True)
+            midnights = np.array([datetime.combine(EPOCH + timedelta(days=int(day)), datetime.min.time()).timestamp()
+                                  for day in days])[day_index]
+            untimed = np.where(midnights + UNTIMED_SECOND <= now, UNTIMED_SECOND, 0)
+            seconds = np.where(columns["second"] != MISSING_SECOND, columns["second"], untimed)
+            minutes = ((midnights + seconds) // 60).astype(np.int64)
+            keys = np.stack([columns["restaurant"].astype(np.int64), columns["dish"].astype(np.int64), minutes])
+            combos, counts = np.unique(keys[:, minutes * 60 <= now], axis=1, return_counts=True)
+            names: Dict[Tuple[int, int], Tuple[str, str]] = {}
+            for (restaurant, dish, minute), count in zip(combos.T.tolist(), counts.tolist()):
+                if (restaurant, dish) not in names:
+                    names[restaurant, dish] = menu_names(values["restaurant"][restaurant], values["dish"][dish])
+                self._add(*names[restaurant, dish], minute * 60, count)
+                self.seeded += count
+        self._version, self._current = version, True
+        self.reseeds += 1
+
+    def load(self) -> None:
+        with self._lock:
+            self._refresh()
+
+    def record(self, restaurant: str, dish: str, previous_version: Version, version: Version,
+               timestamp: Optional[float] = None) -> None:
+        """
+        Count one order that was just appended to orders.json, at `timestamp` (now by default).
+        `previous_version` and `version` are file_version() from just before and just after that
+        write, taken under the caller's write lock. If the counters were current before it, this
+        order is all that changed; otherwise the next read re-seeds them.
+        """
+        restaurant, dish = menu_names(restaurant, dish)
+        with self._lock:
+            if not self._current or previous_version is None or previous_version != self._version:
+                return
+            self._add(restaurant, dish, time.time() if timestamp is None else timestamp)
+            self._version = version
+            self.recorded += 1
+
+    def top(self, kind: str, window: str, k: int = 10) -> List[Dict[str, Any]]:
+        """The k most ordered dishes or restaurants in the window, most popular first."""
+        with self._lock:
+            self._refresh()
+            rows = self._counters[kind, window].top(k, time.time())
+        if kind == "dish":
+            return [{"dish": dish, "restaurant": restaurant, "count": count} for (restaurant, dish), count in rows]
+        return [{"restaurant": restaurant, "count": count} for restaurant, count in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": "count-min sketch" if self.sketch else "exact", "recorded": self.recorded,
+                    "seeded": self.seeded, "reseeds": self.reseeds,
+                    "keys": {f"{kind}/{window}": counter.size() for (kind, window), counter in self._counters.items()}}
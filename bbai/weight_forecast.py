@@ -0,0 +1,245 @@
+"""
+Weight-trend forecasts for every user in weight.json: the current trend and the day the
+Target Weight will be reached at that rate.
+
+All series are fitted in one vectorised pass. They are padded into a users x points matrix
+with a mask, so the cost is a handful of NumPy reductions no matter how many users there
+are. The fit is a recency-weighted robust line:
+
+* points are weighted by ``2 ** (-age / half_life)`` (``BBAI_WEIGHT_HALF_LIFE_DAYS``,
+  default 30), so the trend follows recent behaviour, like exponential smoothing;
+* a few rounds of Huber reweighting (the scale is each user's MAD of residuals) stop a single
+  mistyped weigh-in from bending the line.
+
+Each user's fit is kept as its weighted sums (Σw, Σwx, Σwy, Σwx², Σwxy), with x measured in
+days from their latest weigh-in. When ``/update-weight-json`` appends a point, ``record()``
+shifts and decays those sums to the new date and adds the point, Huber-weighted against the
+current line. That is O(1), with no refit. Any other change to weight.json (renames, manual
+edits, another worker) is caught by its mtime + size version and triggers a batch refit.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bbai.intake import Version, file_version
+from bbai.metrics import read_json
+
+DATE_FORMAT = "%d-%m-%Y"  # "5-12-2024", as the profile page sends it
+DEFAULT_HALF_LIFE_DAYS = 30.0
+HUBER_K = 1.345
+MIN_SCALE = 0.25  # kg; floor for the residual scale so near-perfect series don't reject every new point
+ROBUST_ITERATIONS = 4
+REACHED_TOLERANCE = 0.5  # kg
+MAX_HORIZON_DAYS = 3 * 365  # Further out than this counts as no progress
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _day(value: Any) -> Optional[int]:
+    try:
+        return datetime.strptime(str(value).strip(), DATE_FORMAT).toordinal()
+    except ValueError:
+        return None
+
+
+def parse_series(user: Dict[str, Any]) -> Tuple[List[int], List[float]]:
+    """(day ordinals, weights) of one weight.json entry, skipping unparseable points."""
+    days, weights = [], []
+    for raw_date, raw_weight in zip(user.get("Date", []), user.get("Weight", [])):
+        day, weight = _day(raw_date), _float(raw_weight)
+        if day is not None and weight is not None:
+            days.append(day)
+            weights.append(weight)
+    return days, weights
+
+
+class TrendState:
+    """A user's fit as weighted sums around their latest weigh-in (x = 0)."""
+
+    __slots__ = ("last_day", "sums", "scale", "points", "target")
+
+    def __init__(self, last_day: int, sums: List[float], scale: float, points: int, target: Optional[float]):
+        self.last_day = last_day
+        self.sums = sums  # [Σw, Σwx, Σwy, Σwx², Σwxy]
+        self.scale = scale
+        self.points = points
+        self.target = target
+
+    def line(self) -> Optional[Tuple[float, float]]:
+        """(weight at the latest weigh-in, slope per day), or None if the points don't define a line."""
+        sw, sx, sy, sxx, sxy = self.sums
+        if sw <= 0:
+            return None
+        det = sw * sxx - sx * sx
+        if self.points < 2 or det <= 1e-9 * max(sw * sxx, 1e-12):
+            return None
+        slope = (sw * sxy - sx * sy) / det
+        return (sy - slope * sx) / sw, slope
+
+    def add(self, day: int, weight: float, half_life: float) -> None:
+        """Fold one new weigh-in into the sums."""
+        sw, sx, sy, sxx, sxy = self.sums
+        line = self.line()
+        if day > self.last_day:
+            shift = day - self.last_day  # Re-centre on the new latest day, then age everything
+            sx, sxx, sxy = sx - shift * sw, sxx - 2 * shift * sx + shift * shift * sw, sxy - shift * sy
+            decay = 2.0 ** (-shift / half_life)
+            sw, sx, sy, sxx, sxy = (value * decay for value in (sw, sx, sy, sxx, sxy))
+            if line is not None:
+                line = (line[0] + line[1] * shift, line[1])
+            self.last_day = day
+        x = day - self.last_day
+        weight_factor = 2.0 ** (x / half_life)
+        if line is not None:
+            residual = abs(weight - (line[0] + line[1] * x))
+            limit = HUBER_K * self.scale
+            weight_factor *= 1.0 if residual <= limit else limit / residual
+        self.sums = [sw + weight_factor, sx + weight_factor * x, sy + weight_factor * weight,
+                     sxx + weight_factor * x * x, sxy + weight_factor * x * weight]
+        self.points += 1
+
+
+def fit_batch(series: List[Tuple[List[int], List[float]]], half_life: float) -> List[Tuple[List[float], float]]:
+    """Robust, recency-weighted line fits for many non-empty series at once: per series (sums, residual scale)."""
+    count = len(series)
+    if count == 0:
+        return []
+    length = max(len(days) for days, _ in series)
+    x = np.zeros((count, length))
+    y = np.zeros((count, length))
+    mask = np.zeros((count, length), dtype=bool)
+    for row, (days, weights) in enumerate(series):
+        x[row, :len(days)] = np.asarray(days, dtype=np.float64) - max(days)
+        y[row, :len(days)] = weights
+        mask[row, :len(days)] = True
+
+    base = np.where(mask, 2.0 ** (x / half_life), 0.0)
+    w = base
+    scale = np.full(count, MIN_SCALE)
+    for _ in range(ROBUST_ITERATIONS):
+        sw, sx, sy = w.sum(1), (w * x).sum(1), (w * y).sum(1)
+        sxx, sxy = (w * x * x).sum(1), (w * x * y).sum(1)
+        det = sw * sxx - sx * sx
+        ok = det > 1e-9 * np.maximum(sw * sxx, 1e-12)
+        slope = np.where(ok, (sw * sxy - sx * sy) / np.where(ok, det, 1.0), 0.0)
+        intercept = (sy - slope * sx) / np.where(sw > 0, sw, 1.0)
+        residual = np.abs(y - (intercept[:, None] + slope[:, None] * x))
+        mad = np.nanmedian(np.where(mask, residual, np.nan), axis=1)
+        scale = np.maximum(1.4826 * mad, MIN_SCALE)
+        limit = HUBER_K * scale[:, None]
+        w = base * np.where(residual <= limit, 1.0, limit / np.maximum(residual, 1e-12))
+
+    sums = np.stack([w.sum(1), (w * x).sum(1), (w * y).sum(1), (w * x * x).sum(1), (w * x * y).sum(1)], axis=1)
+    return [(sums[row].tolist(), float(scale[row])) for row in range(count)]
+
+
+def forecast(state: TrendState) -> Dict[str, Any]:
+    """Trend and projected target date for one user."""
+    result: Dict[str, Any] = {"points": state.points, "target": state.target, "current": None,
+                              "slope_per_week": None, "target_date": None, "days_to_target": None}
+    line = state.line()
+    if line is None:
+        result["status"] = "insufficient_data"
+        return result
+    current, slope = line
+    result["current"] = round(current, 2)
+    result["slope_per_week"] = round(slope * 7, 3)
+    if state.target is None:
+        result["status"] = "no_target"
+        return result
+    gap = state.target - current
+    if abs(gap) <= REACHED_TOLERANCE:
+        result["status"] = "reached"
+        return result
+    days = gap / slope if slope else float("inf")
+    if days <= 0:
+        result["status"] = "moving_away"
+    elif days > MAX_HORIZON_DAYS:
+        result["status"] = "flat"
+    else:
+        target_day = datetime.fromordinal(state.last_day) + timedelta(days=round(days))
+        result.update(status="on_track", days_to_target=round(days),
+                      target_date=f"{target_day.day}-{target_day.month}-{target_day.year}")
+    return result
+
+
+class WeightForecasts:
+    """Forecasts for every user in weight.json, refitted in batch and updated per appended point."""
+
+    def __init__(self, path: str, half_life: Optional[float] = None):
+        self.path = path
+        self.half_life = half_life or float(os.getenv("BBAI_WEIGHT_HALF_LIFE_DAYS", DEFAULT_HALF_LIFE_DAYS))
+        self._lock = threading.Lock()
+        self._states: Dict[str, TrendState] = {}
+        self._forecasts: Dict[str, Dict[str, Any]] = {}
+        self._version: Version = None
+        self.refits = 0
+        self.incremental = 0
+        self.refit_ms = 0.0
+
+    def _refresh(self) -> None:
+        """Batch-refit every user if weight.json changed since the last fit (lock held)."""
+        version = file_version(self.path)
+        if version == self._version:
+            return
+        start = time.perf_counter()
+        users = read_json(self.path, "weight") if version is not None else []
+        parsed = [(user, parse_series(user)) for user in users]
+        parsed = [(user, series) for user, series in parsed if series[0]]
+        fits = fit_batch([series for _, series in parsed], self.half_life)
+        states = {}
+        for (user, (days, _)), (sums, scale) in zip(parsed, fits):
+            states[user.get("Name")] = TrendState(max(days), sums, scale, len(days), _float(user.get("Target Weight")))
+        self._states = states
+        self._forecasts = {name: forecast(state) for name, state in states.items()}
+        self._version = version
+        self.refits += 1
+        self.refit_ms = (time.perf_counter() - start) * 1000
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            result = self._forecasts.get(name)
+            return dict(result) if result is not None else None
+
+    def record(self, name: str, weight: Any, date: Any, target: Any, previous_version: Version,
+               version: Version) -> None:
+        """
+        Apply what /update-weight-json just wrote: an appended weigh-in (`weight` None when it
+        only changed the target) and the target. `previous_version` and `version` are
+        file_version() from just before and just after the write, taken under the caller's write
+        lock; if the cache wasn't current before it, the next read refits instead.
+        """
+        with self._lock:
+            if previous_version is None or previous_version != self._version:
+                return
+            state = self._states.get(name)
+            day, value = _day(date), _float(weight)
+            if weight is not None and (day is None or value is None):
+                self._version = None  # Unparseable point: let a refit decide what the file holds
+                return
+            if state is None:
+                if weight is None:
+                    self._version = version
+                    return
+                state = self._states[name] = TrendState(day, [0.0] * 5, MIN_SCALE, 0, None)
+            if weight is not None:
+                state.add(day, value, self.half_life)
+            state.target = _float(target)
+            self._forecasts[name] = forecast(state)
+            self._version = version
+            self.incremental += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._states), "refits": self.refits, "incremental": self.incremental,
+                    "refit_ms": round(self.refit_ms, 2), "half_life_days": self.half_life}
@@ -1,25 +1,51 @@
 import os
 import sys
 import re
-import pandas as pd
 import time
-import platform
 import json
 import logging
 import subprocess
 import importlib
+import uuid
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
 from functools import wraps
 from typing import Dict, Any, List, Optional
-import chardet
 
-import bleach
-from flask import (
-    Flask, render_template, redirect, url_for, request, session,
-    send_from_directory, jsonify, make_response, abort
-)
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from bbai.startup import STARTUP
+
+with STARTUP.phase("import flask + werkzeug"):
+    from flask import (
+        Flask, render_template, redirect, url_for, request, session,
+        send_from_directory, jsonify, make_response, abort, Response, g
+    )
+    from werkzeug.utils import secure_filename
+
+with STARTUP.phase("import bbai"):
+    from bbai.ar_sessions import ARSessionStore
+    from bbai.chat_logging import setup_chat_logger
+    from bbai.content_filter import ContentFilters
+    from bbai.conversations import ConversationStore
+    from bbai.credentials import CredentialStore, new_user_id
+    from bbai.inference import FrameRejected, LogoRecognizer
+    from bbai.intake import IntakeView, file_version
+    from bbai.menu import load_menu
+    from bbai.menu_prompt import MenuPromptCache
+    from bbai.menu_query import answer_structured_query, extract_user_question
+    from bbai.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
+    from bbai.metrics import instrument_app, read_json, write_json
+    from bbai.model_variants import ModelVariants, asset_key as model_asset_key
+    from bbai.ollama import OllamaClient
+    from bbai.order_store import OrderStore
+    from bbai.passwords import HashQueueFull, PasswordHasher
+    from bbai.profiling import RequestProfiler
+    from bbai.profile_images import HASHED_NAME, ImageProcessor, ImageRejected, avatar, remove_variants
+    from bbai.render_cache import JsonFile, PageCache, ProfilePictures, country_codes_path
+    from bbai.sessions import SESSION_COOKIE, SessionManager, persistent_secret
+    from bbai.static_assets import default_registry
+    from bbai.trending import KINDS as TRENDING_KINDS, TrendingCounters, WINDOWS as TRENDING_WINDOWS
+    from bbai.weight_forecast import WeightForecasts
 
 # ============================= Colored Output for Installation ===================================
 GREEN = "\033[92m"
@@ -53,8 +79,7 @@ class LibraryInstaller:
             colored_output(f"[✖] JSON file '{file_path}' not found!", RED)
             return {}
         try:
-            with open(file_path, 'r') as file:
-                libraries = json.load(file)
+            libraries = read_json(file_path)
             colored_output(f"[✔] Loaded libraries from '{file_path}'.", GREEN)
             return libraries
         except json.JSONDecodeError:
@@ -96,44 +121,107 @@ ALLOWED_TAGS = ['b', 'i', 'u', 'strong', 'em']  # Basic text formatting
 ALLOWED_ATTRIBUTES = {}
 ALLOWED_PROTOCOLS = []
 
-# Log folder configuration
+# credentials.json indexed by email and name, reloaded only when the file changes
+CREDENTIALS = CredentialStore(CREDENTIALS_FILE)
+# Password hashing in a bounded pool (BBAI_PASSWORD_METHOD / BBAI_HASH_WORKERS / BBAI_HASH_QUEUE)
+PASSWORDS = PasswordHasher()
+# Signed session tokens resolved through a TTL cache of users (BBAI_SESSION_SECRET / BBAI_USER_CACHE_*)
+SESSIONS = SessionManager(CREDENTIALS)
+# Content-hashed, precompressed assets and model files (built at startup unless BBAI_STATIC_BUILD=0)
+STATIC_ASSETS = default_registry()
+# float16/int8 builds of the AR model; /model?precision=... serves the smallest accurate-enough one
+MODEL_VARIANTS = ModelVariants()
+# Render-context caches for the logged-in pages
+USERS = JsonFile(USER_DATA_FILE, index_key='Full Name')
+COUNTRY_CODES = JsonFile(country_codes_path(), watch=False)
+PROFILE_PICTURES = ProfilePictures(UPLOAD_FOLDER, DEFAULT_PFP)
+PAGES = PageCache()
+# Uploaded pictures are turned into content-hashed thumbnails on a background worker
+PROFILE_IMAGES = ImageProcessor(UPLOAD_FOLDER)
+IMAGE_WAIT_SECONDS = float(os.getenv("BBAI_IMAGE_WAIT_SECONDS", 10))
+# AR logo model evaluated server-side with NumPy, frames micro-batched (BBAI_AR_MAX_BATCH / BBAI_AR_BATCH_WAIT_MS)
+AR_MODEL = LogoRecognizer()
+AR_MAX_FRAMES = int(os.getenv("BBAI_AR_MAX_FRAMES", 8))
+AR_MAX_FRAME_SIZE = 2 * 1024 * 1024
+AR_TIMEOUT = float(os.getenv("BBAI_AR_TIMEOUT", 10))
+# Per-scan AR sessions: near-duplicate frames skipped by perceptual hash, EMA per label, early stop
+AR_SESSIONS = ARSessionStore(AR_MODEL)
+# orders.json as dictionary-encoded columns, memory-mapped from .bbai-cache/orders.bin (BBAI_ORDER_STORE_PATH)
+ORDER_STORE = OrderStore(ORDERS_FILE)
+# Per-user daily intake from orders.json joined to the menu, updated in place by /update_orders
+INTAKE = IntakeView(ORDERS_FILE)
+# Held around read -> write -> record of orders.json, so the caches above are stamped with the version of their own write
+ORDERS_LOCK = threading.Lock()
+# Weight-trend forecasts for all users, fitted in one vectorised pass (BBAI_WEIGHT_HALF_LIFE_DAYS)
+WEIGHT_FORECASTS = WeightForecasts(WEIGHT_JSON_PATH)
+# Held around read -> write -> record of weight.json, for the same reason as ORDERS_LOCK
+WEIGHT_LOCK = threading.Lock()
+# Orders per dish/restaurant over the last hour/day/week (BBAI_TRENDING_* environment variables)
+TRENDING = TrendingCounters(ORDER_STORE)
+TRENDING_MAX_K = 50
+# Word filters for profile text and chatbot input, compiled once per version of the word list
+CONTENT_FILTERS = ContentFilters()
+# url_for endpoint -> asset key; these URLs get ?v=<content hash> so they can be cached as immutable
+ASSET_ENDPOINTS = {
+    'serve_assets': lambda values: f"assets/{values.get('filename', '')}",
+    'serve_assets2': lambda values: f"assets2/{values.get('filename', '')}",
+    'get_model': lambda values: model_asset_key(MODEL_VARIANTS.choose(values.get('precision')), "model.json"),
+    'get_metadata': lambda values: "model/metadata.json",
+    'get_weights': lambda values: model_asset_key(values.get('precision', 'float32'), "weights.bin"),
+}
+
+# Chatbot backend (OLLAMA_HOST / BBAI_OLLAMA_MODEL / BBAI_OLLAMA_BACKEND environment variables)
+OLLAMA_CLIENT = OllamaClient()
+# Menu table prefix rendered once per menu.csv version and pinned in Ollama (BBAI_PROMPT_* environment variables)
+MENU_PROMPT = MenuPromptCache(OLLAMA_CLIENT)
+# Per-user chat history with a fixed token budget (BBAI_CHAT_* environment variables)
+CONVERSATIONS = ConversationStore()
+
+# Reply to chatbot prompts caught by the 'chatbot' content filter
+FILTERED_REPLY = "Let's keep things friendly! Ask me anything about the menu, prices or dietary options."
+
+# Log folder configuration (created by the chat logger)
 LOG_FOLDER = "chatbot-logs"
-os.makedirs(LOG_FOLDER, exist_ok=True)
 
 # ============================= Utility / Helper Functions =========================================
 def save_credentials_pretty(data: List[Dict[str, Any]]) -> None:
     """Save user credentials with pretty JSON formatting."""
     try:
-        with open(CREDENTIALS_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        CREDENTIALS.save(data)
     except Exception as e:
         print(f"Error saving to {CREDENTIALS_FILE}: {e}")
 
 def email_exists(email: str) -> bool:
     """Check if an email already exists in the credentials file."""
     try:
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                users = json.load(f)
-                return any(user['email'] == email for user in users)
+        return CREDENTIALS.email_exists(email)
     except Exception as e:
         print(f"Error reading {CREDENTIALS_FILE}: {e}")
     return False
 
-def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
-    """Authenticate a user by email and password."""
+def authenticate_user(email: str, password: str, info: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Authenticate a user by email and password.
+    The hash check runs in the PASSWORDS pool (HashQueueFull propagates when it is saturated),
+    and a hash made with outdated parameters is replaced after a successful check.
+    """
     try:
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                users = json.load(f)
-                return next(
-                    (user for user in users
-                     if user['email'] == email and check_password_hash(user['password'], password)),
-                    None
-                )
+        user = CREDENTIALS.by_email(email)
     except Exception as e:
         print(f"Error reading {CREDENTIALS_FILE}: {e}")
-    return None
+        return None
+    if user is None:
+        return None
+    ok, new_hash = PASSWORDS.verify(user['password'], password, info)
+    if not ok:
+        return None
+    if new_hash:
+        try:
+            CREDENTIALS.update(email, password=new_hash)
+            user['password'] = new_hash
+        except Exception as e:
+            print(f"Error rehashing password for {email}: {e}")
+    return user
 
 def is_valid_email(email: str) -> bool:
     """
@@ -157,6 +245,7 @@ def is_valid_email(email: str) -> bool:
 
 def sanitize_input(input_data: str) -> str:
     """Clean user input with Bleach, allowing only specified tags and no attributes/protocols."""
+    import bleach  # Imported on first use; it only matters for signup/login forms
     return bleach.clean(
         input_data,
         tags=ALLOWED_TAGS,
@@ -168,34 +257,30 @@ def sanitize_input(input_data: str) -> str:
 def load_credentials() -> List[Dict[str, Any]]:
     """Load all user credentials from the JSON file."""
     try:
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                return json.load(f)
+        return CREDENTIALS.records()
     except Exception as e:
         print(f"Error loading {CREDENTIALS_FILE}: {e}")
     return []
 
 def get_current_user() -> Optional[Dict[str, Any]]:
     """
-    Retrieve the currently logged-in user by cookie.
-    Returns the user object if found, or None otherwise.
+    Retrieve the currently logged-in user from the signed session cookie.
+    Returns the user object if found, or None otherwise. Resolved once per request.
     """
-    current_user_name = request.cookies.get('BBAIcurrentuser')
-    if not current_user_name:
-        return None
-    
-    user_data = load_credentials()
-    return next((user for user in user_data if user['name'] == current_user_name), None)
-
-def clear_logs() -> None:
-    """Clears old log files from the log folder."""
-    for file_name in os.listdir(LOG_FOLDER):
-        file_path = os.path.join(LOG_FOLDER, file_name)
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            print(f"Error deleting file {file_name}: {e}")
+    if 'current_user' not in g:
+        g.current_user = SESSIONS.resolve(request.cookies.get(SESSION_COOKIE))
+    return g.current_user
+
+def set_session_cookie(resp, user: Dict[str, Any], max_age=None) -> None:
+    """Attach a signed session token for `user` (HttpOnly; the display cookies stay readable by JS)."""
+    resp.set_cookie(
+        SESSION_COOKIE,
+        SESSIONS.issue(user),
+        max_age=max_age,
+        httponly=True,
+        samesite='Lax',
+        path='/'
+    )
 
 def authenticate(token: str) -> bool:
     """Return True if the provided token matches the authentication token, False otherwise."""
@@ -208,11 +293,57 @@ def login_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not request.cookies.get('BBAIcurrentuser'):
+        if get_current_user() is None:
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
 
+def server_busy():
+    """503 response for when a bounded worker (password hashing, AR inference) is saturated."""
+    resp = make_response(jsonify({"success": False, "message": "Server is busy, please try again in a moment."}), 503)
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+def read_ar_frames():
+    """Camera frames from multipart 'frame' fields or a raw image body: (frames, None) or (None, error response)."""
+    uploads = request.files.getlist('frame')
+    if uploads:
+        frames = [upload.read(AR_MAX_FRAME_SIZE + 1) for upload in uploads[:AR_MAX_FRAMES + 1]]
+    elif request.mimetype.startswith('image/'):
+        frames = [request.get_data()]
+    else:
+        frames = []
+    if not frames or not all(frames):
+        return None, (jsonify({"success": False, "message": "No frame provided"}), 400)
+    if len(frames) > AR_MAX_FRAMES or any(len(frame) > AR_MAX_FRAME_SIZE for frame in frames):
+        return None, (jsonify({"success": False, "message": "Too many or too large frames"}), 413)
+    return frames, None
+
+def send_asset(key: str, directory: str, filename: str):
+    """Serve a registered asset with caching/compression, falling back to the plain file."""
+    response = STATIC_ASSETS.respond(key, request)
+    if response is None:
+        return send_from_directory(directory, filename)
+    return response
+
+def profile_pic_for(user: Dict[str, Any]) -> str:
+    """The user's profile picture filename, or the default if it is missing on disk (memoized)."""
+    return PROFILE_PICTURES.resolve(user.get('id'), user.get('profile_pic', DEFAULT_PFP))
+
+def render_user_page(template: str, user: Dict[str, Any]):
+    """Render one of the pages whose only per-user context is the profile picture, with an ETag."""
+    profile_pic = f"static/img/PFPs/{profile_pic_for(user)}"
+    return PAGES.respond((template, profile_pic),
+                         lambda: render_template(template, profile_pic=profile_pic), request)
+
+def remove_unused_picture(filename: Optional[str]) -> None:
+    """Delete an old profile picture's files unless it is the default or another account uses it."""
+    if not filename or filename == DEFAULT_PFP:
+        return
+    if any(record.get('profile_pic') == filename for record in CREDENTIALS.records()):
+        return
+    remove_variants(filename, UPLOAD_FOLDER)
+
 def authenticate_and_send_file(token: str, file_path: str):
     """Authenticate and send a static file to the client, or abort with 403 if unauthorized."""
     if authenticate(token):
@@ -225,92 +356,152 @@ def authenticate_and_send_file(token: str, file_path: str):
 def setup_ollama_logger() -> logging.Logger:
     """
     Sets up a logger dedicated to Ollama interactions and returns it.
+    Records are queued and written as JSON Lines by a background thread; the file rotates
+    by size and age instead of old logs being deleted on startup.
     """
-    # Clear any old logs first
-    clear_logs()
+    # Several worker processes must not rotate the same file, so each one gets its own
+    per_process = os.getenv("BBAI_WORKER_LOGS") == "1"
+    return setup_chat_logger(LOG_FOLDER, name="ollama_logger",
+                             filename=f"ollama_query.{os.getpid()}.jsonl" if per_process else None)
 
-    # Generate a filename with the current date and time for the new log
-    log_filename = datetime.now().strftime("ollama_query_%d-%m-%Y_%H:%M.log")
-    log_path = os.path.join(LOG_FOLDER, log_filename)
-
-    # Create and configure the Ollama logger
-    ollama_logger = logging.getLogger("ollama_logger")
-    ollama_logger.setLevel(logging.INFO)
-
-    # Configure file handler only for the Ollama logger
-    file_handler = logging.FileHandler(log_path)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    ollama_logger.addHandler(file_handler)
-
-    return ollama_logger
-
-# Function to detect encoding of the CSV file
-def detect_encoding(file_path):
-    with open(file_path, 'rb') as f:
-        result = chardet.detect(f.read())
-    return result['encoding']
-
-# Function to query Ollama with the CSV and prompt
-def query_ollama_with_csv(prompt):
+# Function to query Ollama with the menu and prompt
+def query_ollama_with_csv(prompt, info=None, history=""):
+    """
+    Ask the model a question about the menu. The menu prefix is reused across requests;
+    `history` is the user's conversation so far and `info` (if given) receives prompt-eval timings.
+    """
     try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Directory of the script
-        CSV_FILE_PATH = os.path.join(BASE_DIR, "static", "menu.csv")
-
-        # Detect the encoding of the CSV file
-        encoding = detect_encoding(CSV_FILE_PATH)
-        print(f"Detected encoding: {encoding}")
-
-        # Read the CSV file using the detected encoding
-        df = pd.read_csv(CSV_FILE_PATH, encoding=encoding)
-        csv_data = df.to_string(index=False)  # Convert CSV data to a readable string
-
-        # Combine the CSV data and the user's prompt
-        combined_prompt = f"Here is the data from the CSV file:\n{csv_data}\n\n{prompt}"
-        print(f"Sending prompt to Ollama with CSV: {combined_prompt}")  # Debugging log
-
-        # Use subprocess to properly execute Ollama without shell=True
-        result = subprocess.run(
-            ["ollama", "run", "orca-mini:latest"],
-            input=combined_prompt,
-            capture_output=True,
-            text=True
-        )
-        
-        response = result.stdout.strip()
-
-        if result.stderr:
-            print(f"Error output: {result.stderr}")
-
-        print(f"Ollama response: {response}")
-
-        return response
+        return MENU_PROMPT.generate(prompt, info, history)
     except Exception as e:
-        print(f"Error querying Ollama with CSV: {str(e)}")
+        logging.getLogger("ollama_logger").error(f"Error querying Ollama with CSV: {e}")
         return f"Error querying Ollama: {str(e)}"
 
+def stream_ollama_with_csv(prompt, info=None, history=""):
+    """Same as query_ollama_with_csv, but yields the response text as Ollama generates it."""
+    try:
+        yield from MENU_PROMPT.generate_stream(prompt, info, history)
+    except Exception as e:
+        logging.getLogger("ollama_logger").error(f"Error querying Ollama with CSV: {e}")
+        yield f"Error querying Ollama: {str(e)}"
+
+# ============================= Process Initialisation ============================================
+def init_deployment() -> None:
+    """
+    Once per deployment, before any worker starts: steps that write shared files on disk.
+    Safe to repeat (each step is idempotent), but a prefork server should run it only in the parent.
+    """
+    # The runtime installer imports every library in lib.json and may shell out to pip, so it
+    # only runs when asked for (BBAI_INSTALL_LIBRARIES=1); deployments install requirements up front
+    if os.getenv("BBAI_INSTALL_LIBRARIES", "0") == "1":
+        with STARTUP.phase("library installer"):
+            json_file_path = 'static/json/lib.json'
+            libraries = LibraryInstaller.load_libraries_from_json(json_file_path)
+            if libraries:
+                LibraryInstaller.check_and_install_libraries(libraries)
+            else:
+                colored_output(f"[✖] No valid libraries found in '{json_file_path}'.", RED)
+
+    # Session cookies must outlive restarts, so the signing key is created once and kept on disk
+    if not (os.getenv("BBAI_SESSION_SECRET") or os.getenv("FLASK_SECRET_KEY")):
+        with STARTUP.phase("session secret"):
+            persistent_secret()
+
+    # Sessions refer to users by a stable ID
+    with STARTUP.phase("user ids"):
+        added = CREDENTIALS.ensure_ids()
+    if added:
+        colored_output(f"[✔] Assigned user IDs to {added} existing account(s).", GREEN)
+
+    # Quantized model variants (rebuilt only when the model changes) are served as static assets
+    with STARTUP.phase("model variants"):
+        MODEL_VARIANTS.build()
+
+    # Hash and precompress assets (cached on disk, so only changed files cost anything)
+    if os.getenv("BBAI_STATIC_BUILD", "1") == "1":
+        with STARTUP.phase("static assets"):
+            STATIC_ASSETS.build()
+        colored_output(f"[✔] Static assets: {STATIC_ASSETS.summary()}.", GREEN)
+
+def warm_shared_data() -> None:
+    """
+    Load read-only data up front. Called in the parent before forking, the parsed menu, the
+    rendered menu prompt (and pandas itself), the asset index and the reference JSON are shared
+    copy-on-write by every worker instead of being loaded once per worker on first use.
+    """
+    with STARTUP.phase("warm shared data"):
+        load_menu()
+        MENU_PROMPT.prefix()
+        COUNTRY_CODES.load()
+        USERS.load()
+        CREDENTIALS.records()
+    with STARTUP.phase("order store"):
+        ORDER_STORE.load()
+        TRENDING.load()
+    with STARTUP.phase("AR model"):
+        AR_MODEL.load()
+
+def init_worker() -> None:
+    """Per process: threads and file handles that don't survive fork()."""
+    with STARTUP.phase("chat logger"):
+        setup_ollama_logger()
+
+def report_startup() -> None:
+    """Print how long each startup phase took, so cold-start regressions are easy to spot."""
+    colored_output(f"[✔] App ready in {STARTUP.total_ms():.1f} ms (pid {os.getpid()}):", GREEN)
+    for line in STARTUP.lines():
+        print(line)
+
 # ============================= Flask App Factory ================================================
-def create_app() -> Flask:
+def create_app(init_worker_now: bool = True) -> Flask:
     """
     Create and configure the Flask application.
     This function can be imported and called from a WSGI server or directly run.
+    Pass init_worker_now=False when the app is built before forking workers (see bbai.serve).
     """
-    # Load and check/install libraries from JSON
-    json_file_path = 'static/json/lib.json'
-    libraries = LibraryInstaller.load_libraries_from_json(json_file_path)
-    if libraries:
-        LibraryInstaller.check_and_install_libraries(libraries)
-    else:
-        colored_output(f"[✖] No valid libraries found in '{json_file_path}'.", RED)
+    # Under `python -m bbai.serve` the deployment steps already ran in the parent process
+    if os.getenv("BBAI_DEPLOYMENT_READY") != "1":
+        init_deployment()
 
     # Create Flask app
     app = Flask(__name__)
-    app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))
+    app.secret_key = os.getenv('FLASK_SECRET_KEY') or persistent_secret()
     app.static_folder = 'static'
     app.template_folder = 'templates'
     app.permanent_session_lifetime = timedelta(minutes=60)
 
-    # Initialize Ollama logger once (so it's not recreated on each request)
-    ollama_logger = setup_ollama_logger()
+    # Sessions are signed with the app's secret key (the same in every worker and across restarts)
+    SESSIONS.init_app(app)
+
+    # Per-route latency histograms, in-flight count and status codes for /metrics
+    instrument_app(app)
+
+    # Opt-in request profiling (BBAI_PROFILE_RATE / BBAI_PROFILE_ON_DEMAND); no hooks at all when off
+    RequestProfiler(authenticate).init_app(app)
+
+    # Templates pick the thumbnail size per slot: avatar(profile_pic, 'sm').webp / .jpg
+    app.jinja_env.globals['avatar'] = avatar
+
+    @app.after_request
+    def cache_profile_pictures(response):
+        """Content-hashed profile pictures never change, so browsers may keep them for good."""
+        if request.path.startswith(f"/{UPLOAD_FOLDER}/") and HASHED_NAME.match(request.path.rsplit('/', 1)[-1]):
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    @app.url_defaults
+    def add_asset_version(endpoint, values):
+        """Fingerprint asset URLs built with url_for, e.g. /assets/js/main.js?v=<hash>."""
+        key_for = ASSET_ENDPOINTS.get(endpoint)
+        if key_for is not None and 'v' not in values:
+            version = STATIC_ASSETS.version(key_for(values))
+            if version:
+                values['v'] = version
+
+    # The chat logger's writer thread is per process; a preforking server starts it in each
+    # worker (post_fork) instead, so the parent never owns a thread that fork() would lose
+    ollama_logger = logging.getLogger("ollama_logger")
+    if init_worker_now:
+        init_worker()
 
     # ============================ Flask Routes ==================================
 
@@ -322,31 +513,42 @@ def create_app() -> Flask:
             current_user = get_current_user()
             
             if current_user:
-                # Extract username and file format
-                username = current_user['name'].replace(" ", "").lower()
-                extension = file.filename.rsplit('.', 1)[-1].lower()
-                
-                if extension not in {'jpg', 'jpeg', 'png', 'gif'}:  # Validate file type
-                    return jsonify({'success': False, 'message': 'Invalid file type'})
-                
-                # Define new filename and filepath
-                filename = f"{username}.{extension}"
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                
-                # Check if a previous profile picture exists and delete it
-                existing_pic = current_user.get('profile_pic', 'default.png')
-                if existing_pic != 'default.png':
-                    old_filepath = os.path.join(UPLOAD_FOLDER, existing_pic)
-                    if os.path.exists(old_filepath):
-                        os.remove(old_filepath)
-                
-                # Save new profile image
-                file.save(filepath)
-                
-                # Update user's profile picture in JSON or database
-                update_user_profile(current_user['email'], {'profile_pic': filename})
-                
-                return jsonify({'success': True, 'new_image_url': filepath})
+                data = file.read(MAX_FILE_SIZE + 1)
+                if not data:
+                    return jsonify({'success': False, 'message': 'No file provided'})
+                if len(data) > MAX_FILE_SIZE:
+                    return jsonify({'success': False, 'message': 'File is too large'})
+
+                existing_pic = current_user.get('profile_pic', DEFAULT_PFP)
+
+                def use_new_picture(stored):
+                    """Runs on the image worker once the thumbnails exist."""
+                    if stored == existing_pic:
+                        return
+                    try:
+                        update_user_profile(current_user['email'], {'profile_pic': stored})
+                    except Exception:
+                        remove_unused_picture(stored)  # Don't leave the new thumbnails orphaned
+                        raise
+                    PROFILE_PICTURES.invalidate(current_user.get('id'))
+                    try:
+                        remove_unused_picture(existing_pic)
+                    except OSError as e:
+                        print(f"Error removing old profile picture {existing_pic}: {e}")
+
+                # Decode/resize on the image worker; wait briefly so the page reload shows the new picture
+                future = PROFILE_IMAGES.submit(data, use_new_picture)
+                try:
+                    stored = future.result(timeout=IMAGE_WAIT_SECONDS)
+                except ImageRejected as e:
+                    return jsonify({'success': False, 'message': f'Invalid image file: {e}'})
+                except FutureTimeout:
+                    return jsonify({'success': True, 'pending': True,
+                                    'message': 'Your picture is being processed and will appear shortly.'})
+                except Exception:
+                    return jsonify({'success': False, 'message': 'Your picture could not be saved. Please try again.'}), 500
+
+                return jsonify({'success': True, 'new_image_url': os.path.join(UPLOAD_FOLDER, stored)})
         
         # If no file provided, return failure
         return jsonify({'success': False, 'message': 'No file provided'})
@@ -357,17 +559,13 @@ def create_app() -> Flask:
         current_user = get_current_user()
         if current_user:
             # Get current profile picture filename
-            current_pic = current_user.get('profile_pic', 'default.png')
-            
-            # Delete the existing profile picture (if it's not the default)
-            if current_pic != 'default.png':
-                current_filepath = os.path.join(UPLOAD_FOLDER, current_pic)
-                if os.path.exists(current_filepath):
-                    os.remove(current_filepath)
-            
-            # Reset profile picture to default in JSON or database
-            update_user_profile(current_user['email'], {'profile_pic': 'default.png'})
-            return jsonify({'success': True, 'new_image_url': os.path.join(UPLOAD_FOLDER, 'default.png')})
+            current_pic = current_user.get('profile_pic', DEFAULT_PFP)
+
+            # Reset profile picture to default in JSON or database, then delete the old files
+            update_user_profile(current_user['email'], {'profile_pic': DEFAULT_PFP})
+            PROFILE_PICTURES.invalidate(current_user.get('id'))
+            remove_unused_picture(current_pic)
+            return jsonify({'success': True, 'new_image_url': os.path.join(UPLOAD_FOLDER, DEFAULT_PFP)})
         
         return jsonify({'success': False, 'message': 'User not authenticated'})
 
@@ -411,28 +609,36 @@ def create_app() -> Flask:
             restaurant_name = order_data.get('restaurantName')
             price = order_data.get('price')
 
-            # Get today's date in the format "dd/mm/yyyy"
-            today_date = datetime.today().strftime('%d/%m/%Y')
+            # Get today's date in the format "dd/mm/yyyy", and the time (for the trending windows)
+            now = datetime.now()
+            today_date = now.strftime('%d/%m/%Y')
 
             # Construct the order object
             new_order = {
                 "Date": today_date,
+                "Time": now.strftime('%H:%M:%S'),
                 "Name of dish": dish_name,
                 "Restaurant": restaurant_name,
                 "Price": price,
                 "userName": current_user_name
             }
 
-            # Read the existing orders data
-            with open(orders_file, 'r') as file:
-                orders_data = json.load(file)
+            with ORDERS_LOCK:
+                # Read the existing orders data
+                previous_version = file_version(orders_file)
+                orders_data = read_json(orders_file)
 
-            # Add the new order to the orders list
-            orders_data.append(new_order)
+                # Add the new order to the orders list
+                orders_data.append(new_order)
 
-            # Save the updated orders data back to the JSON file
-            with open(orders_file, 'w') as file:
-                json.dump(orders_data, file, indent=4)
+                # Save the updated orders data back to the JSON file
+                write_json(orders_file, orders_data)
+                version = file_version(orders_file)
+
+                # Fold the order into the daily intake view without re-reading the file
+                INTAKE.record(new_order, previous_version, version)
+                ORDER_STORE.record(new_order, previous_version, version)
+                TRENDING.record(restaurant_name or '', dish_name or '', previous_version, version, now.timestamp())
 
             return jsonify({"status": "success"}), 200
         except Exception as e:
@@ -445,8 +651,7 @@ def create_app() -> Flask:
         Updates the user profile in both `user.json` and `credentials.json`.
         """
         # Update `user.json`
-        with open(USER_DATA_FILE, 'r') as f:
-            users = json.load(f)
+        users = read_json(USER_DATA_FILE)
 
         user_found = False
         for user in users:
@@ -456,12 +661,10 @@ def create_app() -> Flask:
                 break
 
         if user_found:
-            with open(USER_DATA_FILE, 'w') as f:
-                json.dump(users, f, indent=4)
+            write_json(USER_DATA_FILE, users)
 
         # Update `credentials.json`
-        with open(CREDENTIALS_FILE, 'r') as f:
-            credentials = json.load(f)
+        credentials = read_json(CREDENTIALS_FILE)
 
         credential_found = False
         for credential in credentials:
@@ -471,8 +674,8 @@ def create_app() -> Flask:
                 break
 
         if credential_found:
-            with open(CREDENTIALS_FILE, 'w') as f:
-                json.dump(credentials, f, indent=4)
+            write_json(CREDENTIALS_FILE, credentials)
+            SESSIONS.invalidate()
 
     @app.route('/update_user', methods=['POST'])
     def update_user():
@@ -486,8 +689,7 @@ def create_app() -> Flask:
 
             # Read the existing users.json file
             if os.path.exists(USER_DATA_FILE):
-                with open(USER_DATA_FILE, 'r') as file:
-                    users_data = json.load(file)
+                users_data = read_json(USER_DATA_FILE)
             else:
                 users_data = []
 
@@ -519,8 +721,7 @@ def create_app() -> Flask:
                 users_data.append(updated_data)  # Add new user if not found
 
             # Write the updated data back to users.json
-            with open(USER_DATA_FILE, 'w') as file:
-                json.dump(users_data, file, indent=4)
+            write_json(USER_DATA_FILE, users_data)
 
             return jsonify({"message": "User data updated successfully"}), 200
 
@@ -531,8 +732,7 @@ def create_app() -> Flask:
     # Function to load data from weight.json
     def load_weight_data():
         try:
-            with open(WEIGHT_JSON_PATH, "r") as file:
-                return json.load(file)
+            return read_json(WEIGHT_JSON_PATH)
         except FileNotFoundError:
             # If the file doesn't exist, return an empty list (to represent no users)
             return []
@@ -540,8 +740,7 @@ def create_app() -> Flask:
 
     # Function to save updated data to weight.json
     def save_weight_data(data):
-        with open(WEIGHT_JSON_PATH, "w") as file:
-            json.dump(data, file, indent=4)
+        write_json(WEIGHT_JSON_PATH, data)
 
     # Utility function to remove .0 from float values
     def remove_decimal(weight):
@@ -549,28 +748,8 @@ def create_app() -> Flask:
             return str(int(float(weight)))  # Convert to int and back to string to remove .0
         return weight
 
-    @app.route("/update-weight-json", methods=["POST"])
-    def update_weight_json():
-        # Parse the incoming request data
-        incoming_data = request.json
-        if not incoming_data:
-            return jsonify({"success": False, "message": "Invalid data received"}), 400
-
-        # Load existing weight.json data (which should now be a list of users)
-        weight_data = load_weight_data()
-
-        # Extract relevant fields
-        user_name = incoming_data.get("Name")
-        current_weight = incoming_data.get("Weight")[0]  # Get first element from Weight array
-        target_weight = incoming_data.get("TargetWeight")
-        current_date = incoming_data.get("Date")[0]  # Get first element from Date array
-
-        if not user_name or not current_weight or not target_weight or not current_date:
-            return jsonify({"success": False, "message": "Missing required fields"}), 400
-
-        # Remove .0 if the weight ends with .0
-        current_weight = remove_decimal(current_weight)
-
+    def update_weight_entry(weight_data, user_name, current_weight, target_weight, current_date):
+        """Append the weigh-in (if the weight changed) and set the target. Returns True if a point was added."""
         # Search for the user in the list of users
         user_data = None
         for user in weight_data:
@@ -599,8 +778,40 @@ def create_app() -> Flask:
         if user_data["Target Weight"] != target_weight:
             user_data["Target Weight"] = target_weight  # Update target weight without date
 
-        # Save the updated data back to weight.json
-        save_weight_data(weight_data)
+        return date_added
+
+    @app.route("/update-weight-json", methods=["POST"])
+    def update_weight_json():
+        # Parse the incoming request data
+        incoming_data = request.json
+        if not incoming_data:
+            return jsonify({"success": False, "message": "Invalid data received"}), 400
+
+        # Extract relevant fields
+        user_name = incoming_data.get("Name")
+        current_weight = incoming_data.get("Weight")[0]  # Get first element from Weight array
+        target_weight = incoming_data.get("TargetWeight")
+        current_date = incoming_data.get("Date")[0]  # Get first element from Date array
+
+        if not user_name or not current_weight or not target_weight or not current_date:
+            return jsonify({"success": False, "message": "Missing required fields"}), 400
+
+        # Remove .0 if the weight ends with .0
+        current_weight = remove_decimal(current_weight)
+
+        with WEIGHT_LOCK:
+            # Load existing weight.json data (which should now be a list of users)
+            previous_version = file_version(WEIGHT_JSON_PATH)
+            weight_data = load_weight_data()
+            date_added = update_weight_entry(weight_data, user_name, current_weight, target_weight, current_date)
+
+            # Save the updated data back to weight.json
+            save_weight_data(weight_data)
+            version = file_version(WEIGHT_JSON_PATH)
+
+            # Update this user's trend from the new point instead of refitting everyone
+            WEIGHT_FORECASTS.record(user_name, current_weight if date_added else None, current_date,
+                                    target_weight, previous_version, version)
 
         # Respond with success
         return jsonify({"success": True, "message": "Weight data updated successfully"}), 200
@@ -609,8 +820,7 @@ def create_app() -> Flask:
     def load_weight_data_2():
         file_path = os.path.join('static', 'json', 'weight.json')
         if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                return json.load(f)
+            return read_json(file_path)
         return []
 
     # Route to get weight data
@@ -644,19 +854,50 @@ def create_app() -> Flask:
         chart_data = {
             "target_weight": target_weight,
             "weight_data": weight_data,
-            "date_data": date_data
+            "date_data": date_data,
+            "forecast": WEIGHT_FORECASTS.get(user_name)
         }
 
         # Respond with success and the data
         return jsonify({"success": True, "data": chart_data}), 200
 
+    @app.route("/api/intake", methods=["GET"])
+    @login_required
+    def get_intake():
+        """
+        The current user's daily kilojoules (orders joined to the menu), shaped like /get-weight-data
+        so both can share a chart. ?days=N limits it to the last N days.
+        """
+        start = None
+        days = request.args.get('days', type=int)
+        if days:
+            start = datetime.today().date() - timedelta(days=days - 1)
+        chart_data = INTAKE.chart(get_current_user()['name'], start)
+        return jsonify({"success": True, "data": chart_data}), 200
+
+    @app.route("/api/trending", methods=["GET"])
+    @login_required
+    def get_trending():
+        """
+        The most ordered dishes (or restaurants, ?kind=restaurant) across campus over the last
+        ?window=hour|day|week (default day). ?k sets how many, up to TRENDING_MAX_K.
+        """
+        window = request.args.get('window', 'day')
+        kind = request.args.get('kind', 'dish')
+        k = request.args.get('k', 10, type=int)
+        if window not in TRENDING_WINDOWS or kind not in TRENDING_KINDS or not 1 <= k <= TRENDING_MAX_K:
+            return jsonify({"success": False, "message": f"Use window={'|'.join(TRENDING_WINDOWS)}, "
+                                                        f"kind={'|'.join(TRENDING_KINDS)} and k=1..{TRENDING_MAX_K}."}), 400
+        return jsonify({"success": True, "window": window, "kind": kind,
+                        "items": TRENDING.top(kind, window, k)}), 200
+
     @app.route('/assets/<path:filename>')
     def serve_assets(filename):
-        return send_from_directory('assets', filename)
+        return send_asset(f"assets/{filename}", 'assets', filename)
 
     @app.route('/assets2/<path:filename>')
     def serve_assets2(filename):
-        return send_from_directory('assets2', filename)
+        return send_asset(f"assets2/{filename}", 'assets2', filename)
 
     @app.route('/check-email', methods=['POST'])
     def check_email():
@@ -668,6 +909,7 @@ def create_app() -> Flask:
         resp = make_response('Cookies cleared')
         resp.delete_cookie('BBAIcurrentuser')
         resp.delete_cookie('BBAIemail')
+        resp.delete_cookie(SESSION_COOKIE)
         print('Cookies cleared')
         return resp
 
@@ -677,20 +919,108 @@ def create_app() -> Flask:
         resp = make_response(redirect(url_for('index')))
         resp.set_cookie('BBAIemail', '', expires=0)
         resp.set_cookie('BBAIcurrentuser', '', expires=0)
+        resp.delete_cookie(SESSION_COOKIE)
         return resp
 
     # Teachable Machine model files
     @app.route('/model')
     def get_model():
-        return send_from_directory('static', 'tm-ByteBite-model/model.json')
+        # ?precision=int8,float16 lists what the client can decode; it gets the smallest offered one
+        precision = MODEL_VARIANTS.choose(request.args.get('precision'))
+        return send_asset(model_asset_key(precision, "model.json"), MODEL_VARIANTS.directory(precision), 'model.json')
 
     @app.route('/metadata')
     def get_metadata():
-        return send_from_directory('static', 'tm-ByteBite-model/metadata.json')
+        return send_asset("model/metadata.json", 'static', 'tm-ByteBite-model/metadata.json')
 
     @app.route('/weights.bin')
     def get_weights():
-        return send_from_directory('static', 'tm-ByteBite-model/weights.bin')
+        # Exactly the variant named by model.json's weights path, whether or not it is offered now
+        precision = request.args.get('precision', 'float32')
+        if precision not in MODEL_VARIANTS.directories():
+            abort(404)
+        return send_asset(model_asset_key(precision, "weights.bin"), MODEL_VARIANTS.directory(precision), 'weights.bin')
+
+    @app.route('/api/ar/predict', methods=['POST'])
+    @login_required
+    def ar_predict():
+        """
+        Classify camera frames server-side for devices too slow to run the model in the browser.
+        Send one or more images as multipart 'frame' fields, or a single image as the raw body.
+        """
+        frames, error = read_ar_frames()
+        if error is not None:
+            return error
+
+        start = time.perf_counter()
+        try:
+            predictions = AR_MODEL.predict(frames, timeout=AR_TIMEOUT)
+        except FutureTimeout:
+            return server_busy()
+        except FrameRejected as e:  # Pillow couldn't (or wouldn't) decode the frame
+            return jsonify({"success": False, "message": str(e)}), 400
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        resp = jsonify({"success": True, "labels": AR_MODEL.labels, "predictions": predictions[0],
+                        "frames": predictions})
+        resp.headers['Server-Timing'] = f"inference;dur={elapsed_ms:.3f}"
+        return resp
+
+    @app.route('/api/ar/session', methods=['POST'])
+    @login_required
+    def ar_session_open():
+        """Start a scan; frames posted to the session are deduplicated, averaged and stop once stable."""
+        session_id = AR_SESSIONS.open(get_current_user()['id'])
+        return jsonify({"success": True, "session": session_id, "labels": AR_MODEL.labels,
+                        "frame_url": url_for('ar_session_frame', session_id=session_id)})
+
+    @app.route('/api/ar/session/<session_id>', methods=['POST'])
+    @login_required
+    def ar_session_frame(session_id):
+        """Add frames (same formats as /api/ar/predict) and get the running result."""
+        ar_session = AR_SESSIONS.get(session_id, get_current_user()['id'])
+        if ar_session is None:
+            return jsonify({"success": False, "message": "Unknown or expired session"}), 404
+        frames, error = read_ar_frames()
+        if error is not None:
+            return error
+
+        start = time.perf_counter()
+        try:
+            result, rows = AR_SESSIONS.add_frames(ar_session, frames, timeout=AR_TIMEOUT)
+        except FutureTimeout:
+            return server_busy()
+        except FrameRejected as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        last = next((row for row in reversed(rows) if row is not None), None)
+        predictions = None if last is None else [{"className": label, "probability": float(p)}
+                                                 for label, p in zip(AR_MODEL.labels, last)]
+        resp = jsonify({"success": True, **result, "predictions": predictions})
+        resp.headers['Server-Timing'] = f"inference;dur={elapsed_ms:.3f}"
+        return resp
+
+    @app.route('/api/ar/session/<session_id>', methods=['DELETE'])
+    @login_required
+    def ar_session_close(session_id):
+        """End a scan and return its final result."""
+        result = AR_SESSIONS.close(session_id, get_current_user()['id'])
+        if result is None:
+            return jsonify({"success": False, "message": "Unknown or expired session"}), 404
+        return jsonify({"success": True, **result})
+
+    @app.route('/api/restaurant/<label>/summary')
+    def restaurant_summary(label):
+        """Healthiest dishes per Type, dietary counts and prices for one outlet (metadata.json label)."""
+        menu = load_menu()
+        summary = menu.summaries.get(label)
+        if summary is None:
+            return jsonify({"success": False, "message": "Unknown restaurant", "labels": sorted(menu.summaries)}), 404
+        resp = jsonify({"success": True, **summary})
+        resp.set_etag(f"menu-{menu.version[0]:x}-{menu.version[1]:x}-{label}")
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp.make_conditional(request)
 
     @app.route('/url')
     def get_url():
@@ -708,10 +1038,7 @@ def create_app() -> Flask:
     def faqs():
         current_user = get_current_user()
         if current_user:
-            profile_pic = current_user.get('profile_pic', DEFAULT_PFP)
-            if not profile_pic or not os.path.exists(f"static/img/PFPs/{profile_pic}"):
-                profile_pic = DEFAULT_PFP
-            return render_template('faqs.html', profile_pic=f"static/img/PFPs/{profile_pic}")
+            return render_user_page('faqs.html', current_user)
         return redirect(url_for('login'))
 
     @app.route('/ar-view')
@@ -719,10 +1046,7 @@ def create_app() -> Flask:
     def arview():
         current_user = get_current_user()
         if current_user:
-            profile_pic = current_user.get('profile_pic', DEFAULT_PFP)
-            if not profile_pic or not os.path.exists(f"static/img/PFPs/{profile_pic}"):
-                profile_pic = DEFAULT_PFP
-            return render_template('ar-view.html', profile_pic=f"static/img/PFPs/{profile_pic}")
+            return render_user_page('ar-view.html', current_user)
         return redirect(url_for('login'))
     
     @app.route('/my-profile')
@@ -731,42 +1055,21 @@ def create_app() -> Flask:
         current_user = get_current_user()
 
         if current_user:
-            # Determine the operating system
-            system_name = platform.system().lower()
-    
-            # Choose the appropriate JSON file based on the OS
-            if system_name in ['darwin', 'linux']:  # macOS ("Darwin") or Unix/Linux
-                country_codes_file = 'static/json/COUNTRY_CODES_MAC.json'
-            else:  # Assume Windows for other cases
-                country_codes_file = 'static/json/COUNTRY_CODES_WIN.json'
-
-            # Load country codes from the chosen file
-            with open(country_codes_file, 'r') as f:
-                country_codes = json.load(f)
-
-            # Extract nationalities from country codes
-            nationalities = list(country_codes.keys())
-
-            # Load user data
-            with open(USER_DATA_FILE, 'r') as f:
-                users = json.load(f)
-
-            user_data = next((user for user in users if user['Full Name'] == current_user['name']), None)
+            # Country codes are reference data (the file is picked per OS once, at import)
+            country_codes = COUNTRY_CODES.load()
+            user_data = USERS.get(current_user['name'])
 
             if user_data:
-                profile_pic = user_data.get('profile_pic', DEFAULT_PFP)
-
-                # Validate the profile picture path
-                if not profile_pic or not os.path.exists(os.path.join('static/img/PFPs', profile_pic)):
-                    profile_pic = DEFAULT_PFP
-
-                return render_template(
+                profile_pic = PROFILE_PICTURES.resolve(current_user.get('id'), user_data.get('profile_pic', DEFAULT_PFP))
+                # users.json's version is part of the key, so any profile edit renders afresh
+                key = ('my-profile.html', current_user['name'], USERS.version, profile_pic)
+                return PAGES.respond(key, lambda: render_template(
                     'my-profile.html',
                     user_data=user_data,
                     profile_pic=profile_pic,
-                    nationalities=nationalities,
+                    nationalities=list(country_codes.keys()),
                     country_codes=country_codes  # Pass country codes to template
-                )
+                ), request)
 
         return redirect(url_for('login'))
 
@@ -802,45 +1105,8 @@ def create_app() -> Flask:
         about = data.get('about', '').strip()
         if len(about) > 300:
             return jsonify({"success": False, "message": "The 'About' section exceeds the 300-character limit."}), 400
-        forbidden_words = [
-                            "fuck", "shit", "damn", "bitch", "bastard", "asshole", "dick", "cunt", "piss", "prick",
-                            "slut", "whore", "idiot", "stupid", "moron", "nazi", "hitler", "racist", "bigot",
-                            "homophobe", "transphobe", "sexist", "misogynist", "terrorist", "violence",
-                            "hate", "offensive", "discrimination", "xenophobia", "ableist", "retard",
-                            "cripple", "spaz", "fatphobic", "ugly", "loser", "dumbass", "scumbag",
-                            "trash", "garbage", "jerk", "creep", "pervert", "predator", "molester", "abuser",
-
-                            "fat", "skinny", "thin", "obese", "anorexic", "bulimic", "starvation", "anorexia",
-                            "binge", "purge", "restrict", "underweight", "calorie deficit", "diet pill",
-                            "fasting", "body shaming", "self-harm", "body dysmorphia", "weight loss obsession",
-                            "thinspo", "fitspo", "pro-ana", "pro-mia", "food guilt", "guilty pleasure",
-                            "cheat meal", "calorie counting", "obsessive eating", "emotional eating",
-                            "comfort eating", "yo-yo dieting", "unhealthy weight loss", "crash diet",
-                            "extreme fasting", "detox diet", "cleanse", "juice fast", "appetite suppressant",
-                            "meal replacement", "body negativity", "self-loathing", "unrealistic goals",
-                            "ideal weight", "ideal body", "size zero", "weight stigma", "body comparison",
-                            "appearance anxiety", "eating disorder", "fasting challenge", "weight obsession",
-                            "carb fear", "sugar fear", "food avoidance", "unbalanced diet", "scale addiction",
-                            "unrealistic beauty standards", "body goals", "skinny challenge", "waist training",
-                            "dangerous habits", "extreme weight loss", "quick fixes", "fat-phobic",
-                            "muscle dysmorphia", "compulsive exercise", "over-exercising", "body perfection",
-                            "comparison trap", "weight-based judgment", "food shame", "clean eating obsession",
-                            "orthorexia", "carb-free", "low-fat obsession", "fad diets", "extreme restriction",
-                            "disordered eating", "eating anxiety", "fear foods", "good food vs bad food",
-                            "body dissatisfaction", "body perfectionism", "appearance idealization",
-                            "self-starvation", "food anxiety", "body anxiety", "self-esteem issues",
-                            "weight bullying", "appearance bullying", "unhealthy comparison",
-                            "social media pressure", "unhealthy coping", "weight control obsession",
-                            "body distortion", "perceived flaws", "self-hate", "dieting obsession",
-                            "food obsession", "ideal image", "diet culture", "toxic fitness", "exercise guilt",
-                            "weight-focused", "eating guilt", "carb shaming", "size shaming", "unhealthy diet",
-
-                            "kill", "murder", "suicide", "abuse", "trauma", "trigger", "rape", "molest",
-                            "pedophile", "exploitation", "incest", "terror", "bomb", "extremist", "violator",
-                            "predatory", "assault", "harassment", "lynch", "genocide", "holocaust",
-                            "gaslight", "manipulate", "victim", "exclusion", "marginalize", "oppress"
-                        ]
-        if any(word.lower() in about.lower() for word in forbidden_words):
+        # Word list lives in static/json/content_filter.json (whole words only, reloaded on change)
+        if CONTENT_FILTERS.first_match('profile', about):
             return jsonify({"success": False, "message": "The 'About' section contains inappropriate content."}), 400
 
         # Validation: Verify Date of Birth and Age
@@ -867,8 +1133,7 @@ def create_app() -> Flask:
             return jsonify({"success": False, "message": "User not found."}), 403
 
         # Load the existing user profile from `user.json`
-        with open(USER_DATA_FILE, 'r') as file:
-            users = json.load(file)
+        users = read_json(USER_DATA_FILE)
 
         user_profile = next((user for user in users if user['Email'] == current_user['email']), None)
         if not user_profile:
@@ -932,8 +1197,7 @@ def create_app() -> Flask:
 
         # Update `credentials.json` if name or email changes
         if name_changed or email_changed:
-            with open(CREDENTIALS_FILE, 'r') as cred_file:
-                credentials = json.load(cred_file)
+            credentials = read_json(CREDENTIALS_FILE)
 
             for cred in credentials:
                 if cred['email'] == current_user['email']:
@@ -943,8 +1207,8 @@ def create_app() -> Flask:
                         cred['email'] = email
                     break
 
-            with open(CREDENTIALS_FILE, 'w') as cred_file:
-                json.dump(credentials, cred_file, indent=4)
+            write_json(CREDENTIALS_FILE, credentials)
+            SESSIONS.invalidate(current_user.get('id'))
 
         # Save the profile only if there are changes
         if updated_profile != user_profile:
@@ -953,13 +1217,11 @@ def create_app() -> Flask:
                 if user['Email'] == current_user['email']:
                     users[i] = updated_profile
                     break
-            with open(USER_DATA_FILE, 'w') as file:
-                json.dump(users, file, indent=4)
+            write_json(USER_DATA_FILE, users)
 
             # Update `credentials.json` if name or email changes
             if name_changed or email_changed:
-                with open(CREDENTIALS_FILE, 'r') as cred_file:
-                    credentials = json.load(cred_file)
+                credentials = read_json(CREDENTIALS_FILE)
 
                 for cred in credentials:
                     if cred['email'] == current_user['email']:
@@ -969,38 +1231,36 @@ def create_app() -> Flask:
                             cred['email'] = email
                         break
 
-                with open(CREDENTIALS_FILE, 'w') as cred_file:
-                    json.dump(credentials, cred_file, indent=4)
+                write_json(CREDENTIALS_FILE, credentials)
+                SESSIONS.invalidate(current_user.get('id'))
 
             # Update `orders.json` for matching `userName`
             if name_changed:
-                with open(ORDERS_FILE, 'r') as orders_file:
-                    orders = json.load(orders_file)
+                with ORDERS_LOCK:
+                    orders = read_json(ORDERS_FILE)
 
-                for order in orders:
-                    if order.get("userName") == user_profile.get("Full Name", ""):
-                        order["userName"] = full_name
+                    for order in orders:
+                        if order.get("userName") == user_profile.get("Full Name", ""):
+                            order["userName"] = full_name
 
-                with open(ORDERS_FILE, 'w') as orders_file:
-                    json.dump(orders, orders_file, indent=4)
+                    write_json(ORDERS_FILE, orders)
 
             # Update `weight.json` for matching `userName`
             if name_changed:
                 try:
-                    with open(WEIGHT_JSON_PATH, 'r') as weight_file:
-                        weight_data = json.load(weight_file)
+                    with WEIGHT_LOCK:
+                        weight_data = read_json(WEIGHT_JSON_PATH)
 
-                    # Update occurrences of the old name in both `userName` and `Name` fields
-                    old_name = user_profile.get("Full Name", "")
-                    for record in weight_data:
-                        if record.get("userName") == old_name:
-                            record["userName"] = full_name
-                        if record.get("Name") == old_name:
-                            record["Name"] = full_name
+                        # Update occurrences of the old name in both `userName` and `Name` fields
+                        old_name = user_profile.get("Full Name", "")
+                        for record in weight_data:
+                            if record.get("userName") == old_name:
+                                record["userName"] = full_name
+                            if record.get("Name") == old_name:
+                                record["Name"] = full_name
 
-                    # Save the updated weight data
-                    with open(WEIGHT_JSON_PATH, 'w') as weight_file:
-                        json.dump(weight_data, weight_file, indent=4)
+                        # Save the updated weight data
+                        write_json(WEIGHT_JSON_PATH, weight_data)
 
                 except FileNotFoundError:
                     logging.error(f"File {WEIGHT_JSON_PATH} not found. Skipping name update.")
@@ -1033,8 +1293,7 @@ def create_app() -> Flask:
             return jsonify({"success": False, "message": "User not found."}), 403
 
         # Load the existing user profile from `user.json`
-        with open(USER_DATA_FILE, 'r') as file:
-            users = json.load(file)
+        users = read_json(USER_DATA_FILE)
 
         user_profile = next((user for user in users if user['Email'] == current_user['email']), None)
         if not user_profile:
@@ -1105,8 +1364,7 @@ def create_app() -> Flask:
                 if user['Email'] == current_user['email']:
                     users[i] = updated_profile
                     break
-            with open(USER_DATA_FILE, 'w') as file:
-                json.dump(users, file, indent=4)
+            write_json(USER_DATA_FILE, users)
 
             return jsonify({"success": True, "message": "Settings updated successfully."})
 
@@ -1123,18 +1381,18 @@ def create_app() -> Flask:
         if not current_user:
             return jsonify({"success": False, "message": "User not found."}), 403
 
-        # Load credentials from `credentials.json`
-        with open(CREDENTIALS_FILE, 'r') as cred_file:
-            credentials = json.load(cred_file)
-
         # Find the user's credentials
-        user_cred = next((cred for cred in credentials if cred['email'] == current_user['email']), None)
+        user_cred = CREDENTIALS.by_email(current_user['email'])
         if not user_cred:
             return jsonify({"success": False, "message": "User credentials not found."}), 404
 
         # Validate current password
         current_password = data.get('currentPassword', '').strip()
-        if not check_password_hash(user_cred['password'], current_password):
+        try:
+            password_ok, _ = PASSWORDS.verify(user_cred['password'], current_password)
+        except HashQueueFull:
+            return server_busy()
+        if not password_ok:
             return jsonify({"success": False, "message": "Current password is incorrect."}), 400
 
         # Validate new password and confirmation
@@ -1150,15 +1408,19 @@ def create_app() -> Flask:
         if len(new_password) < 8 or not any(char.isdigit() for char in new_password):
             return jsonify({"success": False, "message": "Password must be at least 8 characters long and contain at least one number."}), 400
 
-        # Hash and update the new password
-        hashed_password = generate_password_hash(new_password)
-        user_cred['password'] = hashed_password
-
-        # Save updated credentials
-        with open(CREDENTIALS_FILE, 'w') as cred_file:
-            json.dump(credentials, cred_file, indent=4)
-
-        return jsonify({"success": True, "message": "Password changed successfully."})
+        # Hash and save the new password
+        try:
+            hashed_password = PASSWORDS.hash(new_password)
+        except HashQueueFull:
+            return server_busy()
+        CREDENTIALS.update(current_user['email'], password=hashed_password)
+
+        # Sign out every other session; this browser gets a fresh token for the new generation
+        resp = make_response(jsonify({"success": True, "message": "Password changed successfully."}))
+        user = SESSIONS.revoke(current_user)
+        if user:
+            set_session_cookie(resp, user)
+        return resp
 
     @app.route('/in-dev')
     def in_dev():
@@ -1169,29 +1431,122 @@ def create_app() -> Flask:
     def chatbot():
         current_user = get_current_user()
         if current_user:
-            profile_pic = current_user.get('profile_pic', DEFAULT_PFP)
-            if not profile_pic or not os.path.exists(f"static/img/PFPs/{profile_pic}"):
-                profile_pic = DEFAULT_PFP
-            return render_template('chatbot.html', profile_pic=f"static/img/PFPs/{profile_pic}")
+            return render_user_page('chatbot.html', current_user)
         return redirect(url_for('login'))
 
+    def log_chatbot_request(request_id, answer_path, user_input, question, response, elapsed_ms,
+                            first_token_ms=None, info=None):
+        """Queue one structured record per /chatbot call (written by the logger's background thread)."""
+        record = {
+            "request_id": request_id,
+            "backend": answer_path,
+            "prompt_length": len(user_input),
+            "question_length": len(question),
+            "response_length": len(response),
+            "latency_ms": round(elapsed_ms, 3),
+        }
+        if first_token_ms is not None:
+            record["first_token_ms"] = round(first_token_ms, 3)
+        record.update(info or {})
+        ollama_logger.info("chatbot request", extra=record)
+
     @app.route("/chatbot", methods=["POST"])
     def chatbot_api():
         user_input = request.json.get("prompt", "")
-        print(f"Received prompt from user: {user_input}")
-        response = query_ollama_with_csv(user_input)
-        print(f"Sending response back to user: {response}")
-        return jsonify({"response": response})
+        stream = bool(request.json.get("stream", False))
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        question = extract_user_question(user_input)
+
+        # Logged-in users get follow-up context; anonymous callers stay stateless
+        current_user = get_current_user()
+        conversation_key = current_user['id'] if current_user else None
+        history = CONVERSATIONS.history(conversation_key) if conversation_key else ""
+
+        # Menu lookups (price, kJ, dietary flags, outlet) are answered from the preparsed table
+        start = time.perf_counter()
+        info = {"history_length": len(history)}
+        if CONTENT_FILTERS.first_match('chatbot', question):
+            # Never forwarded to the model, and kept out of the conversation history
+            response, answer_path, conversation_key = FILTERED_REPLY, "filtered", None
+        else:
+            response = answer_structured_query(question, load_menu())
+            answer_path = "structured"
+
+        if response is None and stream:
+            # Stream model output as plain text so the client sees the first tokens immediately
+            def generate():
+                first_token_ms = None
+                parts = []
+                for text in stream_ollama_with_csv(user_input, info, history):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                    parts.append(text)
+                    yield text
+                if conversation_key:
+                    CONVERSATIONS.add_turn(conversation_key, question, "".join(parts))
+                log_chatbot_request(request_id, "llm", user_input, question, "".join(parts),
+                                    (time.perf_counter() - start) * 1000, first_token_ms, info)
+
+            resp = Response(generate(), mimetype='text/plain')
+            resp.headers['X-Request-ID'] = request_id
+            resp.headers['X-BBAI-Answer-Path'] = "llm"
+            return resp
+
+        if response is None:
+            response = query_ollama_with_csv(user_input, info, history)
+            answer_path = "llm"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if conversation_key:
+            CONVERSATIONS.add_turn(conversation_key, question, response)
+        log_chatbot_request(request_id, answer_path, user_input, question, response, elapsed_ms, info=info)
+
+        resp = Response(response, mimetype='text/plain') if stream else jsonify({"response": response})
+        resp.headers['X-Request-ID'] = request_id
+        resp.headers['X-BBAI-Answer-Path'] = answer_path
+        resp.headers['Server-Timing'] = f"{answer_path};dur={elapsed_ms:.3f}"
+        return resp
+
+    @app.route("/chatbot/stats")
+    def chatbot_stats():
+        """Prompt-prefix cache statistics, including the prefix-eval time saved so far."""
+        if not authenticate(request.headers.get('token', '')):
+            abort(403)
+        return jsonify({**MENU_PROMPT.stats(), "conversations": CONVERSATIONS.stats(), "ar_model": AR_MODEL.stats(),
+                        "ar_sessions": AR_SESSIONS.stats(), "content_filter": CONTENT_FILTERS.stats()})
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus scrape endpoint; set BBAI_METRICS_TOKEN to require 'Authorization: Bearer <token>'."""
+        token = os.getenv("BBAI_METRICS_TOKEN")
+        if token and request.headers.get('Authorization', '') != f"Bearer {token}":
+            abort(403)
+        return Response(METRICS.render(), mimetype=METRICS_CONTENT_TYPE)
+
+    @app.route("/auth/stats")
+    def auth_stats():
+        """Password-hashing pool statistics: queueing, CPU time per hash, rejections and rehashes."""
+        if not authenticate(request.headers.get('token', '')):
+            abort(403)
+        return jsonify({"passwords": PASSWORDS.stats(), "credentials": CREDENTIALS.stats(),
+                        "sessions": SESSIONS.stats(), "pages": PAGES.stats(), "intake": INTAKE.stats(),
+                        "weight_forecasts": WEIGHT_FORECASTS.stats(), "trending": TRENDING.stats(),
+                        "order_store": ORDER_STORE.stats()})
+
+    @app.route("/chatbot/conversation", methods=["DELETE"])
+    @login_required
+    def clear_chatbot_conversation():
+        """Forget the current user's chat history (e.g. when they start a new chat)."""
+        current_user = get_current_user()
+        if current_user:
+            CONVERSATIONS.clear(current_user['id'])
+        return jsonify({"success": True})
 
     @app.route('/dashboard')
     @login_required
     def dashboard():
         current_user = get_current_user()
         if current_user:
-            profile_pic = current_user.get('profile_pic', DEFAULT_PFP)
-            if not profile_pic or not os.path.exists(f"static/img/PFPs/{profile_pic}"):
-                profile_pic = DEFAULT_PFP
-            return render_template('dashboard.html', profile_pic=f"static/img/PFPs/{profile_pic}")
+            return render_user_page('dashboard.html', current_user)
         return redirect(url_for('login'))
 
     # ============================ LOGIN ROUTE (UPDATED) ==================================
@@ -1204,7 +1559,11 @@ def create_app() -> Flask:
                 password = sanitize_input(data.get('password', ''))
                 remember_me = data.get('rememberMe', False)  # <-- 'rememberMe' from JSON
 
-                user = authenticate_user(email, password)
+                timing = {}
+                try:
+                    user = authenticate_user(email, password, timing)
+                except HashQueueFull:
+                    return server_busy()
                 if user:
                     # Put user in session
                     session['user'] = user['email']
@@ -1219,6 +1578,9 @@ def create_app() -> Flask:
                     }
 
                     resp = make_response(jsonify(response_data))
+                    resp.headers['Server-Timing'] = (
+                        f"hash-queue;dur={timing.get('hash_queue_ms', 0)}, hash-cpu;dur={timing.get('hash_cpu_ms', 0)}"
+                    )
 
                     # If "rememberMe" is True => set 30-day cookies
                     # If "rememberMe" is False => set session cookies (no max_age)
@@ -1227,6 +1589,7 @@ def create_app() -> Flask:
                     else:
                         max_age = None  # This will create a session cookie
 
+                    set_session_cookie(resp, user, max_age)
                     resp.set_cookie(
                         'BBAIcurrentuser',
                         user['name'],
@@ -1263,8 +1626,8 @@ def create_app() -> Flask:
             return jsonify({"success": False, "message": "Request must be JSON"})
 
         # If already logged in via cookies and "Remember Me"
-        if request.cookies.get('BBAIemail') and request.cookies.get('BBAIcurrentuser') and request.cookies.get('BBAIremembered') == 'true':
-            session['user'] = request.cookies.get('BBAIemail')
+        if get_current_user() is not None and request.cookies.get('BBAIremembered') == 'true':
+            session['user'] = get_current_user()['email']
             return redirect(url_for('dashboard'))
         return render_template('login.html')
 
@@ -1337,10 +1700,14 @@ def create_app() -> Flask:
                     }), 400
 
                 # Hash password
-                hashed_password = generate_password_hash(password)
+                try:
+                    hashed_password = PASSWORDS.hash(password)
+                except HashQueueFull:
+                    return server_busy()
 
                 # Save user to credentials.json
                 user_credential = {
+                    "id": new_user_id(),
                     "name": name,
                     "email": email,
                     "password": hashed_password,
@@ -1359,15 +1726,14 @@ def create_app() -> Flask:
                 if not os.path.exists(USER_DATA_FILE):
                     users = [user_data]
                 else:
-                    with open(USER_DATA_FILE, 'r') as file:
-                        users = json.load(file)
+                    users = read_json(USER_DATA_FILE)
                     users.append(user_data)
 
-                with open(USER_DATA_FILE, 'w') as file:
-                    json.dump(users, file, indent=4)
+                write_json(USER_DATA_FILE, users)
 
                 # Respond with success and set cookies
                 resp = make_response(jsonify({"success": True, "message": "Account created successfully!"}))
+                set_session_cookie(resp, user_credential, timedelta(days=30))
                 resp.set_cookie(
                     'BBAIcurrentuser',
                     name,
@@ -1398,6 +1764,8 @@ def create_app() -> Flask:
     def forbidden_error(error):
         return render_template('404.html', error=error), 403
 
+    if init_worker_now:
+        report_startup()  # Otherwise the caller reports once its own startup steps are done
     return app
 
 # ============================= Entry Point ======================================================